@@ -1,40 +1,1173 @@
+from __future__ import annotations
 import os
 import logging
+import importlib
 import pandas as pd
-import ipeadatapy as ipea
-import rpy2.robjects as robjects
-from rpy2.robjects import pandas2ri
-from rpy2.robjects.conversion import localconverter
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
-from patsy.builtins import *
-from typing import Optional
+from typing import Callable, Optional
+from dataclasses import dataclass, asdict
 import numpy as np
-import duckdb as ddb
-import geobr
-import geopandas as gpd
+import json
+import urllib.parse
+import urllib.request
+import hashlib
 import time
+import uuid
+import inspect
+import functools
+import contextlib
+import contextvars
+import collections
+import tracemalloc
+import math
+import sys
+import threading
+import queue
+import random
+import shutil
+import base64
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class LazyModule:
+    """
+    Module imported on its first attribute access, so a stage (or dashboard tab) only pays for the dependencies it uses.
+    Cold imports of statsmodels, geopandas, geobr, duckdb and folium take seconds, and most runs touch only a few of them.
+
+    Args:
+        name (str): Module dotted name.
+    """
+    def __init__(self
+               , name : str):
+        self.__name__ = name
+
+    def __getattr__(self
+                  , attr : str):
+        # import_module holds the import lock, so concurrent stages load the module once
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module
+                     , attr)
+
+    def __repr__(self) -> str:
+        return f'<LazyModule {self.__name__}>'
+
+# Heavy dependencies, loaded by the stages that use them; the formulas' Q() comes from patsy's own builtins.
+# pandas 2.2 imports pyarrow itself, so these proxies only keep backend from adding to it
+pa = LazyModule('pyarrow')
+pq = LazyModule('pyarrow.parquet')
+ds = LazyModule('pyarrow.dataset')
+pc = LazyModule('pyarrow.compute')
+ipea = LazyModule('ipeadatapy')
+sm = LazyModule('statsmodels.api')
+smf = LazyModule('statsmodels.formula.api')
+scipy = LazyModule('scipy')
+ddb = LazyModule('duckdb')
+geobr = LazyModule('geobr')
+gpd = LazyModule('geopandas')
+folium = LazyModule('folium')
+shapely = LazyModule('shapely')
 
 logging.basicConfig(level = logging.INFO
                   , format = '%(asctime)s - %(levelname)s - %(message)s')
 
+IPEA_API_URL = 'http://www.ipeadata.gov.br/api/odata4'
+
+# IPEA data API territorial levels (NIVNOME) as named by ipeadatar (uname).
+IPEA_LEVELS = {'Brasil' : 'Brazil'
+             , 'Regiões' : 'Region'
+             , 'Estados' : 'State'
+             , 'Municípios' : 'Municipality'
+             , 'AMC 91-00' : 'AMC 91-00'}
+
+# Where each Bronze source keeps the territorial level, territory code, period and value.
+SOURCE_FIELDS = {'ipeadatapy' : {'level' : 'NIVNOME'
+                               , 'key' : 'TERCODIGO'
+                               , 'period' : 'YEAR'}
+               , 'api' : {'level' : 'uname'
+                        , 'key' : 'tcode'
+                        , 'period' : 'date'}}
+
+@dataclass(frozen = True)
+class Series:
+    """
+    One registered IPEA municipal series and how Silver turns it into a Gold column.
+
+    Attributes:
+        series_id (str): Series ID at IPEA database.
+        filename (str): Bronze layer filename.
+        column (str): Gold column name.
+        value_field (str): Bronze column holding the values.
+        source (str): SOURCE_FIELDS key; 'api' is the IPEA data API, with ipeadatar as fallback.
+        year (Optional[int]): Period kept, or None for every period (Gold still takes GOLD_YEAR; the rest feeds the panel regression).
+        level (str): Territorial level kept, as named by ipeadatapy.
+        scale (float): Unit scaling applied to the values.
+        decimals (Optional[int]): Rounding applied after scaling, or None to keep full precision.
+        aggregation (str): How municipalities combine into larger units (AMCs): 'sum' or 'mean'.
+        weight (Optional[str]): Series ID weighting a 'mean' aggregation, or None for a plain mean.
+    """
+    series_id : str
+    filename : str
+    column : str
+    value_field : str
+    source : str = 'ipeadatapy'
+    year : Optional[int] = 2010
+    level : str = 'Municípios'
+    scale : float = 1
+    decimals : Optional[int] = None
+    aggregation : str = 'sum'
+    weight : Optional[str] = None
+
+SERIES = [Series('POPTOT', 'População_2010.parquet', 'Habitantes 2010', 'VALUE (Habitante)')
+        , Series('ADH_IDHM', 'IDHM_2010.parquet', 'IDHM 2010', 'value', source = 'api', aggregation = 'mean', weight = 'POPTOT')
+        , Series('RECORRM', 'RecCorr_2010.parquet', 'Receitas Correntes 2010 (R$)', 'VALUE (R$)', decimals = 2)
+        , Series('PIB_IBGE_5938_37', 'PIB_2010.parquet', 'PIB 2010 (R$)', 'VALUE (R$ (mil), a preços do ano 2010)', scale = 1000, decimals = 3)]
+
+SERIES_REGISTRY = {series.series_id : series for series in SERIES}
+
+# Period the Gold cross-section columns refer to; Silver keeps every fetched period for the panel
+GOLD_YEAR = 2010
+
+@dataclass(frozen = True)
+class ReportFigure:
+    """
+    One statistical report figure, rendered by render_figure.
+
+    Attributes:
+        name (str): Figure name, used for its cached files.
+        kind (str): 'histogram', 'regression' or 'heatmap'.
+        columns (tuple): Gold columns the figure reads; only these feed its cache key.
+        title (str): Axes title.
+        xlabel (str): X axis label.
+        ylabel (str): Y axis label.
+        quantile (Optional[float]): Histograms only: drop values above this quantile (outliers).
+        size (tuple): Figure size in inches.
+    """
+    name : str
+    kind : str
+    columns : tuple
+    title : str
+    xlabel : str = ''
+    ylabel : str = ''
+    quantile : Optional[float] = None
+    size : tuple = (10, 6)
+
+# Bumped whenever render_figure changes what it caches (2: pickles are pyplot-free Figures)
+REPORT_CACHE_VERSION = 2
+
+# The Plots.pdf figures from IPEAv1.py, in page order
+FIGURES = [ReportFigure('idhm_histogram', 'histogram', ('IDHM 2010',), 'Distribution of IDHM 2010', 'IDHM 2010', 'Frequency')
+         , ReportFigure('receitas_histogram', 'histogram', ('Receitas Correntes 2010 (R$)',), 'Distribution of Receitas Correntes 2010 (R$) - Adjusted for Outliers', 'Receitas Correntes 2010 (R$)', 'Frequency', quantile = 0.95)
+         , ReportFigure('pib_histogram', 'histogram', ('PIB 2010 (R$)',), 'Distribution of PIB 2010 (R$) - Adjusted for Outliers', 'PIB 2010 (R$)', 'Frequency', quantile = 0.95)
+         , ReportFigure('carga_histogram', 'histogram', ('Carga Tributária Municipal 2010',), 'Distribution of Carga Tributária Mun. 2010', 'Carga Tributária Mun. 2010', 'Frequency')
+         , ReportFigure('idhm_carga_scatter', 'regression', ('Carga Tributária Municipal 2010', 'IDHM 2010'), 'ScatterPlot - IDHM vs Carga Tributária Mun. (2010)', 'Carga Tributária Mun. 2010', 'IDHM 2010', size = (12, 5))
+         , ReportFigure('correlation_heatmap', 'heatmap', ('IDHM 2010', 'Carga Tributária Municipal 2010', 'PIB 2010 (R$)'), 'Correlation Matrix')]
+
+# IBGE municipality codes start with the macro-region digit, followed by the UF digit.
+REGIONS = {'1' : 'Norte'
+         , '2' : 'Nordeste'
+         , '3' : 'Sudeste'
+         , '4' : 'Sul'
+         , '5' : 'Centro-Oeste'}
+
+UF_CODES = {'11' : 'RO', '12' : 'AC', '13' : 'AM', '14' : 'RR', '15' : 'PA', '16' : 'AP', '17' : 'TO'
+          , '21' : 'MA', '22' : 'PI', '23' : 'CE', '24' : 'RN', '25' : 'PB', '26' : 'PE', '27' : 'AL', '28' : 'SE', '29' : 'BA'
+          , '31' : 'MG', '32' : 'ES', '33' : 'RJ', '35' : 'SP'
+          , '41' : 'PR', '42' : 'SC', '43' : 'RS'
+          , '50' : 'MS', '51' : 'MT', '52' : 'GO', '53' : 'DF'}
+
+# IBGE population size classes, as (label, lower bound, upper bound) in inhabitants.
+POPULATION_BANDS = [('≤5k', 0, 5000)
+                  , ('5k–10k', 5000, 10000)
+                  , ('10k–20k', 10000, 20000)
+                  , ('20k–50k', 20000, 50000)
+                  , ('50k–100k', 50000, 100000)
+                  , ('100k–500k', 100000, 500000)
+                  , ('>500k', 500000, None)]
+
+# Columns the map layers read from AppData.
+MAP_COLUMNS = ['CodMunIBGE'
+             , 'Município'
+             , 'IDHM 2010'
+             , 'Carga Tributária Municipal 2010'
+             , 'data_status'
+             , 'geometry']
+
+# UF summary columns, as GoldQuery.aggregate returns them; the dashboard shapes the rollup cube UF rows the same way
+SUMMARY_COLUMNS = ['UF'
+                 , 'Municípios'
+                 , 'Habitantes 2010'
+                 , 'IDHM 2010'
+                 , 'Receitas Correntes 2010 (R$)'
+                 , 'PIB 2010 (R$)'
+                 , 'Carga Tributária Municipal 2010']
+
+MAP_LOCALES = {'pt-BR' : {'aliases' : ['2010'
+                                     , 'Índ. Desenv. Hum'
+                                     , 'Carga Trib. Mun.']}
+             , 'en-GB' : {'aliases' : ['2010'
+                                     , 'Hum. Devel. Index'
+                                     , 'Mun. Tax Burden']}}
+
+@contextlib.contextmanager
+def atomic_path(path : str):
+    """
+    Temporary path next to path, renamed over it when the block succeeds and removed when it fails, so readers (other stages, dashboard processes, the Prometheus collector) see the old file or the new one, never a partial one.
+
+    Args:
+        path (str): Destination file.
+
+    Yields:
+        str: Temporary path to write; unique per process and thread, so concurrent writers of one file don't collide.
+    """
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        yield temp_path
+        os.replace(temp_path
+                 , path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+def file_version(path : str) -> str:
+    """
+    Cheap version stamp of a data file, or of every file in a partitioned dataset directory: names, sizes and modification times, no contents read. The pipeline replaces its outputs by rename, so the stamp changes with every write; the dashboard keys its per-process caches on it.
+
+    Args:
+        path (str): File or directory.
+
+    Returns:
+        str: Version stamp; empty when the path doesn't exist.
+    """
+    if os.path.isdir(path):
+        stamps = []
+        for root, _, names in sorted(os.walk(path)):
+            for name in sorted(names):
+                stat = os.stat(os.path.join(root, name))
+                stamps.append(f'{os.path.relpath(os.path.join(root, name), path)}:{stat.st_size}:{stat.st_mtime_ns}')
+        return '\n'.join(stamps)
+    if not os.path.exists(path):
+        return ''
+    stat = os.stat(path)
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+class Span:
+    def __init__(self
+               , stage : str
+               , file : Optional[str]
+               , trace_id : str
+               , parent_id : Optional[str]):
+        """One timed pipeline step; rows and bytes are filled in by the traced code."""
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.stage = stage
+        self.file = file
+        self.start = time.time()
+        self.duration = None
+        self.rows = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.status = 'ok'
+        self.error = None
+        self.peak_rss = None
+        self.tracemalloc_peak = None
+        self.memory_bytes = None
+
+    def fail(self
+           , error : Exception) -> None:
+        """Mark the span as failed, for errors the traced code handles itself."""
+        self.status = 'error'
+        self.error = str(error)
+
+    def to_dict(self) -> dict:
+        return {'trace_id' : self.trace_id
+              , 'span_id' : self.span_id
+              , 'parent_id' : self.parent_id
+              , 'stage' : self.stage
+              , 'file' : self.file
+              , 'start' : self.start
+              , 'duration' : self.duration
+              , 'rows' : self.rows
+              , 'bytes_read' : self.bytes_read
+              , 'bytes_written' : self.bytes_written
+              , 'status' : self.status
+              , 'error' : self.error
+              , 'peak_rss' : self.peak_rss
+              , 'tracemalloc_peak' : self.tracemalloc_peak
+              , 'memory_bytes' : self.memory_bytes}
+
+class Tracer:
+    def __init__(self
+               , maxlen : int = 10000):
+        """
+        Nested span recorder for pipeline stages, exported as JSON lines and as a Prometheus textfile.
+
+        Args:
+            maxlen (int): Finished spans kept in memory until exported; older ones are dropped.
+        """
+        self.trace_id = uuid.uuid4().hex
+        self.spans = collections.deque(maxlen = maxlen)
+        self._current = contextvars.ContextVar('span'
+                                             , default = None)
+        self.profiling = False
+
+    def profile_memory(self
+                     , enabled : bool = True) -> None:
+        """
+        Opt-in memory profiling: spans then record peak RSS and the tracemalloc high-water mark, and saving_step the deep footprint of every DataFrame written. Peaks are process-wide, so stages running concurrently share them.
+        """
+        self.profiling = enabled
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @staticmethod
+    def _reset_peak_rss() -> None:
+        """Reset the kernel peak RSS mark (VmHWM), where Linux allows it."""
+        try:
+            with open('/proc/self/clear_refs'
+                    , 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+    @staticmethod
+    def _peak_rss() -> Optional[int]:
+        """Peak RSS in bytes since the last reset, or the process lifetime peak where it can't be reset."""
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _record_peaks(self
+                    , span : Span
+                    , parent : Optional[Span]) -> None:
+        """Fold the peaks reached so far into the span, and from it into its parent."""
+        span.tracemalloc_peak = max(span.tracemalloc_peak or 0, tracemalloc.get_traced_memory()[1])
+        span.peak_rss = max(span.peak_rss or 0, self._peak_rss() or 0)
+        if parent is not None:
+            parent.tracemalloc_peak = max(parent.tracemalloc_peak or 0, span.tracemalloc_peak)
+            parent.peak_rss = max(parent.peak_rss or 0, span.peak_rss)
+
+    def current(self) -> Optional[Span]:
+        """The innermost open span of the running thread, or None."""
+        return self._current.get()
+
+    @contextlib.contextmanager
+    def span(self
+           , stage : str
+           , file : Optional[str] = None):
+        """Open a span nested under the current one, timing the enclosed block."""
+        parent = self._current.get()
+        span = Span(stage
+                  , file
+                  , self.trace_id
+                  , parent.span_id if parent else None)
+        token = self._current.set(span)
+        if self.profiling:
+            # The parent keeps what it reached before this span; peaks restart for the span itself
+            if parent is not None:
+                self._record_peaks(parent
+                                 , None)
+            tracemalloc.reset_peak()
+            self._reset_peak_rss()
+        start_time = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.fail(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start_time
+            self._current.reset(token)
+            self.spans.append(span)
+            memory = ''
+            if self.profiling:
+                self._record_peaks(span
+                                 , parent)
+                memory = f", peak RSS {span.peak_rss / 2**20:.1f} MB, traced peak {span.tracemalloc_peak / 2**20:.1f} MB"
+            logging.info(f"{stage}{f' {file}' if file else ''} in {span.duration:.2f} seconds{memory}")
+
+    def traced(self
+             , stage : str
+             , file_arg : Optional[str] = None) -> Callable:
+        """Decorator running a function inside a span; file_arg names the argument holding the span file."""
+        def decorator(func):
+            signature = inspect.signature(func)
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                file = signature.bind_partial(*args, **kwargs).arguments.get(file_arg) if file_arg else None
+                with self.span(stage
+                             , file):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def export(self
+             , folder : str
+             , name : str = 'pipeline') -> None:
+        """
+        Write finished spans, then forget them.
+
+        Args:
+            folder (str): Directory for the exports; point Prometheus node_exporter's textfile collector at it.
+            name (str): Exported files base name.
+
+        Returns:
+            Files: {name}_spans.jsonl, appended with one JSON object per span, and {name}.prom, replaced with per-stage totals of this run.
+        """
+        os.makedirs(folder
+                  , exist_ok = True)
+        spans = list(self.spans)
+        self.spans.clear()
+        with open(os.path.join(folder, f'{name}_spans.jsonl')
+                , 'a'
+                , encoding = 'utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii = False) + '\n')
+
+        metrics = ['duration_seconds', 'rows', 'bytes_read', 'bytes_written', 'errors', 'calls']
+        if self.profiling:
+            metrics += ['peak_rss_bytes', 'tracemalloc_peak_bytes', 'dataframe_bytes']
+        totals = {}
+        for span in spans:
+            total = totals.setdefault((span.stage, span.file or ''), dict.fromkeys(metrics, 0))
+            total['duration_seconds'] += span.duration or 0
+            total['rows'] += span.rows or 0
+            total['bytes_read'] += span.bytes_read or 0
+            total['bytes_written'] += span.bytes_written or 0
+            total['errors'] += span.status == 'error'
+            total['calls'] += 1
+            if self.profiling:
+                total['peak_rss_bytes'] = max(total['peak_rss_bytes'], span.peak_rss or 0)
+                total['tracemalloc_peak_bytes'] = max(total['tracemalloc_peak_bytes'], span.tracemalloc_peak or 0)
+                total['dataframe_bytes'] += span.memory_bytes or 0
+        escape = lambda value : value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP ipea_pipeline_stage_{metric} Pipeline stage {metric.replace("_", " ")} in the last run.')
+            lines.append(f'# TYPE ipea_pipeline_stage_{metric} gauge')
+            for (stage, file), total in sorted(totals.items()):
+                lines.append(f'ipea_pipeline_stage_{metric}{{stage="{escape(stage)}",file="{escape(file)}"}} {total[metric]}')
+        lines.append('# HELP ipea_pipeline_last_run_timestamp_seconds Unix time the last run was exported.')
+        lines.append('# TYPE ipea_pipeline_last_run_timestamp_seconds gauge')
+        lines.append(f'ipea_pipeline_last_run_timestamp_seconds {time.time()}')
+        # The textfile collector may read at any time, so replace the file atomically
+        with atomic_path(os.path.join(folder, f'{name}.prom')) as temp_path:
+            with open(temp_path
+                    , 'w'
+                    , encoding = 'utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+
+tracer = Tracer()
+
+def chunk_rows(frames : list
+             , budget : Optional[int]
+             , factor : float = 3) -> Optional[int]:
+    """
+    Rows per chunk keeping an operation over the given DataFrames within a memory budget.
+
+    Args:
+        frames (list): DataFrames the operation reads; the first one is the one split in chunks.
+        budget (Optional[int]): Memory budget in bytes, or None for no budget.
+        factor (float): Working memory of the operation, as a multiple of its inputs deep footprint.
+
+    Returns:
+        int: Rows per chunk, or None if the whole operation fits in the budget.
+    """
+    if not budget:
+        return None
+    footprint = sum(int(frame.memory_usage(deep = True).sum()) for frame in frames) * factor
+    if footprint <= budget:
+        return None
+    chunks = math.ceil(footprint / budget)
+    rows = max(1, math.ceil(len(frames[0]) / chunks))
+    logging.info(f"Estimated {footprint / 2**20:.1f} MB over a {budget / 2**20:.1f} MB budget, chunking by {rows} rows")
+    return rows
+
+# Indicators compared in the correlation matrices, as the dashboard heatmap orders them
+CORRELATION_COLUMNS = ['IDHM 2010'
+                     , 'PIB 2010 (R$)'
+                     , 'Receitas Correntes 2010 (R$)'
+                     , 'Carga Tributária Municipal 2010']
+
+def correlation_matrices(df : pd.DataFrame
+                       , columns : list = CORRELATION_COLUMNS
+                       , methods : tuple = ('pearson', 'spearman', 'kendall')) -> dict:
+    """
+    Pearson, Spearman and Kendall tau-b matrices over every indicator pair, each pair on the rows where both are finite. Missingness is resolved once as a boolean matrix (pair counts are one matrix product); Spearman ranks and Kendall tau-b (scipy's merge-sort based O(n log n) algorithm, with tie correction) are computed on those rows.
+
+    Args:
+        df (DataFrame): Data holding the columns.
+        columns (list): Indicators to correlate.
+        methods (tuple): Any of 'pearson', 'spearman' and 'kendall'.
+
+    Returns:
+        dict: Correlation DataFrame per method, plus 'n' with the rows behind each pair.
+    """
+    values = df[columns].to_numpy(dtype = float)
+    # ±inf counts as missing, as in pandas (Carga is inf where PIB is missing)
+    observed = np.isfinite(values)
+    counts = observed.T.astype(int) @ observed.astype(int)
+    matrices = {method : np.eye(len(columns)) for method in methods}
+    for i in range(len(columns)):
+        for j in range(i + 1, len(columns)):
+            both = observed[:, i] & observed[:, j]
+            x, y = values[both, i], values[both, j]
+            for method in methods:
+                if both.sum() < 2:
+                    value = np.nan
+                elif method == 'pearson':
+                    value = np.corrcoef(x, y)[0, 1]
+                elif method == 'spearman':
+                    value = np.corrcoef(scipy.stats.rankdata(x), scipy.stats.rankdata(y))[0, 1]
+                elif method == 'kendall':
+                    value = scipy.stats.kendalltau(x, y, variant = 'b').statistic
+                else:
+                    raise ValueError(f'Unknown correlation method {method}')
+                matrices[method][i, j] = matrices[method][j, i] = value
+    result = {method : pd.DataFrame(matrix, index = columns, columns = columns) for method, matrix in matrices.items()}
+    result['n'] = pd.DataFrame(counts, index = columns, columns = columns)
+    return result
+
+def panel_fixed_effects(df : pd.DataFrame
+                      , y : str
+                      , x : list
+                      , unit : str = 'CodMunIBGE'
+                      , period : str = 'Período'
+                      , cluster : Optional[str] = None
+                      , tol : float = 1e-10
+                      , max_iter : int = 1000) -> tuple:
+    """
+    Two-way fixed-effects (unit and period) panel regression. Both effects are absorbed by alternating projections with sparse group-mean operators instead of dummy columns, so cost grows with rows times regressors, not with the number of units.
+
+    Args:
+        df (DataFrame): Long panel, one row per unit and period.
+        y (str): Dependent variable column.
+        x (list): Regressor columns.
+        unit (str): Unit identifier column.
+        period (str): Period identifier column.
+        cluster (Optional[str]): Column to cluster standard errors by (CR1), or None for the unit.
+        tol (float): Largest change in the demeaned data, in standard deviations of each column, to stop the projections at.
+        max_iter (int): Projection rounds before giving up on convergence.
+
+    Returns:
+        tuple: Coefficient table (coef, std err, t, P>|t| and 95% interval, by regressor) and fit statistics dict.
+    """
+    cluster = cluster or unit
+    data = df[list(dict.fromkeys([y, *x, unit, period, cluster]))].dropna()
+    # Singleton units are fitted exactly by their own effect and would overstate the degrees of freedom
+    while True:
+        counts = data.groupby(unit)[unit].transform('size')
+        if (counts > 1).all():
+            break
+        data = data[counts > 1]
+    if data[period].nunique() < 2 or len(data) <= len(x):
+        raise ValueError('Panel regression needs at least two periods per unit')
+
+    n, k = len(data), len(x)
+    matrix = data[[y, *x]].to_numpy(dtype = float)
+    operators = []
+    for column in (unit, period):
+        codes, groups = pd.factorize(data[column])
+        indicator = scipy.sparse.csr_matrix((np.ones(n), (np.arange(n), codes))
+                                          , shape = (n, len(groups)))
+        operators.append((indicator, np.asarray(indicator.sum(axis = 0)).ravel()))
+    demeaned = matrix - matrix.mean(axis = 0)
+    # Standardised so tol is relative: PIB in R$ reaches 1e12, where rounding alone exceeds any absolute tolerance
+    scale = demeaned.std(axis = 0)
+    scale[scale == 0] = 1
+    demeaned /= scale
+    for iteration in range(1, max_iter + 1):
+        previous = demeaned.copy()
+        for indicator, sizes in operators:
+            demeaned -= indicator @ ((indicator.T @ demeaned) / sizes[:, None])
+        if np.abs(demeaned - previous).max() < tol:
+            break
+    else:
+        logging.warning(f'Fixed effects projections did not converge in {max_iter} iterations')
+    demeaned *= scale
+
+    y_within, x_within = demeaned[:, 0], demeaned[:, 1:]
+    bread = np.linalg.pinv(x_within.T @ x_within)
+    beta = bread @ x_within.T @ y_within
+    residuals = y_within - x_within @ beta
+
+    # Cluster-robust (CR1) sandwich over the cluster score sums
+    cluster_codes, clusters = pd.factorize(data[cluster])
+    groups = len(clusters)
+    membership = scipy.sparse.csr_matrix((np.ones(n), (np.arange(n), cluster_codes))
+                                       , shape = (n, groups))
+    scores = membership.T @ (x_within * residuals[:, None])
+    correction = groups / (groups - 1) * (n - 1) / (n - k)
+    covariance = correction * bread @ (scores.T @ scores) @ bread
+    std_errors = np.sqrt(np.diag(covariance))
+    t_values = beta / std_errors
+    critical = scipy.stats.t.ppf(0.975
+                               , groups - 1)
+    table = pd.DataFrame({'coef' : beta
+                        , 'std err' : std_errors
+                        , 't' : t_values
+                        , 'P>|t|' : 2 * scipy.stats.t.sf(np.abs(t_values), groups - 1)
+                        , '[0.025' : beta - critical * std_errors
+                        , '0.975]' : beta + critical * std_errors}
+                       , index = x)
+    stats = {'Observations' : n
+           , 'Units' : int(operators[0][0].shape[1])
+           , 'Periods' : int(operators[1][0].shape[1])
+           , f'Clusters ({cluster})' : groups
+           , 'Within R²' : 1 - residuals @ residuals / (y_within @ y_within)
+           , 'Iterations' : iteration}
+    return table, stats
+
+class StageScheduler:
+    def __init__(self
+               , max_workers : int = 4
+               , barrier : Optional[Callable] = None):
+        """
+        Minimal DAG executor: each stage starts on a thread pool as soon as every stage it depends on has finished.
+
+        Args:
+            max_workers (int): Stages allowed to run at the same time.
+            barrier (Optional[Callable]): Called at the end of every stage, before it counts as finished (e.g. flushing pending writes).
+        """
+        self.max_workers = max_workers
+        self.barrier = barrier
+        self.stages = {}
+
+    def add(self
+          , name : str
+          , func : Callable
+          , depends_on : tuple = ()) -> None:
+        """
+        Register a stage. Dependencies must be registered first, which also rules out cycles.
+
+        Args:
+            name (str): Stage name.
+            func (Callable): Stage work; receives the results of depends_on, in that order.
+            depends_on (tuple): Names of the stages to wait for.
+        """
+        missing = [dependency for dependency in depends_on if dependency not in self.stages]
+        if missing:
+            raise ValueError(f'Stage {name} depends on unregistered stages {missing}')
+        self.stages[name] = (func, tuple(depends_on))
+
+    def _stage(self
+             , func : Callable
+             , *args):
+        result = func(*args)
+        if self.barrier is not None:
+            self.barrier()
+        return result
+
+    def run(self) -> dict:
+        """
+        Run every registered stage, each one as soon as its dependencies are done. A stage failure stops new stages from starting and is raised once the running ones finish.
+
+        Returns:
+            dict: Result of each stage, by name.
+        """
+        results, running = {}, {}
+        pending = dict(self.stages)
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            while pending or running:
+                for name, (func, depends_on) in list(pending.items()):
+                    if all(dependency in results for dependency in depends_on):
+                        # Copying the context keeps stage spans nested under the caller's span
+                        future = executor.submit(contextvars.copy_context().run
+                                               , self._stage
+                                               , func
+                                               , *[results[dependency] for dependency in depends_on])
+                        running[future] = name
+                        del pending[name]
+                done, _ = wait(running
+                             , return_when = FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return results
+
+@dataclass(frozen = True)
+class FetchPolicy:
+    """
+    Deadline, retry and hedging rules for one remote fetch (IPEA, CRAN). Attempts run on daemon threads, so a hung response is abandoned at its deadline instead of stalling the pipeline.
+
+    Attributes:
+        deadline (float): Seconds each attempt (with its hedge) may take.
+        retries (int): Attempts after the first one.
+        backoff (float): Base seconds of the jittered exponential backoff between attempts.
+        hedge_after (Optional[float]): Seconds after which a duplicate request races the first one, or None to never hedge.
+    """
+    deadline : float = 120
+    retries : int = 2
+    backoff : float = 1.0
+    hedge_after : Optional[float] = 30
+
+    def call(self
+           , func : Callable
+           , *args
+           , hedge : bool = True
+           , retries : Optional[int] = None
+           , **kwargs):
+        """
+        Call func under the policy and return its first successful result.
+
+        Args:
+            func (Callable): Idempotent fetch to run.
+            hedge (bool): Allow the hedged duplicate; off for calls that can't run twice at once (R).
+            retries (Optional[int]): Overrides the policy retries.
+
+        Returns:
+            The func result.
+
+        Raises:
+            TimeoutError or the last func error, once every attempt failed or missed its deadline.
+        """
+        retries = self.retries if retries is None else retries
+        last_error = None
+        for attempt in range(retries + 1):
+            if attempt:
+                # Full jitter keeps concurrent series from retrying in lockstep
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            results = queue.Queue()
+
+            def run():
+                try:
+                    results.put((True, func(*args, **kwargs)))
+                except Exception as e:
+                    results.put((False, e))
+
+            def launch():
+                threading.Thread(target = contextvars.copy_context().run
+                               , args = (run,)
+                               , daemon = True).start()
+
+            start = time.monotonic()
+            launch()
+            launched, failed = 1, 0
+            hedge_at = self.hedge_after if hedge and self.hedge_after is not None else None
+            while failed < launched:
+                elapsed = time.monotonic() - start
+                if elapsed >= self.deadline:
+                    last_error = TimeoutError(f'{getattr(func, "__name__", func)} missed its {self.deadline} s deadline')
+                    break
+                timeout = self.deadline - elapsed
+                if hedge_at is not None and launched == 1:
+                    timeout = min(timeout, max(hedge_at - elapsed, 0))
+                try:
+                    ok, value = results.get(timeout = timeout)
+                except queue.Empty:
+                    if hedge_at is not None and launched == 1 and time.monotonic() - start >= hedge_at:
+                        logging.info(f'Hedging {getattr(func, "__name__", func)} after {hedge_at} s')
+                        launch()
+                        launched += 1
+                    continue
+                if ok:
+                    return value
+                failed += 1
+                last_error = value
+            logging.warning(f'{getattr(func, "__name__", func)} attempt {attempt + 1} of {retries + 1} failed: {last_error}')
+        raise last_error
+
+class ParquetWriteBehind:
+    def __init__(self
+               , max_pending : int = 8
+               , row_group_size : int = 1024
+               , compression : str = 'zstd'):
+        """
+        Write-behind Parquet writer: stages hand tables over and move on while one background thread compresses and writes them.
+        Files are written to a temp file and renamed into place, so readers never see a partial file.
+
+        Args:
+            max_pending (int): Tables queued before write() blocks, bounding the memory held by pending writes.
+            row_group_size (int): Rows per row group. Files are sorted by CodMunIBGE, so 1024 municipalities (about five UFs, at some 206 municipalities per UF) per group lets code and UF filters skip most groups by their min/max statistics.
+            compression (str): Parquet codec; dictionary encoding is always on.
+        """
+        self.queue = queue.Queue(maxsize = max_pending)
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.pending = set()
+        self.failed = [] # Write errors not yet raised by flush()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def write(self
+            , table : pa.Table
+            , path : str
+            , sort_by : tuple = ('CodMunIBGE',)) -> Future:
+        """
+        Queue a table to be written, sorted by the sort_by columns it has. Sorting happens here, so the queued table is a copy the caller may keep changing.
+
+        Args:
+            table (pa.Table): Data to write.
+            path (str): Destination parquet file.
+            sort_by (tuple): Sort columns, skipped when missing from the table.
+
+        Returns:
+            Future: Resolves to the bytes written, or to the write error.
+        """
+        table = self._sorted(table
+                           , sort_by)
+        future = Future()
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target = self._run
+                                             , name = 'parquet-write-behind'
+                                             , daemon = True)
+                self.thread.start()
+            self.pending.add(future)
+        self.queue.put((table, path, future)) # Blocks while the queue is full
+        return future
+
+    def write_now(self
+                , table : pa.Table
+                , path : str
+                , sort_by : tuple = ('CodMunIBGE',)) -> int:
+        """
+        Write a table on the calling thread, with the same sorting, codec and row groups as write(). For outputs a stage needs in place before it goes on, or whose chunks would hold too much memory queued.
+
+        Args:
+            table (pa.Table): Data to write.
+            path (str): Destination parquet file.
+            sort_by (tuple): Sort columns, skipped when missing from the table.
+
+        Returns:
+            int: Bytes written.
+        """
+        self._write(self._sorted(table
+                                , sort_by)
+                  , path)
+        return os.path.getsize(path)
+
+    @staticmethod
+    def _sorted(table : pa.Table
+              , sort_by : tuple) -> pa.Table:
+        # Nulls (e.g. rollup rows above municipality level) sort last, Arrow's default placement
+        keys = [(column, 'ascending') for column in sort_by if column in table.column_names]
+        if keys:
+            table = table.take(pc.sort_indices(table
+                                             , sort_keys = keys))
+        return table
+
+    def _write(self
+             , table : pa.Table
+             , path : str) -> None:
+        with atomic_path(path) as temp_path:
+            pq.write_table(table
+                         , temp_path
+                         , compression = self.compression
+                         , use_dictionary = True
+                         , write_statistics = True
+                         , row_group_size = self.row_group_size)
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            table, path, future = item
+            try:
+                self._write(table
+                          , path)
+                future.set_result(os.path.getsize(path))
+            except Exception as e:
+                # Recorded before the future resolves, so a flush() waiting on it sees the error
+                with self.lock:
+                    self.failed.append(e)
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.pending.discard(future)
+
+    def flush(self) -> None:
+        """
+        Barrier: wait for every write queued so far. Stages call it before finishing, so the files they wrote exist for the stages after them.
+
+        Raises:
+            The first write error since the last flush.
+        """
+        with self.lock:
+            pending = list(self.pending)
+        wait(pending)
+        with self.lock:
+            failed, self.failed = self.failed, []
+        if failed:
+            raise failed[0]
+
+    def close(self) -> None:
+        """Flush and stop the writer thread; a later write() starts a new one."""
+        try:
+            self.flush()
+        finally:
+            with self.lock:
+                thread, self.thread = self.thread, None
+            if thread is not None:
+                self.queue.put(None)
+                thread.join()
+
+class Watermarks:
+    def __init__(self
+               , folder : str
+               , reconcile_days : float = 30):
+        """
+        Per-series high-water marks (latest period and row count), kept as Bronze metadata so refreshes only request newer periods.
+
+        Args:
+            folder (str): Bronze layer directory; marks are saved to watermarks.json there.
+            reconcile_days (float): Days after the last full fetch before a series is fetched in full again.
+        """
+        self.path = os.path.join(folder
+                               , 'watermarks.json')
+        self.reconcile_days = reconcile_days
+        self.lock = threading.Lock()
+        self.marks = {}
+        if os.path.exists(self.path):
+            with open(self.path
+                    , encoding = 'utf-8') as f:
+                self.marks = json.load(f)
+
+    def get(self
+          , series : str) -> Optional[dict]:
+        """Stored mark for a series: period, rows, full_fetch (Unix time) and updated (Unix time), or None."""
+        with self.lock:
+            return self.marks.get(series)
+
+    def reconcile_due(self
+                    , series : str
+                    , stored_rows : int) -> bool:
+        """
+        Whether a series must be fetched in full: no mark yet, the reconcile interval has passed, or the stored partitions no longer match the mark row count.
+        """
+        mark = self.get(series)
+        if mark is None or mark['period'] is None or not stored_rows:
+            return True
+        if time.time() - mark['full_fetch'] > self.reconcile_days * 86400:
+            return True
+        return stored_rows != mark['rows']
+
+    def update(self
+             , series : str
+             , period : Optional[int]
+             , rows : int
+             , full : bool) -> None:
+        """
+        Record a series new mark and save every mark atomically, since series are fetched concurrently.
+
+        Args:
+            series (str): Series ID at IPEA database.
+            period (Optional[int]): Latest period now stored.
+            rows (int): Rows now stored over every partition.
+            full (bool): Whether this was a full fetch, restarting the reconcile interval.
+        """
+        with self.lock:
+            previous = self.marks.get(series, {})
+            now = time.time()
+            self.marks[series] = {'period' : period
+                                , 'rows' : rows
+                                , 'full_fetch' : now if full else previous.get('full_fetch', now)
+                                , 'updated' : now}
+            with atomic_path(self.path) as temp_path:
+                with open(temp_path
+                        , 'w'
+                        , encoding = 'utf-8') as f:
+                    json.dump(self.marks
+                            , f
+                            , indent = 2)
+
+def render_figure(figure : ReportFigure
+                , data : pd.DataFrame
+                , path : str) -> str:
+    """
+    Render one report figure headless, in a report process pool worker. Writes <path>.png for the HTML report and <path>.pickle (the matplotlib figure) for the PDF, each atomically. The figure is built without pyplot, so neither the worker nor the process unpickling it registers it with a GUI backend.
+
+    Args:
+        figure (ReportFigure): Figure to render.
+        data (DataFrame): The figure columns only.
+        path (str): Cache path without extension.
+
+    Returns:
+        str: The path, once both files exist.
+    """
+    from matplotlib.figure import Figure
+    import seaborn as sns
+    import pickle
+    sns.set_style('whitegrid')
+    fig = Figure(figsize = figure.size)
+    ax = fig.subplots()
+    if figure.kind == 'histogram':
+        values = data[figure.columns[0]].dropna()
+        if figure.quantile is not None:
+            values = values[values <= values.quantile(figure.quantile)]
+        sns.histplot(values
+                   , bins = 100
+                   , kde = True
+                   , ax = ax)
+    elif figure.kind == 'regression':
+        # Axes-level counterpart of the lmplot IPEAv1.py draws
+        sns.regplot(x = figure.columns[0]
+                  , y = figure.columns[1]
+                  , data = data
+                  , scatter_kws = {'alpha' : 0.7}
+                  , line_kws = {'color' : 'red'}
+                  , ax = ax)
+    elif figure.kind == 'heatmap':
+        sns.heatmap(data.corr(method = 'pearson')
+                  , annot = True
+                  , cmap = 'viridis'
+                  , ax = ax)
+    else:
+        raise ValueError(f'Unknown figure kind {figure.kind}')
+    ax.set_title(figure.title)
+    ax.set_xlabel(figure.xlabel)
+    ax.set_ylabel(figure.ylabel)
+    with atomic_path(f'{path}.pickle') as pickle_path, atomic_path(f'{path}.png') as png_path:
+        fig.savefig(png_path
+                  , format = 'png'
+                  , dpi = 100
+                  , bbox_inches = 'tight')
+        with open(pickle_path
+                , 'wb') as f:
+            pickle.dump(fig, f)
+    return path
+
+class ReportBuilder:
+    def __init__(self
+               , folder : str
+               , max_workers : Optional[int] = None):
+        """
+        Headless statistical figure builder. Figures render in a process pool and are cached by a hash of their input columns and parameters, so a run only re-renders the figures whose inputs changed.
+
+        Args:
+            folder (str): Figure cache directory.
+            max_workers (Optional[int]): Render processes; None for one per CPU.
+        """
+        self.folder = folder
+        self.max_workers = max_workers
+        os.makedirs(folder
+                  , exist_ok = True)
+
+    def key(self
+          , figure : ReportFigure
+          , data : pd.DataFrame) -> str:
+        """SHA-256 of the figure parameters, plotting library versions, cache format and input column values."""
+        import matplotlib
+        import seaborn
+        digest = hashlib.sha256(json.dumps([asdict(figure), matplotlib.__version__, seaborn.__version__, REPORT_CACHE_VERSION]
+                                         , sort_keys = True
+                                         , default = list).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data
+                                               , index = False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    @tracer.traced('report_build')
+    def build(self
+            , df : pd.DataFrame
+            , pdf_path : Optional[str] = None
+            , figures : list = FIGURES) -> str:
+        """
+        Render the figures missing from the cache in parallel, then assemble the PDF (one page per figure, in order) and the HTML fragment.
+
+        Args:
+            df (DataFrame): Gold data the figures are drawn from.
+            pdf_path (Optional[str]): PDF file to assemble, or None for the HTML only.
+            figures (list): Figures to include, in page order.
+
+        Returns:
+            str: HTML with every figure embedded as a PNG.
+        """
+        import pickle
+        from matplotlib.backends.backend_pdf import PdfPages
+        paths, pending = [], {}
+        for figure in figures:
+            data = df[list(figure.columns)]
+            path = os.path.join(self.folder
+                              , f'{figure.name}-{self.key(figure, data)[:16]}')
+            paths.append(path)
+            if not (os.path.exists(f'{path}.png') and os.path.exists(f'{path}.pickle')):
+                pending[path] = (figure, data)
+        if pending:
+            # Spawned workers don't inherit the pipeline threads, DuckDB connections or open spans
+            with ProcessPoolExecutor(max_workers = self.max_workers
+                                   , mp_context = multiprocessing.get_context('spawn')) as executor:
+                for future in [executor.submit(render_figure, figure, data, path) for path, (figure, data) in pending.items()]:
+                    future.result()
+        logging.info(f'Rendered {len(pending)} of {len(figures)} report figures, {len(figures) - len(pending)} from cache')
+
+        # Drop cached renders of older inputs
+        current = {os.path.basename(path) for path in paths}
+        for name in os.listdir(self.folder):
+            if name.rsplit('.', 1)[0] not in current:
+                os.remove(os.path.join(self.folder
+                                     , name))
+
+        if pdf_path is not None:
+            with atomic_path(pdf_path) as temp_path, PdfPages(temp_path) as pdf:
+                for path in paths:
+                    with open(f'{path}.pickle'
+                            , 'rb') as f:
+                        fig = pickle.load(f)
+                    pdf.savefig(fig
+                              , bbox_inches = 'tight')
+                    # Pyplot never sees these figures; drop each before loading the next
+                    del fig
+        images = []
+        for figure, path in zip(figures, paths):
+            with open(f'{path}.png'
+                    , 'rb') as f:
+                encoded = base64.b64encode(f.read()).decode('ascii')
+            images.append(f"<figure><img src = 'data:image/png;base64,{encoded}' alt = '{figure.title}' class = 'img-fluid'><figcaption>{figure.title}</figcaption></figure>")
+        span = tracer.current()
+        span.rows = len(pending)
+        return '\n'.join(images)
+
 class DataProcessor:
+    # How validate_keys handles duplicated keys: keep the first or last row, raise, or keep them all
+    dedupe_policies = ('first', 'last', 'error', 'keep')
+
     def __init__(self
                , bronze_folder : str
                , silver_folder : str
                , gold_folder : str
                , statistical_analysis_folder : str
-               , db_path : str):
+               , db_path : str
+               , memory_budget : Optional[int] = None
+               , dedupe_policy : str = 'first'
+               , reconcile_days : float = 30
+               , fetch_policy : FetchPolicy = FetchPolicy()
+               , writer : Optional[ParquetWriteBehind] = None):
         self.bronze_folder = bronze_folder
         self.silver_folder = silver_folder
         self.gold_folder = gold_folder
         self.statistical_analysis_folder = statistical_analysis_folder
         self.db_path = db_path
+        self.memory_budget = memory_budget
+        if dedupe_policy not in self.dedupe_policies:
+            raise ValueError(f'Unknown dedupe policy {dedupe_policy!r}, expected one of {self.dedupe_policies}')
+        self.dedupe_policy = dedupe_policy
+        self.reconcile_days = reconcile_days
+        self.watermarks = Watermarks(bronze_folder
+                                   , reconcile_days)
+        self.fetch_policy = fetch_policy
+        self.staleness = {} # Bronze files served from a previous run, by filename
+        self.writer = writer or ParquetWriteBehind()
+        self.key_reports = {}
         self.join_list = []
+        self.series_long = None
+        self.correlations = None
+        self.rollup = None
 
+    @tracer.traced('create_folders')
     def create_folders(self) -> None:
         """Create required folders as layer directories."""
-        start_time = time.time()
         folders = [self.bronze_folder
                  , self.silver_folder
                  , self.gold_folder
@@ -42,146 +1175,479 @@ class DataProcessor:
         for folder in folders:
             os.makedirs(folder
                       , exist_ok = True)
-        elapsed_time = time.time() - start_time  # End timing
-        logging.info(f"Created folders in {elapsed_time:.2f} seconds")
 
+    @tracer.traced('saving_step', 'filename')
     def saving_step(self
-                  , df : pd.DataFrame
+                  , df : pd.DataFrame | pa.Table
                   , folder : str
-                  , filename : str) -> None:
+                  , filename : str
+                  , metadata : Optional[dict] = None
+                  , sort_by : tuple = ('CodMunIBGE',)) -> None:
         """
-        Save data at each step, on respective layer with specified filename.
+        Save data at each step, on respective layer with specified filename. The write itself is handed to the write-behind writer; the file is in place once the stage ends (or writer.flush() returns).
 
         Args:
-            df (DataFrame): Fetched data at step before.
+            df (DataFrame or pa.Table): Fetched data at step before; GeoDataFrames go in as geoparquet_table tables.
             folder (str): Directory emulating Medallion layer.
             filename (str): Filename to save the df fetched.
+            metadata (Optional[dict]): Extra parquet key-value metadata, values JSON-encoded.
+            sort_by (tuple): Columns the file is sorted by, when present.
 
         Returns:
             File: Saved file at layer directory.
         """
-        start_time = time.time()
         path = os.path.join(folder
                           , filename)
-        df.to_parquet(path
-                    , engine = 'pyarrow')
-        elapsed_time = time.time() - start_time
-        logging.info(f"Saved file {filename} in {elapsed_time:.2f} seconds")
+        table = pa.Table.from_pandas(df) if isinstance(df, pd.DataFrame) else df
+        if metadata:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {})
+                                                 , **{key.encode() : json.dumps(value).encode() for key, value in metadata.items()}})
+        span = tracer.current()
+        future = self.writer.write(table
+                                 , path
+                                 , sort_by)
+        # Bytes are only known once the background write lands; a stage may save several files
+        future.add_done_callback(lambda done : done.exception() is None and setattr(span
+                                                                                   , 'bytes_written'
+                                                                                   , (span.bytes_written or 0) + done.result()))
+        span.rows = len(df)
+        if tracer.profiling:
+            span.memory_bytes = int(df.memory_usage(deep = True).sum()) if isinstance(df, pd.DataFrame) else table.nbytes
+
+    @tracer.traced('api_fetch', 'series')
+    def api_fetch(self
+                , series : str
+                , year : Optional[int]
+                , level : str = 'Municípios'
+                , timeout : float = 60
+                , since : Optional[int] = None) -> pd.DataFrame:
+        """
+        Fetches one IPEA series straight from the IPEA data OData API, filtered server-side by territorial level and year.
+
+        Args:
+            series (str): Series ID at IPEA database.
+            year (Optional[int]): Year filter for the data fetched, or None for every period.
+            level (str): Territorial level name (NIVNOME) to keep.
+            timeout (float): Seconds to wait for the API response.
+            since (Optional[int]): Only periods after this year, for incremental fetches.
+
+        Returns:
+            DataFrame: Fetched data with the same columns as ipeadatar (code, date, value, uname, tcode).
+        """
+        filters = [f"NIVNOME eq '{level}'"]
+        if year is not None:
+            filters.append(f'year(VALDATA) eq {year}')
+        if since is not None:
+            filters.append(f'year(VALDATA) gt {since}')
+        query = urllib.parse.urlencode({'$filter' : ' and '.join(filters)
+                                      , '$select' : 'SERCODIGO,VALDATA,VALVALOR,NIVNOME,TERCODIGO'}
+                                     , quote_via = urllib.parse.quote)
+        url = f"{IPEA_API_URL}/ValoresSerie(SERCODIGO='{series}')?{query}"
+        with urllib.request.urlopen(url
+                                  , timeout = timeout) as response:
+            body = response.read()
+        values = json.loads(body)['value']
+        raw_data = pd.DataFrame(values
+                              , columns = ['SERCODIGO'
+                                         , 'VALDATA'
+                                         , 'VALVALOR'
+                                         , 'NIVNOME'
+                                         , 'TERCODIGO'])
+        raw_data = pd.DataFrame({'code' : raw_data['SERCODIGO']
+                               , 'date' : pd.to_datetime(raw_data['VALDATA'].str[:10])
+                               , 'value' : pd.to_numeric(raw_data['VALVALOR']
+                                                       , errors = 'coerce')
+                               , 'uname' : raw_data['NIVNOME'].map(IPEA_LEVELS).fillna(raw_data['NIVNOME'])
+                               , 'tcode' : raw_data['TERCODIGO']})
+        span = tracer.current()
+        span.rows = len(raw_data)
+        span.bytes_read = len(body)
+        return raw_data
+
+    @staticmethod
+    @tracer.traced('r_fetch')
+    def r_fetch(r_code : str) -> pd.DataFrame:
+        """
+        Fetches data running R code through ipeadatar. rpy2 is only imported here, so R is optional.
+
+        Args:
+            r_code (str): R code to ipeadatar for fetching data.
 
+        Returns:
+            DataFrame: Fetched data converted from the R data.frame.
+        """
+        import rpy2.robjects as robjects
+        from rpy2.robjects import pandas2ri
+        from rpy2.robjects.conversion import localconverter
+        data = robjects.r(r_code) # R code to fetch data
+        with localconverter(robjects.default_converter + pandas2ri.converter) as cv:
+            raw_data = cv.rpy2py(data) # R data conversion to pandas DataFrame
+        if 'date' in raw_data.columns and raw_data['date'].dtype == 'float64':
+            raw_data['date'] = pd.to_datetime(raw_data['date']
+                                            , unit = 'D'
+                                            , origin = '1970-01-01')
+        return pd.DataFrame(raw_data)
+
+    @tracer.traced('bronze_fetch', 'filename')
     def bronze_fetch(self
                    , series : str
                    , year : int
                    , filename : str
                    , r_code : Optional[str] = None) -> Optional[pd.DataFrame]:
         """
-        Fetches IPEA raw data based on series and year provided. ipeadatar and ipeadatapy (ipea.territories(), ipea.timeseries()).
+        Fetches IPEA raw data based on series and year provided. IPEA data API (IDHM, ipeadatar as fallback) and ipeadatapy (ipea.territories(), ipea.timeseries()). Registered series only fetch periods past their watermark (see incremental_fetch).
 
         Args:
             series (str): Series ID at IPEA database.
             year (int): Year filter for the data fetched.
             filename (str): Filename to save the data fetched.
-            r_code (Optional[str]): R code to ipeadatar for fetching data that isn't at ipeadatapy.
+            r_code (Optional[str]): R code to ipeadatar, used as fallback when the IPEA data API fetch fails.
 
         Returns:
             DataFrame: Fetched data as pandas DataFrame, then saving at Bronze layer, or None if an error occurs (with an error log).
         """
-        start_time = time.time()
         try:
-            # Special handling for IDHM 2010 (IPEAdataR)
-            if filename == 'IDHM_2010.parquet':
-                data = robjects.r(r_code) # R code to fetch data
-                with localconverter(robjects.default_converter + pandas2ri.converter) as cv:
-                    raw_data = cv.rpy2py(data) # R data conversion to pandas DataFrame
-                if 'date' in raw_data.columns and raw_data['date'].dtype == 'float64':
-                    raw_data['date'] = pd.to_datetime(raw_data['date']
-                                                    , unit = 'D'
-                                                    , origin = '1970-01-01')
-                raw_data = pd.DataFrame(raw_data)
-            elif series == 'Municípios':
-                raw_data = ipea.territories() # Cities names data fetch
-                raw_data = pd.DataFrame(raw_data)
+            spec = SERIES_REGISTRY.get(series)
+            if spec is not None:
+                raw_data = self.incremental_fetch(spec
+                                                , year
+                                                , r_code)
             else:
-                # Regular fetch (IPEAdataPy)
-                raw_data = ipea.timeseries(series = series
-                                         , year = year)
-                raw_data = pd.DataFrame(raw_data)
-
-            self.saving_step(raw_data
-                           , self.bronze_folder
-                           , filename)
-            elapsed_time = time.time() - start_time
-            logging.info(f"Bronze fetching {filename} in {elapsed_time:.2f} seconds")
+                path = os.path.join(self.bronze_folder
+                                  , filename)
+                try:
+                    if series == 'Municípios':
+                        raw_data = self.fetch_policy.call(ipea.territories) # Cities names data fetch
+                    else:
+                        # Unregistered series (IPEAdataPy)
+                        raw_data = self.fetch_policy.call(ipea.timeseries
+                                                        , series = series
+                                                        , year = year)
+                except Exception as e:
+                    if not os.path.exists(path):
+                        raise
+                    self.mark_stale(filename
+                                  , e
+                                  , os.path.getmtime(path))
+                    raw_data = pd.read_parquet(path)
+                else:
+                    raw_data = pd.DataFrame(raw_data)
+                    self.saving_step(raw_data
+                                   , self.bronze_folder
+                                   , filename)
+            tracer.current().rows = len(raw_data)
             return raw_data
         except Exception as e:
+            tracer.current().fail(e)
             logging.error(f'Error fetching data for {filename}: {e}')
             return None
 
+    def mark_stale(self
+                 , filename : str
+                 , error : Exception
+                 , as_of : float) -> None:
+        """
+        Record that a Bronze file is served from a previous run because its fetch failed, for the Gold output metadata.
+
+        Args:
+            filename (str): Bronze filename.
+            error (Exception): Why the fetch failed.
+            as_of (float): Unix time the stored data was last fetched.
+        """
+        age = time.time() - as_of
+        self.staleness[filename] = {'as_of' : time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(as_of))
+                                  , 'age_hours' : round(age / 3600, 2)
+                                  , 'error' : str(error)}
+        logging.warning(f'{filename} fetch failed ({error}); using the last good Bronze data, {age / 3600:.1f} hours old')
+
+    @staticmethod
+    def periods(raw_data : pd.DataFrame
+              , spec : Series) -> pd.Series:
+        """Year of each Bronze row, from the period field of the series source."""
+        period = raw_data[SOURCE_FIELDS[spec.source]['period']]
+        if pd.api.types.is_datetime64_any_dtype(period):
+            return period.dt.year
+        return pd.to_numeric(period
+                           , errors = 'coerce')
+
+    def seed_partitions(self
+                      , spec : Series
+                      , folder : str) -> dict:
+        """
+        Split the flat Bronze file of a series (Bronze/<filename>, as written before Bronze was partitioned) into its year partitions, so an upgraded install still has stored data to fall back to when its first fetch fails. The partitions keep the flat file modification time, the age its staleness is reported with.
+
+        Args:
+            spec (Series): Registered series.
+            folder (str): The series partition directory, empty.
+
+        Returns:
+            dict: Partition path by period; empty when there is no flat file.
+        """
+        path = os.path.join(self.bronze_folder
+                          , spec.filename)
+        if not os.path.exists(path):
+            return {}
+        legacy = pd.read_parquet(path)
+        modified = os.path.getmtime(path)
+        stored = {}
+        for period, partition in legacy.groupby(self.periods(legacy
+                                                           , spec)):
+            stored[int(period)] = os.path.join(folder
+                                             , f'{int(period)}.parquet')
+            # Written now rather than queued: the fetch that follows may already read them back
+            self.writer.write_now(pa.Table.from_pandas(partition)
+                                , stored[int(period)]
+                                , (SOURCE_FIELDS[spec.source]['key'],))
+            os.utime(stored[int(period)]
+                   , (modified, modified))
+        logging.info(f'{spec.filename}: seeded {len(stored)} Bronze partitions from the flat file')
+        return stored
+
+    def incremental_fetch(self
+                        , spec : Series
+                        , year : Optional[int]
+                        , r_code : Optional[str] = None) -> pd.DataFrame:
+        """
+        Fetch only periods newer than the series high-water mark and append them as Bronze partitions (one parquet per year under a folder named after the series file). Every reconcile interval, or when the stored partitions drift from the mark, the series is fetched in full and its partitions rewritten.
+
+        Args:
+            spec (Series): Registered series to fetch.
+            year (Optional[int]): Year filter for the data fetched, or None for every period.
+            r_code (Optional[str]): R code to ipeadatar, used as fallback when the IPEA data API fetch fails.
+
+        Returns:
+            DataFrame: Every stored period of the series, new partitions included.
+        """
+        folder = os.path.join(self.bronze_folder
+                            , os.path.splitext(spec.filename)[0])
+        os.makedirs(folder
+                  , exist_ok = True)
+        stored = {int(os.path.splitext(name)[0]) : os.path.join(folder, name)
+                  for name in os.listdir(folder) if name.endswith('.parquet')}
+        if not stored:
+            stored = self.seed_partitions(spec
+                                        , folder)
+        stored_rows = sum(pq.ParquetFile(path).metadata.num_rows for path in stored.values())
+        full = self.watermarks.reconcile_due(spec.series_id
+                                           , stored_rows)
+        since = None if full else self.watermarks.get(spec.series_id)['period']
+
+        stale, fetched = False, {}
+        try:
+            if since is not None and year is not None and year <= since:
+                new_data = None # The requested year is already stored
+            elif spec.source == 'api':
+                try:
+                    new_data = self.fetch_policy.call(self.api_fetch
+                                                    , spec.series_id
+                                                    , year
+                                                    , level = spec.level
+                                                    , since = since)
+                except Exception as e:
+                    if r_code is None:
+                        raise
+                    logging.warning(f'IPEA API fetch failed for {spec.filename} ({e}), falling back to ipeadatar')
+                    # R isn't thread-safe, so no hedge and no retry racing an abandoned attempt
+                    new_data = self.fetch_policy.call(self.r_fetch
+                                                    , r_code
+                                                    , hedge = False
+                                                    , retries = 0)
+            else:
+                filters = {'year' : year} if year is not None else {'yearGreaterThan' : since} if since is not None else {}
+                new_data = pd.DataFrame(self.fetch_policy.call(ipea.timeseries
+                                                             , series = spec.series_id
+                                                             , **filters))
+        except Exception as e:
+            if not stored:
+                raise
+            mark = self.watermarks.get(spec.series_id)
+            self.mark_stale(spec.filename
+                          , e
+                          , mark['updated'] if mark else max(os.path.getmtime(path) for path in stored.values()))
+            new_data, stale = None, True
+
+        if new_data is not None:
+            # ipeadatar has no server-side filters, so periods are also cut here
+            periods = self.periods(new_data
+                                 , spec)
+            keep = periods.notnull()
+            if year is not None:
+                keep &= periods == year
+            if since is not None:
+                keep &= periods > since
+            new_data, periods = new_data[keep], periods[keep].astype(int)
+            # A reconcile prunes stored periods the reply no longer has, but only when the reply has rows and spans
+            # every stored period in the reconciled range; an empty or truncated reply keeps Bronze as it is
+            in_range = [period for period in stored if year is None or period == year]
+            if full and len(periods) and in_range and periods.min() <= min(in_range) and periods.max() >= max(in_range):
+                for period in set(in_range) - set(periods):
+                    os.remove(stored.pop(period))
+            for period, partition in new_data.groupby(periods):
+                self.saving_step(partition
+                               , folder
+                               , f'{period}.parquet'
+                               , sort_by = (SOURCE_FIELDS[spec.source]['key'],))
+                stored[period] = os.path.join(folder
+                                            , f'{period}.parquet')
+                fetched[period] = partition
+            logging.info(f'{spec.filename}: {len(new_data)} rows over {periods.nunique()} new periods ({"full" if full else f"after {since}"})')
+
+        # New partitions come from memory, as their files may still be queued for writing
+        raw_data = pd.concat([fetched[period] if period in fetched else pd.read_parquet(stored[period]) for period in sorted(stored)]
+                           , ignore_index = True) if stored else new_data
+        if stored and not stale:
+            self.watermarks.update(spec.series_id
+                                 , max(stored)
+                                 , len(raw_data)
+                                 , full)
+        return raw_data
+
+    @tracer.traced('silver_transform', 'filename')
     def silver_transform(self
                        , transf_df : pd.DataFrame
                        , filename : str) -> Optional[pd.DataFrame]:
         """
-        Process Bronze layer data to get it ready to consolidate. Removing unused data, Relabeling fields and Row filtering.
+        Process Bronze layer territories data to get it ready to consolidate. Removing unused data, Relabeling fields and Row filtering.
 
         Args:
-            transf_df (DataFrame): DataFrame from Series ID fetched at IPEA.
+            transf_df (DataFrame): DataFrame from territories fetched at IPEA.
             filename (str): Filename to save the data fetched.
 
         Returns:
-            DataFrame: Processed data as pandas DataFrame, then saving at Silver layer, or None if an error occurs (with an error log).
+            DataFrame: Processed data as pandas DataFrame indexed by CodMunIBGE, then saving at Silver layer, or None if an error occurs (with an error log).
         """
-        start_time = time.time()
         try:
-            if 'IDHM_2010.parquet' in filename:
-                date_filter = pd.to_datetime('2010-01-01')
-                transf_df = transf_df.query("(uname == 'Municipality') & (date == @date_filter)") \
-                       .drop(columns = ['code'
-                                      , 'uname'
-                                      , 'date']) \
-                       .rename(columns = {'tcode' : 'CodMunIBGE'
-                                        , 'value' : 'IDHM 2010'})
-            elif filename == 'Municípios.parquet':
-                transf_df = transf_df.query("LEVEL == 'Municípios'") \
-                       .drop(columns = ['LEVEL'
-                                      , 'AREA'
-                                      , 'CAPITAL']) \
-                       .rename(columns = {'NAME' : 'Município'
-                                        , 'ID' : 'CodMunIBGE'})
-            else:
-                transf_df = transf_df.query("NIVNOME == 'Municípios'") \
-                       .drop(columns = ['CODE'
-                                      , 'RAW DATE'
-                                      , 'YEAR'
-                                      , 'NIVNOME'])
-                if 'PIB_2010.parquet' in filename:
-                    transf_df['VALUE (R$ (mil), a preços do ano 2010)'] = transf_df['VALUE (R$ (mil), a preços do ano 2010)'].astype(float) * 1000
-                    transf_df['VALUE (R$ (mil), a preços do ano 2010)'] = transf_df['VALUE (R$ (mil), a preços do ano 2010)'].round(3)
-                    transf_df = transf_df.rename(columns = {'TERCODIGO' : 'CodMunIBGE'
-                                                          , 'VALUE (R$ (mil), a preços do ano 2010)' : 'PIB 2010 (R$)'})
-                    transf_df['PIB 2010 (R$)'] = pd.to_numeric(transf_df['PIB 2010 (R$)']
-                                                                       , errors = 'coerce')
-                elif 'RecCorr_2010.parquet' in filename:
-                    transf_df['VALUE (R$)'] = transf_df['VALUE (R$)'].astype(float).round(2)
-                    transf_df = transf_df.rename(columns = {'TERCODIGO' : 'CodMunIBGE'
-                                                          , 'VALUE (R$)' : 'Receitas Correntes 2010 (R$)'})
-                    transf_df['Receitas Correntes 2010 (R$)'] = pd.to_numeric(transf_df['Receitas Correntes 2010 (R$)']
-                                                                            , errors = 'coerce')
-                elif 'População_2010.parquet' in filename:
-                    transf_df = transf_df.rename(columns = {'TERCODIGO' : 'CodMunIBGE'
-                                                          , 'VALUE (Habitante)' : 'Habitantes 2010'})
-                    transf_df = transf_df.astype({'Habitantes 2010' : int
-                                                , 'CodMunIBGE' : str}
-                                                , errors = 'ignore')
+            # Registered series go through silver_series; only the territories dimension is left here
+            if filename != 'Municípios.parquet':
+                raise ValueError(f'{filename} is not a territories dimension; registered series are processed by silver_series')
+            transf_df = transf_df.query("LEVEL == 'Municípios'") \
+                   .drop(columns = ['LEVEL'
+                                  , 'AREA'
+                                  , 'CAPITAL']) \
+                   .rename(columns = {'NAME' : 'Município'
+                                    , 'ID' : 'CodMunIBGE'})
 
+            transf_df = self.validate_keys(transf_df
+                                         , filename)
             self.saving_step(transf_df
                            , self.silver_folder
                            , filename)
-            elapsed_time = time.time() - start_time
-            logging.info(f"Silver transforming {filename} in {elapsed_time:.2f} seconds")
-            return transf_df
+            tracer.current().rows = len(transf_df)
+            # Validated keys become the index the Gold joins reuse
+            return transf_df.set_index('CodMunIBGE')
         except Exception as e:
+            tracer.current().fail(e)
             logging.error(f'Error transforming data for {filename}: {e}')
             return None
 
+    @tracer.traced('silver_series', 'filename')
+    def silver_series(self
+                    , bronze : dict
+                    , filename : str = 'Series.parquet') -> Optional[pd.DataFrame]:
+        """
+        Process every registered series Bronze data in a single long-format pass. Level and period filtering, unit scaling, rounding and relabeling all come from SERIES_REGISTRY.
+
+        Args:
+            bronze (dict): Bronze DataFrame per series ID; None values (failed fetches) are skipped.
+            filename (str): Filename to save the long data at Silver layer.
+
+        Returns:
+            DataFrame: Long data with Série (series ID), CodMunIBGE, Período and Valor, then saving at Silver layer, or None if an error occurs (with an error log).
+        """
+        try:
+            frames = []
+            for series_id, raw_data in bronze.items():
+                if raw_data is None:
+                    continue
+                spec = SERIES_REGISTRY[series_id]
+                fields = SOURCE_FIELDS[spec.source]
+                period = raw_data[fields['period']]
+                frames.append(pd.DataFrame({'Série' : spec.series_id
+                                          , 'Nível' : raw_data[fields['level']]
+                                          , 'Período' : period.dt.year if pd.api.types.is_datetime64_any_dtype(period) else pd.to_numeric(period, errors = 'coerce')
+                                          , 'CodMunIBGE' : raw_data[fields['key']]
+                                          , 'Valor' : pd.to_numeric(raw_data[spec.value_field], errors = 'coerce')}))
+            long = pd.concat(frames
+                           , ignore_index = True)
+
+            specs = pd.DataFrame({'Série' : [spec.series_id for spec in SERIES]
+                                , 'level' : [spec.level if spec.source == 'ipeadatapy' else IPEA_LEVELS[spec.level] for spec in SERIES]
+                                , 'year' : [spec.year for spec in SERIES]
+                                , 'scale' : [spec.scale for spec in SERIES]
+                                , 'decimals' : [spec.decimals for spec in SERIES]}
+                               , dtype = object).set_index('Série')
+            rules = specs.reindex(long['Série'])
+            keep = (long['Nível'].to_numpy() == rules['level'].to_numpy()) & \
+                   (rules['year'].isnull().to_numpy() | (long['Período'].to_numpy() == rules['year'].to_numpy(dtype = float)))
+            long = long[keep]
+            rules = rules[keep]
+            values = long['Valor'].to_numpy(dtype = float) * rules['scale'].to_numpy(dtype = float)
+            decimals = rules['decimals'].to_numpy(dtype = float)
+            factor = 10 ** np.nan_to_num(decimals)
+            long = long.assign(Valor = np.where(np.isnan(decimals), values, np.round(values * factor) / factor))[['Série', 'CodMunIBGE', 'Período', 'Valor']]
+
+            long = self.validate_keys(long
+                                    , filename
+                                    , keys = ['Série', 'CodMunIBGE', 'Período'])
+            self.saving_step(long
+                           , self.silver_folder
+                           , filename)
+            self.series_long = long
+            tracer.current().rows = len(long)
+            return long
+        except Exception as e:
+            tracer.current().fail(e)
+            logging.error(f'Error transforming series for {filename}: {e}')
+            return None
+
+    @tracer.traced('validate_keys', 'filename')
+    def validate_keys(self
+                    , transf_df : pd.DataFrame
+                    , filename : str
+                    , keys : list = ['CodMunIBGE']) -> pd.DataFrame:
+        """
+        Check CodMunIBGE integrity on a Silver DataFrame before it reaches the Gold joins. Type mismatches are normalised, invalid keys dropped, orphans reported and duplicates handled by the dedupe policy.
+
+        Args:
+            transf_df (DataFrame): Transformed Silver data with a CodMunIBGE column.
+            filename (str): Filename the data is saved to, for the report.
+            keys (list): Columns that identify a row; CodMunIBGE alone, or with Série and Período for long data.
+
+        Returns:
+            DataFrame: Data with 7-digit string CodMunIBGE keys, rows unique by keys unless the dedupe policy is 'keep'. Raises ValueError on duplicates under the 'error' policy.
+        """
+        codes = transf_df['CodMunIBGE']
+        # Type mismatches: keys not held as strings (int, float or mixed columns)
+        mismatched = codes.astype(str).ne(codes) & codes.notnull()
+        numeric = pd.to_numeric(codes
+                              , errors = 'coerce')
+        invalid = numeric.isnull() | numeric.mod(1).ne(0) | ~numeric.between(1000000, 9999999)
+        transf_df = transf_df[~invalid].copy()
+        transf_df['CodMunIBGE'] = numeric[~invalid].astype('int64').astype(str)
+        codes = transf_df['CodMunIBGE']
+        # Orphans: keys outside every known UF
+        orphans = ~codes.str[:2].isin(list(UF_CODES))
+        duplicated = transf_df.duplicated(subset = keys
+                                        , keep = False)
+        report = {'rows' : len(numeric)
+                , 'type_mismatches' : int(mismatched.sum())
+                , 'invalid' : int(invalid.sum())
+                , 'orphans' : int(orphans.sum())
+                , 'duplicate_keys' : len(transf_df.loc[duplicated, keys].drop_duplicates())
+                , 'duplicate_rows' : int(duplicated.sum())}
+        self.key_reports[filename] = report
+        if report['invalid'] or report['orphans'] or report['duplicate_keys']:
+            logging.warning(f'Key integrity issues in {filename}: {report}')
+
+        if report['duplicate_keys']:
+            if self.dedupe_policy == 'error':
+                raise ValueError(f"{report['duplicate_keys']} duplicated {keys} keys in {filename}")
+            if self.dedupe_policy in ('first', 'last'):
+                transf_df = transf_df.drop_duplicates(subset = keys
+                                                    , keep = self.dedupe_policy)
+        return transf_df
+
+    @tracer.traced('gold_finish', 'filename')
     def gold_finish(self
                   , filename : str) -> pd.DataFrame:
         """
@@ -193,22 +1659,31 @@ class DataProcessor:
         Returns:
             DataFrame: Processed data as a single pandas DataFrame, then saving at Gold layer and DuckDB, or None if an error occurs. Also, Descriptive Summary as a csv file, then saving at Statistical Analysis folder, or None if an error occurs.
         """
-        start_time = time.time()
         try:
-            df = self.join_list[0]
-            for transf_df in self.join_list[1:]:
-                transf_df['CodMunIBGE'] = transf_df['CodMunIBGE'].astype(str)
-                df = df.merge(transf_df
-                            , how = 'left'
-                            , on = 'CodMunIBGE')
+            # Registered series pivot once from long to one column each
+            cross_section = self.series_long[self.series_long['Período'] == GOLD_YEAR]
+            wide = cross_section.groupby(['CodMunIBGE', 'Série']
+                                       , sort = False)['Valor'].first().unstack() \
+                .rename(columns = {spec.series_id : spec.column for spec in SERIES})
+            wide.columns.name = None
+            base, others = wide, self.join_list
+            # Keys a left join on the series would silently drop
+            for transf_df in others:
+                orphans = transf_df.index.difference(base.index)
+                if len(orphans):
+                    logging.warning(f'{len(orphans)} CodMunIBGE keys of {list(transf_df.columns)} have no match in {list(base.columns)}')
             order_set = ['CodMunIBGE'
-                       , 'Município'
-                       , 'Habitantes 2010'
-                       , 'IDHM 2010'
-                       , 'Receitas Correntes 2010 (R$)'
-                       , 'PIB 2010 (R$)'
-                       , 'Carga Tributária Municipal 2010']
-            df = df.reindex(columns = order_set)
+                       , 'Município'] + [spec.column for spec in SERIES] + ['Carga Tributária Municipal 2010']
+            # Single index-aligned join over the key indexes; over the memory budget, on row chunks of the pivoted series
+            rows = chunk_rows([base] + others
+                            , self.memory_budget) or max(len(base), 1)
+            chunks = []
+            for start in range(0, max(len(base), 1), rows):
+                chunk = base.iloc[start:start + rows].join(others
+                                                           , how = 'left')
+                chunks.append(chunk.reset_index().reindex(columns = order_set))
+            df = pd.concat(chunks
+                         , ignore_index = True) if len(chunks) > 1 else chunks[0]
             df.sort_values(by = 'CodMunIBGE'
                          , inplace = True)
             df['Carga Tributária Municipal 2010'] = df['Receitas Correntes 2010 (R$)'].div(df['PIB 2010 (R$)']
@@ -222,29 +1697,203 @@ class DataProcessor:
             summary = df.describe()
             print('Descriptive Statistics:\n'
                 , summary)
-            summary.to_parquet(os.path.join(self.statistical_analysis_folder
-                                          , 'Descriptive Statistics Initial Analysis.parquet'))
+            self.saving_step(summary
+                           , self.statistical_analysis_folder
+                           , 'Descriptive Statistics Initial Analysis.parquet'
+                           , sort_by = ())
 
+            # Which inputs came from an earlier run, and how old they are ({} when every fetch succeeded)
+            if self.staleness:
+                logging.warning(f'Gold built with stale Bronze data: {self.staleness}')
             self.saving_step(df
                            , self.gold_folder
-                           , filename)
+                           , filename
+                           , metadata = {'ipea_bronze_staleness' : self.staleness})
             
             # Save DataFrame to DuckDB
             conn = ddb.connect(self.db_path)
             conn.execute('CREATE TABLE IF NOT EXISTS df AS SELECT * FROM df')
             conn.close()
-            elapsed_time = time.time() - start_time
-            logging.info(f"Gold finishing {filename} in {elapsed_time:.2f} seconds")
+            self.rollup_cube(df)
+            self.correlation_finish(df)
+            tracer.current().rows = len(df)
             return df
         except Exception as e:
-            logging.error(f'Error finalizing data for {filename}: {e}')
+            tracer.current().fail(e)
+            logging.error(f'Error finalizing data for {filename}: {e}')
+            return None
+
+    @tracer.traced('amc_finish', 'filename')
+    def amc_finish(self
+                 , crosswalk : 'AMCCrosswalk'
+                 , geodata : Optional[gpd.GeoDataFrame] = None
+                 , filename : str = 'AMCData.parquet') -> Optional[gpd.GeoDataFrame]:
+        """
+        Gold cross-section re-aggregated to Áreas Mínimas Comparáveis, following the series registry aggregations.
+
+        Args:
+            crosswalk (AMCCrosswalk): Municipality to AMC aggregation.
+            geodata (Optional[GeoDataFrame]): Municipality polygons to dissolve into AMC polygons (cached), or None for attributes only.
+            filename (str): Filename to save the AMC data at Gold layer.
+
+        Returns:
+            GeoDataFrame: One row per AMC with the registered series, tax burden and UF (plus geometry when geodata is given), then saving at Gold layer, or None if an error occurs.
+        """
+        try:
+            long = crosswalk.aggregate_long(self.series_long[self.series_long['Período'] == GOLD_YEAR])
+            amc = long.pivot(index = 'AMC'
+                           , columns = 'Série'
+                           , values = 'Valor') \
+                .rename(columns = {spec.series_id : spec.column for spec in SERIES}) \
+                .reindex(columns = [spec.column for spec in SERIES]) \
+                .reset_index()
+            amc.columns.name = None
+            amc['Carga Tributária Municipal 2010'] = amc['Receitas Correntes 2010 (R$)'].div(amc['PIB 2010 (R$)']).astype(float)
+            amc['UF'] = amc['AMC'].map(crosswalk.uf)
+            if geodata is not None:
+                amc = crosswalk.geometries(geodata)[['AMC', 'geometry']].merge(amc
+                                                                              , how = 'right'
+                                                                              , on = 'AMC')
+            self.saving_step(geoparquet_table(amc) if geodata is not None else amc
+                           , self.gold_folder
+                           , filename
+                           , sort_by = ('AMC',))
+            return amc
+        except Exception as e:
+            tracer.current().fail(e)
+            logging.error(f'Error aggregating AMC data for {filename}: {e}')
+            return None
+
+    @tracer.traced('correlation_finish', 'filename')
+    def correlation_finish(self
+                         , df : pd.DataFrame
+                         , filename : str = 'CorrelationData.parquet') -> Optional[pd.DataFrame]:
+        """
+        Pearson, Spearman and Kendall tau-b matrices of the Gold indicators, kept for the analysis report and saved in long form.
+
+        Args:
+            df (DataFrame): Finished data at Gold layer.
+            filename (str): Filename to save the matrices at Gold layer.
+
+        Returns:
+            DataFrame: Método, Variável X, Variável Y, Correlação and N per indicator pair, then saving at Gold layer, or None if an error occurs.
+        """
+        try:
+            self.correlations = correlation_matrices(df)
+            counts = self.correlations['n'].stack(future_stack = True)
+            long = pd.concat([matrix.stack(future_stack = True).rename('Correlação').to_frame().assign(N = counts.to_numpy()
+                                                                                 , Método = method)
+                              for method, matrix in self.correlations.items() if method != 'n']) \
+                .rename_axis(['Variável X', 'Variável Y']).reset_index()[['Método', 'Variável X', 'Variável Y', 'Correlação', 'N']]
+            self.saving_step(long
+                           , self.gold_folder
+                           , filename)
+            return long
+        except Exception as e:
+            tracer.current().fail(e)
+            logging.error(f'Error computing correlations for {filename}: {e}')
+            return None
+
+    @tracer.traced('rollup_cube', 'filename')
+    def rollup_cube(self
+                  , df : pd.DataFrame
+                  , filename : str = 'RollupData.parquet') -> Optional[pd.DataFrame]:
+        """
+        Materialise Gold data as a Municipality → UF → Region → Brazil rollup. Only UFs with changed municipality rows are regrouped against the stored cube.
+
+        Args:
+            df (DataFrame): Finished data at Gold layer.
+            filename (str): Filename to save the rollup at Gold layer.
+
+        Returns:
+            DataFrame: Rollup with additive measures, population-weighted IDHM, aggregate tax burden and complete/incomplete counts per level, then saving at Gold layer and DuckDB, or None if an error occurs.
+        """
+        try:
+            code = df['CodMunIBGE'].astype(str)
+            municipalities = pd.DataFrame({'Nível' : 'Município'
+                                         , 'Região' : code.str[:1].map(REGIONS)
+                                         , 'UF' : code.str[:2].map(UF_CODES)
+                                         , 'CodMunIBGE' : code
+                                         , 'Município' : df['Município']
+                                         , 'Municípios Completos' : (df['data_status'] == 'complete').astype(int)
+                                         , 'Municípios Incompletos' : (df['data_status'] == 'incomplete').astype(int)
+                                         , 'Habitantes 2010' : df['Habitantes 2010'].astype(float)
+                                         , 'IDHM x Habitantes 2010' : (df['IDHM 2010'] * df['Habitantes 2010']).astype(float)
+                                         , 'Habitantes com IDHM 2010' : df['Habitantes 2010'].where(df['IDHM 2010'].notnull()).astype(float)
+                                         , 'Receitas Correntes 2010 (R$)' : df['Receitas Correntes 2010 (R$)']
+                                         , 'PIB 2010 (R$)' : df['PIB 2010 (R$)']})
+            measures = ['Municípios Completos'
+                      , 'Municípios Incompletos'
+                      , 'Habitantes 2010'
+                      , 'IDHM x Habitantes 2010'
+                      , 'Habitantes com IDHM 2010'
+                      , 'Receitas Correntes 2010 (R$)'
+                      , 'PIB 2010 (R$)']
+
+            path = os.path.join(self.gold_folder
+                              , filename)
+            changed_ufs = set(municipalities['UF'])
+            previous = None
+            if os.path.exists(path):
+                previous = pd.read_parquet(path)
+                tracer.current().bytes_read = os.path.getsize(path)
+            if previous is not None:
+                old = previous[previous['Nível'] == 'Município']
+                compare = municipalities.merge(old[['CodMunIBGE', 'UF'] + measures]
+                                             , how = 'outer'
+                                             , on = 'CodMunIBGE'
+                                             , suffixes = ('', ' old')
+                                             , indicator = True)
+                differs = compare['_merge'] != 'both'
+                for measure in measures:
+                    new_value, old_value = compare[measure], compare[f'{measure} old']
+                    differs |= (new_value != old_value) & ~(new_value.isnull() & old_value.isnull())
+                changed_ufs = set(compare.loc[differs, 'UF'].dropna()) | set(compare.loc[differs, 'UF old'].dropna())
+
+            states = municipalities[municipalities['UF'].isin(changed_ufs)] \
+                .groupby(['Região', 'UF'], as_index = False)[measures].sum(min_count = 1)
+            if previous is not None:
+                kept = previous[(previous['Nível'] == 'UF') & ~previous['UF'].isin(changed_ufs) & previous['UF'].isin(municipalities['UF'])]
+                states = pd.concat([kept[['Região', 'UF'] + measures], states]
+                                 , ignore_index = True)
+            states['Nível'] = 'UF'
+            regions = states.groupby('Região', as_index = False)[measures].sum(min_count = 1)
+            regions['Nível'] = 'Região'
+            country = states[measures].sum(min_count = 1).to_frame().T
+            country['Nível'] = 'Brasil'
+
+            cube = pd.concat([country, regions, states.sort_values('UF'), municipalities]
+                           , ignore_index = True)
+            cube['IDHM 2010'] = cube['IDHM x Habitantes 2010'] / cube['Habitantes com IDHM 2010']
+            cube['Carga Tributária Municipal 2010'] = cube['Receitas Correntes 2010 (R$)'] / cube['PIB 2010 (R$)']
+            cube = cube.reindex(columns = ['Nível'
+                                         , 'Região'
+                                         , 'UF'
+                                         , 'CodMunIBGE'
+                                         , 'Município'] + measures + ['IDHM 2010'
+                                                                     , 'Carga Tributária Municipal 2010'])
+
+            self.saving_step(cube
+                           , self.gold_folder
+                           , filename)
+            conn = ddb.connect(self.db_path)
+            conn.execute('CREATE OR REPLACE TABLE rollup AS SELECT * FROM cube')
+            conn.close()
+            self.rollup = cube
+            tracer.current().rows = len(cube)
+            logging.info(f"Rolled up {filename} with {len(changed_ufs)} UFs refreshed")
+            return cube
+        except Exception as e:
+            tracer.current().fail(e)
+            logging.error(f'Error rolling up data for {filename}: {e}')
             return None
 
+    @tracer.traced('process_data', 'filename')
     def process_data(self
                    , series : str
                    , year : int
                    , filename : str
-                   , r_code : Optional[str] = None) -> None:
+                   , r_code : Optional[str] = None) -> Optional[pd.DataFrame]:
         """
         Setting workflow parameters to fetch, process and save data. Fetching data parameters, directories and consolidation before Gold layer.
 
@@ -257,9 +1906,8 @@ class DataProcessor:
         Returns:
             DataFrame: If there is no Data, do bronze_fetch,\n
             if bronze_fetch is done, and silver_transform isn't, do silver_transform,\n
-            if silver_transform is done, prepare pandas DataFrame to be processed at gold_finish.
+            if silver_transform is done, prepare pandas DataFrame to be processed at gold_finish, and return it (None if a step failed).
         """
-        start_time = time.time()
         bronze_df = self.bronze_fetch(series
                                     , year
                                     , filename
@@ -269,29 +1917,71 @@ class DataProcessor:
                                             , filename)
             if silver_df is not None:
                 self.join_list.append(silver_df)
-        elapsed_time = time.time() - start_time
-        logging.info(f"Processing data {filename} in {elapsed_time:.2f} seconds")
+            return silver_df
+        return None
+
+    @tracer.traced('panel_regression')
+    def panel_regression(self
+                       , cluster : str = 'UF'
+                       , crosswalk : Optional['AMCCrosswalk'] = None) -> str:
+        """
+        Municipality (or AMC) × year fixed-effects regression of IDHM on tax burden and PIB, over every period kept at Silver.
+
+        Args:
+            cluster (str): 'UF' or 'CodMunIBGE', the level standard errors are clustered at ('CodMunIBGE' means the panel unit).
+            crosswalk (Optional[AMCCrosswalk]): Re-aggregate to Áreas Mínimas Comparáveis first, so units keep the same boundaries across years.
+
+        Returns:
+            str: Coefficient and fit statistics tables as HTML, or a note when the Silver data can't support a panel.
+        """
+        if self.series_long is None:
+            return '<p>No Silver series data for a panel regression.</p>'
+        long, unit = self.series_long, 'CodMunIBGE'
+        if crosswalk is not None:
+            long, unit = crosswalk.aggregate_long(long), 'AMC'
+        panel = long.groupby([unit, 'Período', 'Série'])['Valor'].first().unstack().reset_index()
+        panel['UF'] = panel[unit].map(crosswalk.uf) if crosswalk is not None else panel[unit].str[:2].map(UF_CODES)
+        try:
+            panel['Carga Tributária Municipal'] = panel['RECORRM'].div(panel['PIB_IBGE_5938_37'])
+            table, stats = panel_fixed_effects(panel
+                                             , 'ADH_IDHM'
+                                             , ['Carga Tributária Municipal', 'PIB_IBGE_5938_37']
+                                             , unit = unit
+                                             , cluster = 'UF' if cluster == 'UF' else unit)
+        except (KeyError, ValueError) as e:
+            logging.warning(f'Panel regression skipped: {e}')
+            return f'<p>Panel regression skipped: {e}. Registered series with year = None keep every period at Silver.</p>'
+        table = table.rename(index = {'PIB_IBGE_5938_37' : 'PIB (R$)'})
+        print('Fixed Effects Panel Regression:\n'
+            , table
+            , '\n'
+            , stats)
+        tracer.current().rows = stats['Observations']
+        return table.to_html(classes = 'table table-striped text-center') + \
+               pd.Series(stats).to_frame('IDHM').to_html(classes = 'table table-striped text-center')
 
+    @tracer.traced('analyze_data')
     def analyze_data(self
-                   , df : pd.DataFrame) -> None:
+                   , df : pd.DataFrame
+                   , panel_cluster : str = 'UF'
+                   , crosswalk : Optional['AMCCrosswalk'] = None) -> None:
         """
         Statistical calculations to the finished data. Stablishing a correlation matrix, applying Linear Regression and ANOVA to the given variables.
 
         Args:
             data (DataFrame): Finished data at Gold layer, ready to use.
-            
+            panel_cluster (str): Level the panel regression standard errors are clustered at ('UF' or 'CodMunIBGE').
+            crosswalk (Optional[AMCCrosswalk]): Run the panel regression over AMCs instead of municipalities.
+
         Returns:
             Statistical Model calculations and conversion to HTML.\n
-            Correlation Matrix, Linear Regression and ANOVA, all saved in a single HTML file at Statistical Analysis folder.
+            Correlation Matrix, Regional Rollup (when gold_finish materialised it), Linear Regression, ANOVA, the report figures and the fixed-effects panel regression, all saved in a single HTML file at Statistical Analysis folder. The figures are also assembled as Plots.pdf.
         """
-        start_time = time.time()
         try:
-            corr_matrix = df[['IDHM 2010'
-                            , 'Carga Tributária Municipal 2010'
-                            , 'PIB 2010 (R$)']].corr(method = 'pearson')
-            print('Correlation Matrix:\n'
-                , corr_matrix)
-            corr_matrix_html = corr_matrix.to_html()
+            correlations = self.correlations if self.correlations is not None else correlation_matrices(df)
+            for method in ('pearson', 'spearman', 'kendall'):
+                print(f'Correlation Matrix ({method.capitalize()}):\n'
+                    , correlations[method])
 
             model = smf.ols(formula = "Q('IDHM 2010') ~ Q('Carga Tributária Municipal 2010') + Q('PIB 2010 (R$)')"
                           , data = df).fit()
@@ -304,9 +1994,34 @@ class DataProcessor:
                 , anova_table)
             anova_html = anova_table.to_html()
 
-            corr_matrix_html = corr_matrix.to_html(classes = 'table table-striped text-center')
+            # Rank correlations hold up against the PIB and revenue outliers Pearson is pulled by
+            corr_matrix_html = '\n'.join(f"<h3>{title}</h3>" + correlations[method].round(3).to_html(classes = 'table table-striped text-center')
+                                         for method, title in [('pearson', 'Pearson')
+                                                             , ('spearman', 'Spearman')
+                                                             , ('kendall', 'Kendall tau-b')
+                                                             , ('n', 'Pairwise observations')])
             anova_html = anova_table.to_html(classes = 'table table-striped text-center')
 
+            # Regional totals served straight from the Gold rollup cube
+            rollup_html = ''
+            if self.rollup is not None:
+                rollup_html = self.rollup[self.rollup['Nível'].isin(['Brasil', 'Região'])] \
+                    .drop(columns = ['UF'
+                                   , 'CodMunIBGE'
+                                   , 'Município'
+                                   , 'IDHM x Habitantes 2010'
+                                   , 'Habitantes com IDHM 2010']) \
+                    .to_html(classes = 'table table-striped text-center'
+                           , index = False)
+
+            panel_html = self.panel_regression(panel_cluster
+                                             , crosswalk)
+            # Same figures as Plots.pdf, over complete data; only changed figures are re-rendered
+            figures_html = ReportBuilder(os.path.join(self.statistical_analysis_folder
+                                                    , 'Figures')).build(df[df['data_status'] == 'complete']
+                                                                      , os.path.join(self.statistical_analysis_folder
+                                                                                   , 'Plots.pdf'))
+
             html_report = f"""
     <html>
     <head>
@@ -328,6 +2043,10 @@ class DataProcessor:
             <h2>Correlation Matrix</h2>
             {corr_matrix_html}
         </section>
+        <section>
+            <h2>Regional Rollup</h2>
+            {rollup_html}
+        </section>
         <section>
             <h2>ANOVA Results</h2>
             {anova_html}
@@ -338,28 +2057,42 @@ class DataProcessor:
                 {model_summary}
             </div>
         </section>
+        <section>
+            <h2>Figures</h2>
+            {figures_html}
+        </section>
+        <section>
+            <h2>Fixed Effects Panel Regression ({'AMC' if crosswalk is not None else 'Municipality'} × Year)</h2>
+            {panel_html}
+        </section>
     </body>
     </html>
     """
 
             report_filename = os.path.join(self.statistical_analysis_folder
                                          , 'Analysis Report.html')
-            with open(report_filename
-                    , 'w') as f:
-                f.write(html_report)
-            elapsed_time = time.time() - start_time
-            logging.info(f"Analyzing data {report_filename} in {elapsed_time:.2f} seconds")
+            # Rewritten only when its content changed
+            previous = None
+            if os.path.exists(report_filename):
+                with open(report_filename) as f:
+                    previous = f.read()
+            if previous != html_report:
+                with open(report_filename
+                        , 'w') as f:
+                    f.write(html_report)
+            span = tracer.current()
+            span.rows = len(df)
+            span.bytes_written = os.path.getsize(report_filename)
         except Exception as e:
+            tracer.current().fail(e)
             logging.error(f'Error analyzing data: {e}')
 
 class Database:
+    @tracer.traced('database_init')
     def __init__(self):
         """Create connection to DuckDB database."""
-        start_time = time.time()
         self._install_extensions()
         self.conn = ddb.connect('ipea.db')
-        elapsed_time = time.time() - start_time
-        logging.info(f"Initialized database in {elapsed_time:.2f} seconds")
 
     def _install_extensions(self):
         """Install extensions to DuckDB database."""
@@ -375,6 +2108,7 @@ class DataFetcher:
                , db_path : str):
         self.db_path = db_path
 
+    @tracer.traced('fetch_data')
     def fetch_data(self) -> pd.DataFrame:
         """
         Load data from DuckDB database.
@@ -382,79 +2116,1389 @@ class DataFetcher:
         Returns:
             DataFrame: The finished pandas DataFrame.
         """
-        start_time = time.time()
         try:
             conn = ddb.connect(self.db_path)
             df = conn.execute('SELECT * FROM df').fetchdf()
             conn.close()
-            elapsed_time = time.time() - start_time
-            logging.info(f"Fetched data in {elapsed_time:.2f} seconds")
+            tracer.current().rows = len(df)
             return df
         except Exception as e:
+            tracer.current().fail(e)
             logging.error(f'Error loading data from DuckDB: {e}')
             return None
 
-    def fetch_geodata(self) -> gpd.GeoDataFrame:
+    @tracer.traced('fetch_geodata')
+    def fetch_geodata(self
+                    , tolerance : Optional[float] = None) -> gpd.GeoDataFrame:
         """
         Fetch geodata from Municipalities geobr database.
 
+        Args:
+            tolerance (Optional[float]): Simplification tolerance applied to the polygons, or None to keep them as fetched.
+
         Returns:
             GeoDataFrame: The finished GeoDataFrame.
         """
-        start_time = time.time()
         try:
             gdf = geobr.read_municipality(code_muni = 'all'
                                         , year = 2010)
             gdf = gpd.GeoDataFrame(gdf).drop(columns = ['name_muni'
                                                       , 'code_state']).rename(columns = {'abbrev_state' : 'UF'})
-            elapsed_time = time.time() - start_time
-            logging.info(f"Fetched geodata in {elapsed_time:.2f} seconds")
+            if tolerance is not None:
+                gdf['geometry'] = gdf.geometry.simplify(tolerance = tolerance)
+            tracer.current().rows = len(gdf)
             return gdf
         except Exception as e:
+            tracer.current().fail(e)
             logging.error(f'Error fetching geodata: {e}')
             return None
 
+    @tracer.traced('fetch_tracts', 'uf')
+    def fetch_tracts(self
+                   , uf : str
+                   , tolerance : Optional[float] = None) -> gpd.GeoDataFrame:
+        """
+        Fetch census tract (setor censitário) geodata of one UF from geobr, urban and rural zones.
+
+        Args:
+            uf (str): UF abbreviation.
+            tolerance (Optional[float]): Simplification tolerance applied to the polygons, or None to keep them as fetched.
+
+        Returns:
+            GeoDataFrame: CodSetor, CodMunIBGE (7-digit strings) and geometry per tract.
+        """
+        zones = [gpd.GeoDataFrame(geobr.read_census_tract(code_tract = uf
+                                                        , year = 2010
+                                                        , zone = zone)) for zone in ('urban', 'rural')]
+        gdf = gpd.GeoDataFrame(pd.concat(zones
+                                       , ignore_index = True)
+                             , crs = zones[0].crs)
+        gdf = gpd.GeoDataFrame({'CodSetor' : gdf['code_tract'].astype('int64').astype(str)
+                              , 'CodMunIBGE' : gdf['code_muni'].astype('int64').astype(str)}
+                             , geometry = gdf.geometry.to_numpy()
+                             , crs = gdf.crs)
+        if tolerance is not None:
+            gdf['geometry'] = gdf.geometry.simplify(tolerance = tolerance)
+        tracer.current().rows = len(gdf)
+        return gdf
+
+class AMCCrosswalk:
+    @tracer.traced('amc_crosswalk')
+    def __init__(self
+               , folder : str
+               , start_year : int = 1991
+               , end_year : int = 2010):
+        """
+        Áreas Mínimas Comparáveis crosswalk, as a sparse AMC × municipality aggregation matrix. Fetched once from geobr and cached at the given folder.
+
+        Args:
+            folder (str): Directory for the cached crosswalk and dissolved geometries (Bronze layer, in main).
+            start_year (int): First year of the comparable period.
+            end_year (int): Last year of the comparable period; its municipality codes are the ones mapped.
+        """
+        self.folder = folder
+        self.period = f'{start_year}_{end_year}'
+        path = os.path.join(folder
+                          , f'AMC_{self.period}.parquet')
+        if os.path.exists(path):
+            table = pd.read_parquet(path)
+        else:
+            areas = geobr.read_comparable_areas(start_year = start_year
+                                              , end_year = end_year)
+            table = pd.DataFrame({'AMC' : areas['code_amc'].astype(int).astype(str)
+                                , 'CodMunIBGE' : areas[f'list_code_muni_{end_year}'].astype(str).str.split(',')}) \
+                .explode('CodMunIBGE')
+            table['CodMunIBGE'] = table['CodMunIBGE'].str.strip().str.replace(r'\.0$', '', regex = True)
+            table = table[table['CodMunIBGE'].str.fullmatch(r'\d{7}')].drop_duplicates('CodMunIBGE')
+            os.makedirs(folder
+                      , exist_ok = True)
+            with atomic_path(path) as temp_path:
+                table.to_parquet(temp_path
+                               , index = False)
+        self.codes = pd.Index(table['CodMunIBGE'])
+        self.membership = pd.Series(table['AMC'].to_numpy()
+                                  , index = self.codes)
+        amc_codes, self.units = pd.factorize(table['AMC'])
+        self.matrix = scipy.sparse.csr_matrix((np.ones(len(table)), (amc_codes, np.arange(len(table))))
+                                            , shape = (len(self.units), len(table)))
+        # AMCs don't cross state lines, so the first member's UF labels the unit
+        self.uf = pd.Series(table['CodMunIBGE'].str[:2].map(UF_CODES).to_numpy()
+                          , index = table['AMC'].to_numpy()).groupby(level = 0).first()
+        tracer.current().rows = len(table)
+
+    def aggregate_long(self
+                     , long : pd.DataFrame) -> pd.DataFrame:
+        """
+        Re-aggregate long Silver series data from municipalities to AMCs, following each series registry aggregation: sums, or means weighted by another series of the same period. Each (series, period) column is one sparse product; an AMC gets NaN when any member municipality lacks the value (or, for weighted means, every member does).
+
+        Args:
+            long (DataFrame): Silver long data with Série, CodMunIBGE, Período and Valor.
+
+        Returns:
+            DataFrame: Long data with Série, AMC, Período and Valor.
+        """
+        unmatched = pd.Index(long['CodMunIBGE'].unique()).difference(self.codes)
+        if len(unmatched):
+            logging.warning(f'{len(unmatched)} CodMunIBGE keys have no AMC {self.period} and are left out')
+        wide = long.groupby(['CodMunIBGE', 'Série', 'Período'])['Valor'].first().unstack(['Série', 'Período']).reindex(self.codes)
+        values = wide.to_numpy(dtype = float)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0)
+        columns = list(wide.columns)
+        aggregated = np.full((len(self.units), len(columns)), np.nan)
+
+        sums = [i for i, (series, _) in enumerate(columns) if SERIES_REGISTRY[series].aggregation == 'sum']
+        if sums:
+            missing = self.matrix @ (~present[:, sums]).astype(float)
+            aggregated[:, sums] = np.where(missing > 0, np.nan, self.matrix @ filled[:, sums])
+
+        position = {column : i for i, column in enumerate(columns)}
+        means = [i for i, (series, _) in enumerate(columns) if SERIES_REGISTRY[series].aggregation == 'mean']
+        if means:
+            weight_columns = [position.get((SERIES_REGISTRY[columns[i][0]].weight, columns[i][1])) for i in means]
+            weights = np.column_stack([filled[:, j] if j is not None else np.ones(len(self.codes)) for j in weight_columns])
+            weights = np.where(present[:, means], weights, 0)
+            totals = self.matrix @ weights
+            with np.errstate(invalid = 'ignore'
+                           , divide = 'ignore'):
+                aggregated[:, means] = np.where(totals > 0, (self.matrix @ (filled[:, means] * weights)) / totals, np.nan)
+
+        result = pd.DataFrame(aggregated
+                            , index = pd.Index(self.units, name = 'AMC')
+                            , columns = wide.columns)
+        return result.stack(['Série', 'Período']
+                          , future_stack = True).rename('Valor').reset_index()[['Série', 'AMC', 'Período', 'Valor']]
+
+    @tracer.traced('amc_geometries')
+    def geometries(self
+                 , geodata : gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        """
+        AMC polygons dissolved from the municipality geodata, done once and cached as GeoParquet at the crosswalk folder.
+
+        Args:
+            geodata (GeoDataFrame): Municipality polygons, as returned by DataFetcher.fetch_geodata.
+
+        Returns:
+            GeoDataFrame: One polygon per AMC, with AMC and UF columns.
+        """
+        path = os.path.join(self.folder
+                          , f'AMC_{self.period}_geometry.parquet')
+        if os.path.exists(path):
+            return gpd.read_parquet(path)
+        municipalities = gpd.GeoDataFrame({'CodMunIBGE' : geodata['code_muni'].astype(int).astype(str)}
+                                        , geometry = geodata.geometry.make_valid()
+                                        , crs = geodata.crs)
+        municipalities['AMC'] = municipalities['CodMunIBGE'].map(self.membership)
+        municipalities = municipalities[municipalities['AMC'].notnull()]
+        dissolved = municipalities.dissolve(by = 'AMC'
+                                          , as_index = False)[['AMC', 'geometry']]
+        dissolved['UF'] = dissolved['AMC'].map(self.uf)
+        with atomic_path(path) as temp_path:
+            dissolved.to_parquet(temp_path
+                               , index = None
+                               , schema_version = None)
+        tracer.current().rows = len(dissolved)
+        return dissolved
+
+def ragged_multipolygons(geometries : np.ndarray) -> tuple:
+    """
+    Coordinate and offset buffers of (Multi)Polygon geometries, polygons promoted to single-part multipolygons and missing geometries to empty ones, so every geometry shares one layout.
+
+    Args:
+        geometries (ndarray): Shapely (Multi)Polygons, None where missing.
+
+    Returns:
+        tuple: Promoted geometries, missing mask, coordinates and the (ring, polygon, geometry) offsets.
+    """
+    geometries = geometries.copy()
+    missing = shapely.is_missing(geometries)
+    if not len(geometries):
+        # to_ragged_array rejects empty input, e.g. a filter matching no municipality
+        empty = np.zeros(1, dtype = np.int64)
+        return geometries, missing, np.empty((0, 2)), (empty, empty, empty)
+    geometries[missing] = shapely.from_wkt('MULTIPOLYGON EMPTY')
+    polygons = shapely.get_type_id(geometries) == shapely.GeometryType.POLYGON
+    if polygons.any():
+        geometries[polygons] = shapely.multipolygons(geometries[polygons]
+                                                   , indices = np.arange(polygons.sum()))
+    _, coords, offsets = shapely.to_ragged_array(geometries)
+    return geometries, missing, coords, offsets
+
+def geoarrow_table(gdf : gpd.GeoDataFrame) -> pa.Table:
+    """
+    Arrow table of a GeoDataFrame with the geometry as native GeoArrow multipolygons (separated x/y coordinate arrays) and a bbox covering column, carrying GeoParquet 1.1 metadata. Polygons are promoted to single-part multipolygons, since GeoArrow columns hold one geometry type.
+
+    Args:
+        gdf (GeoDataFrame): Data with a (Multi)Polygon geometry column.
+
+    Returns:
+        Table: Attribute columns, geometry and bbox (xmin, ymin, xmax, ymax struct).
+    """
+    geometries, missing, coords, (ring_offsets, polygon_offsets, geometry_offsets) = ragged_multipolygons(gdf.geometry.to_numpy())
+    vertices = pa.StructArray.from_arrays([pa.array(coords[:, 0]), pa.array(coords[:, 1])]
+                                        , names = ['x', 'y'])
+    rings = pa.ListArray.from_arrays(pa.array(ring_offsets, pa.int32()), vertices)
+    parts = pa.ListArray.from_arrays(pa.array(polygon_offsets, pa.int32()), rings)
+    column = pa.ListArray.from_arrays(pa.array(geometry_offsets, pa.int32())
+                                    , parts
+                                    , mask = pa.array(missing))
+    bounds = shapely.bounds(geometries)
+    bbox = pa.StructArray.from_arrays([pa.array(bounds[:, i]) for i in range(4)]
+                                    , names = ['xmin', 'ymin', 'xmax', 'ymax']
+                                    , mask = pa.array(missing))
+    table = pa.Table.from_pandas(pd.DataFrame(gdf.drop(columns = gdf.geometry.name))
+                               , preserve_index = False)
+    table = table.append_column('geometry', column).append_column('bbox', bbox)
+    geo = {'version' : '1.1.0'
+         , 'primary_column' : 'geometry'
+         , 'columns' : {'geometry' : {'encoding' : 'multipolygon'
+                                    , 'geometry_types' : ['MultiPolygon']
+                                    , 'crs' : gdf.crs.to_json_dict() if gdf.crs is not None else None
+                                    , 'bbox' : [float(value) for value in gdf.total_bounds]
+                                    , 'covering' : {'bbox' : {edge : ['bbox', edge] for edge in ('xmin', 'ymin', 'xmax', 'ymax')}}}}}
+    return table.replace_schema_metadata({**(table.schema.metadata or {})
+                                        , b'geo' : json.dumps(geo).encode('utf-8')})
+
+def geoparquet_table(gdf : gpd.GeoDataFrame
+                   , encoding : str = 'WKB') -> pa.Table:
+    """
+    Arrow table of a GeoDataFrame carrying GeoParquet metadata, so geometry outputs can go through ParquetWriteBehind like every other table.
+
+    Args:
+        gdf (GeoDataFrame): Data with a geometry column.
+        encoding (str): 'WKB' (GeoParquet 1.0, as geopandas writes it) or 'geoarrow' (geoarrow_table).
+
+    Returns:
+        Table: Columns in their frame order, geometry as WKB or GeoArrow.
+    """
+    if encoding == 'geoarrow':
+        return geoarrow_table(gdf)
+    geometry = gdf.geometry
+    table = pa.Table.from_pandas(pd.DataFrame(gdf).assign(**{geometry.name : shapely.to_wkb(geometry.to_numpy())})
+                               , preserve_index = False)
+    column = {'encoding' : 'WKB'
+            , 'geometry_types' : sorted(set(geometry[geometry.notnull()].geom_type))
+            , 'crs' : gdf.crs.to_json_dict() if gdf.crs is not None else None}
+    if not geometry.is_empty.all():
+        column['bbox'] = [float(value) for value in gdf.total_bounds]
+    geo = {'version' : '1.0.0'
+         , 'primary_column' : geometry.name
+         , 'columns' : {geometry.name : column}}
+    return table.replace_schema_metadata({**(table.schema.metadata or {})
+                                        , b'geo' : json.dumps(geo).encode('utf-8')})
+
+def geoarrow_geometries(column) -> np.ndarray:
+    """
+    Shapely geometries straight from a GeoArrow multipolygon column, built from its offset and coordinate buffers in one vectorised call instead of parsing each geometry.
+
+    Args:
+        column (Array or ChunkedArray): GeoArrow multipolygon column, as geoarrow_table writes it.
+
+    Returns:
+        ndarray: Geometries, None where the column is null.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    parts = column.flatten()
+    rings = parts.flatten()
+    vertices = rings.flatten()
+    # Offsets of sliced arrays don't start at zero; flatten() already honours that for the values
+    geometry_offsets = np.asarray(column.offsets) - column.offsets[0].as_py()
+    polygon_offsets = np.asarray(parts.offsets) - parts.offsets[0].as_py()
+    ring_offsets = np.asarray(rings.offsets) - rings.offsets[0].as_py()
+    coords = np.column_stack([vertices.field('x').to_numpy(zero_copy_only = False)
+                            , vertices.field('y').to_numpy(zero_copy_only = False)])
+    geometries = shapely.from_ragged_array(shapely.GeometryType.MULTIPOLYGON
+                                         , coords
+                                         , (ring_offsets, polygon_offsets, geometry_offsets))
+    geometries[np.asarray(column.is_null())] = None
+    return geometries
+
+def read_geoparquet(path : str
+                  , columns : Optional[list] = None) -> gpd.GeoDataFrame:
+    """Read a GeoParquet file in either geometry encoding: WKB through geopandas, GeoArrow through geoarrow_geometries."""
+    metadata = json.loads((pq.read_schema(path).metadata or {}).get(b'geo', b'{}'))
+    encoding = metadata.get('columns', {}).get('geometry', {}).get('encoding', 'WKB')
+    if encoding == 'WKB':
+        return gpd.read_parquet(path
+                              , columns = columns)
+    table = pq.read_table(path
+                        , columns = columns)
+    geometries = geoarrow_geometries(table.column('geometry'))
+    df = table.drop_columns([name for name in ('geometry', 'bbox') if name in table.column_names]).to_pandas()
+    crs = metadata['columns']['geometry'].get('crs')
+    return gpd.GeoDataFrame(df
+                          , geometry = geometries
+                          , crs = json.dumps(crs) if isinstance(crs, dict) else crs)
+
+class ParquetQuery:
+    # Columns the map is drawn from
+    map_columns = MAP_COLUMNS
+
+    def __init__(self
+               , path : str
+               , sample : Optional[str] = None):
+        """
+        DuckDB connection over Gold parquet data, with the UF/region lookup table and the filter helpers GoldQuery and TractQuery share.
+
+        Args:
+            path (str): Gold parquet file or partitioned dataset directory.
+            sample (Optional[str]): Parquet file whose GeoParquet metadata gives the CRS and geometry encoding, if any.
+        """
+        self.path = path
+        self.crs = self._read_crs(sample) if sample else None
+        self.encoding = self._read_encoding(sample) if sample else 'WKB'
+        self.conn = ddb.connect()
+        self.conn.execute('CREATE TABLE ufs (uf_code VARCHAR, uf VARCHAR, region VARCHAR)')
+        self.conn.executemany('INSERT INTO ufs VALUES (?, ?, ?)'
+                            , [(code, uf, REGIONS[code[0]]) for code, uf in UF_CODES.items()])
+
+    @staticmethod
+    def _literal(value : str) -> str:
+        """Quote a string as a SQL literal."""
+        return "'" + value.replace("'", "''") + "'"
+
+    @staticmethod
+    def _identifier(value : str) -> str:
+        """Quote a column name as a SQL identifier."""
+        return '"' + value.replace('"', '""') + '"'
+
+    @staticmethod
+    def _read_crs(path : str) -> Optional[str]:
+        """Read the geometry CRS from GeoParquet metadata, if the file has any."""
+        metadata = pq.read_schema(path).metadata or {}
+        if b'geo' not in metadata:
+            return None
+        geo = json.loads(metadata[b'geo'])
+        crs = geo['columns'][geo['primary_column']].get('crs')
+        return json.dumps(crs) if isinstance(crs, dict) else crs
+
+    @staticmethod
+    def _read_encoding(path : str) -> str:
+        """Geometry encoding from GeoParquet metadata ('WKB' or a GeoArrow type), 'WKB' when unset."""
+        metadata = pq.read_schema(path).metadata or {}
+        if b'geo' not in metadata:
+            return 'WKB'
+        geo = json.loads(metadata[b'geo'])
+        return geo['columns'][geo['primary_column']].get('encoding', 'WKB')
+
+    def _where(self
+             , ufs : Optional[list] = None
+             , regions : Optional[list] = None
+             , bands : Optional[list] = None
+             , idhm : Optional[tuple] = None
+             , status : Optional[str] = None
+             , codes : Optional[list] = None) -> tuple:
+        """Build the WHERE clause and its parameters from the filters set."""
+        clauses, params = [], []
+        if codes is not None:
+            # e.g. SpatialIndex.locate or viewport results
+            clauses.append('list_contains(?, CodMunIBGE)')
+            params.append([code.item() if hasattr(code, 'item') else code for code in codes])
+        if ufs:
+            clauses.append('list_contains(?, "UF")')
+            params.append(list(ufs))
+        if regions:
+            clauses.append('list_contains(?, "Região")')
+            params.append(list(regions))
+        if bands:
+            clauses.append('list_contains(?, "Faixa Populacional")')
+            params.append(list(bands))
+        if idhm is not None:
+            clauses.append('"IDHM 2010" BETWEEN ? AND ?')
+            params.extend(idhm)
+        if status is not None:
+            clauses.append('data_status = ?')
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+class GoldQuery(ParquetQuery):
+    @tracer.traced('gold_query_load', 'path')
+    def __init__(self
+               , path : str):
+        """
+        Load a Gold parquet file into an in-memory DuckDB table, keyed by UF, region and population band.
+
+        Args:
+            path (str): Gold parquet file (DescriptiveData.parquet or AppData.parquet).
+        """
+        super().__init__(path
+                       , path)
+        source = f"read_parquet({self._literal(path)})"
+        columns = [row[0] for row in self.conn.execute(f'DESCRIBE SELECT * FROM {source}').fetchall()]
+        exclude = ' EXCLUDE (UF)' if 'UF' in columns else ''
+        bands = ' '.join(f"WHEN g.\"Habitantes 2010\" <= {upper} THEN '{label}'"
+                         for label, _, upper in POPULATION_BANDS if upper is not None)
+        self.conn.execute(f"""
+        CREATE TABLE gold AS
+        SELECT g.*{exclude}
+             , u.uf AS "UF"
+             , u.region AS "Região"
+             , CASE {bands} ELSE '{POPULATION_BANDS[-1][0]}' END AS "Faixa Populacional"
+        FROM {source} AS g
+        LEFT JOIN ufs AS u
+               ON left(CAST(g.CodMunIBGE AS VARCHAR), 2) = u.uf_code
+        ORDER BY g.CodMunIBGE
+        """)
+        span = tracer.current()
+        span.rows = self.conn.execute('SELECT count(*) FROM gold').fetchone()[0]
+        span.bytes_read = os.path.getsize(path)
+
+    def filter_options(self) -> dict:
+        """
+        Distinct values and ranges to populate the dashboard filter controls.
+
+        Returns:
+            dict: UF and region lists, population band labels and IDHM (min, max).
+        """
+        cursor = self.conn.cursor()
+        ufs = [row[0] for row in cursor.execute('SELECT DISTINCT "UF" FROM gold WHERE "UF" IS NOT NULL ORDER BY 1').fetchall()]
+        regions = [row[0] for row in cursor.execute('SELECT DISTINCT "Região" FROM gold WHERE "Região" IS NOT NULL ORDER BY 1').fetchall()]
+        idhm = cursor.execute('SELECT min("IDHM 2010"), max("IDHM 2010") FROM gold').fetchone()
+        cursor.close()
+        return {'UF' : ufs
+              , 'Região' : regions
+              , 'Faixa Populacional' : [label for label, _, _ in POPULATION_BANDS]
+              , 'IDHM 2010' : (float(idhm[0]), float(idhm[1]))}
+
+    @tracer.traced('gold_query_select')
+    def select(self
+             , columns : Optional[list] = None
+             , **filters) -> pd.DataFrame:
+        """
+        Filtered projection over the Gold table, resolved by DuckDB.
+
+        Args:
+            columns (Optional[list]): Columns to return, or all of them if None. Including 'geometry' returns a GeoDataFrame.
+            **filters: ufs, regions, bands (lists), idhm (min, max), status ('complete' or 'incomplete') and codes (CodMunIBGE list).
+
+        Returns:
+            DataFrame: Rows matching every filter set, ordered by CodMunIBGE.
+        """
+        projection = ', '.join(self._identifier(column) for column in columns) if columns else '*'
+        where, params = self._where(**filters)
+        cursor = self.conn.cursor()
+        result = cursor.execute(f'SELECT {projection} FROM gold {where} ORDER BY CodMunIBGE'
+                              , params)
+        if self.encoding != 'WKB' and (not columns or 'geometry' in columns):
+            # GeoArrow geometry comes back as coordinate buffers, decoded without per-geometry parsing
+            table = result.fetch_arrow_table()
+            cursor.close()
+            geometry = geoarrow_geometries(table.column('geometry'))
+            df = gpd.GeoDataFrame(table.drop_columns(['geometry']).to_pandas()
+                                , geometry = geometry
+                                , crs = self.crs)
+            tracer.current().rows = len(df)
+            return df
+        df = result.fetchdf()
+        cursor.close()
+        if 'geometry' in df.columns:
+            geometry = gpd.GeoSeries.from_wkb(df.pop('geometry').map(bytes, na_action = 'ignore')
+                                            , crs = self.crs)
+            df = gpd.GeoDataFrame(df
+                                , geometry = geometry)
+        tracer.current().rows = len(df)
+        return df
+
+    @tracer.traced('gold_query_aggregate', 'by')
+    def aggregate(self
+                , by : Optional[str] = None
+                , **filters) -> pd.DataFrame:
+        """
+        Grouped totals over the Gold table, resolved by DuckDB.
+
+        Args:
+            by (Optional[str]): Grouping column ('UF', 'Região' or 'Faixa Populacional'), or None for a single total row.
+            **filters: Same filters accepted by select.
+
+        Returns:
+            DataFrame: Municipalities count, population, population-weighted IDHM, revenue, PIB and tax burden per group.
+        """
+        key = f'{self._identifier(by)}, ' if by else ''
+        group = f'GROUP BY {self._identifier(by)} ORDER BY {self._identifier(by)}' if by else ''
+        where, params = self._where(**filters)
+        cursor = self.conn.cursor()
+        df = cursor.execute(f"""
+        SELECT {key}count(*) AS "Municípios"
+             , sum("Habitantes 2010") AS "Habitantes 2010"
+             , sum("IDHM 2010" * "Habitantes 2010") / sum(CASE WHEN "IDHM 2010" IS NOT NULL THEN "Habitantes 2010" END) AS "IDHM 2010"
+             , sum("Receitas Correntes 2010 (R$)") AS "Receitas Correntes 2010 (R$)"
+             , sum("PIB 2010 (R$)") AS "PIB 2010 (R$)"
+             , sum("Receitas Correntes 2010 (R$)") / nullif(sum("PIB 2010 (R$)"), 0) AS "Carga Tributária Municipal 2010"
+        FROM gold {where} {group}
+        """, params).fetchdf()
+        cursor.close()
+        tracer.current().rows = len(df)
+        return df
+
+class TractQuery(ParquetQuery):
+    # Several tracts share a municipality code, so the map keys tract features by CodSetor
+    map_columns = ['CodSetor', *MAP_COLUMNS]
+
+    def __init__(self
+               , folder : str):
+        """
+        Census tract Gold data partitioned by UF (UF=<abbrev> folders, as merge_tracts writes them). Nothing is loaded up front; each select reads only the partitions of the UFs and regions asked for.
+        Tracts inherit their municipality indicators, so there is no tract aggregate; totals come from GoldQuery.aggregate.
+
+        Args:
+            folder (str): Partitioned dataset directory (Gold/Tracts); missing or empty until merge_tracts has written a UF.
+        """
+        # Only partitions holding data files: DuckDB fails on a glob matching nothing
+        self.partitions, sample = {}, None
+        for name in sorted(os.listdir(folder)) if os.path.isdir(folder) else []:
+            path = os.path.join(folder, name)
+            parts = sorted(part for part in os.listdir(path) if part.endswith('.parquet')) if name.startswith('UF=') and os.path.isdir(path) else []
+            if parts:
+                self.partitions[name.split('=', 1)[1]] = path
+                sample = sample or os.path.join(path, parts[0])
+        super().__init__(folder
+                       , sample)
+
+    def filter_options(self) -> dict:
+        """UFs with a partition and their regions; tract data carries no population bands."""
+        codes = {uf : code for code, uf in UF_CODES.items()}
+        ufs = [uf for uf in self.partitions if uf in codes]
+        return {'UF' : ufs
+              , 'Região' : sorted({REGIONS[codes[uf][0]] for uf in ufs})
+              , 'Faixa Populacional' : []
+              , 'IDHM 2010' : (0.0, 1.0)}
+
+    def files(self
+            , ufs : Optional[list] = None
+            , regions : Optional[list] = None) -> list:
+        """Partition file globs for the UFs and regions selected; empty when neither is, as every tract at once won't draw."""
+        if not ufs and not regions:
+            return []
+        codes = {uf : code for code, uf in UF_CODES.items()}
+        return [os.path.join(path, '*.parquet') for uf, path in self.partitions.items()
+                if (not ufs or uf in ufs) and (not regions or REGIONS[codes[uf][0]] in regions)]
+
+    @tracer.traced('tract_query_select')
+    def select(self
+             , columns : Optional[list] = None
+             , **filters) -> pd.DataFrame:
+        """
+        Filtered projection over the partitions of the selected UFs and regions, resolved by DuckDB. Population bands don't apply to tracts and are ignored.
+
+        Args:
+            columns (Optional[list]): Columns to return, or all of them if None. Including 'geometry' returns a GeoDataFrame.
+            **filters: ufs, regions (lists; at least one is required), idhm (min, max) and status ('complete' or 'incomplete').
+
+        Returns:
+            DataFrame: Tracts matching every filter set, ordered by CodSetor; empty if no UF or region is selected.
+        """
+        filters.pop('bands', None)
+        files = self.files(filters.get('ufs')
+                         , filters.get('regions'))
+        projection = ', '.join(self._identifier(column) for column in columns) if columns else '*'
+        if not files:
+            df = pd.DataFrame(columns = columns)
+        else:
+            where, params = self._where(**filters)
+            source = f"read_parquet([{', '.join(self._literal(path) for path in files)}], hive_partitioning = true)"
+            cursor = self.conn.cursor()
+            df = cursor.execute(f"""
+            SELECT {projection}
+            FROM (SELECT t.*, u.region AS "Região"
+                  FROM {source} AS t
+                  LEFT JOIN ufs AS u
+                         ON t."UF" = u.uf) {where}
+            ORDER BY CodSetor
+            """, params).fetchdf()
+            cursor.close()
+        if 'geometry' in df.columns:
+            geometry = gpd.GeoSeries.from_wkb(df.pop('geometry').map(bytes, na_action = 'ignore')
+                                            , crs = self.crs)
+            df = gpd.GeoDataFrame(df
+                                , geometry = geometry)
+        tracer.current().rows = len(df)
+        return df
+
+class Mapper:
+    # Bumped whenever the rendered output changes, so MapCache drops maps from older builds
+    version = 4
+
+    def __init__(self
+               , app_data : gpd.GeoDataFrame
+               , locale : str = 'pt-BR'):
+        self.app_data = app_data
+        from branca.utilities import color_brewer
+        self.labels = MAP_LOCALES[locale]
+        self.colors = color_brewer('PuRd'
+                                 , n = 6)
+
+    def feature_collection(self) -> tuple:
+        """
+        Build the map data once as a GeoJSON FeatureCollection dict, shared by every map layer and serialised only by folium. Coordinates are sliced out of one vertex buffer (shapely ragged arrays) instead of going through JSON text, and IDHM colour bins and tooltip text are computed column-wise.
+
+        Returns:
+            tuple: FeatureCollection dict and the IDHM bin edges used for the fill colours.
+        """
+        idhm = self.app_data['IDHM 2010'].to_numpy(dtype = float)
+        # Same equal-width bins folium.Choropleth draws by default
+        edges = np.histogram_bin_edges(idhm[~np.isnan(idhm)]
+                                     , bins = len(self.colors))
+        if self.app_data.empty:
+            # Filters matching nothing still draw the basemap
+            return {'type' : 'FeatureCollection'
+                  , 'features' : []}, edges
+        bins = np.clip(np.digitize(idhm, edges[1:-1]), 0, len(self.colors) - 1)
+        fill = np.where(np.isnan(idhm)
+                      , '#ffffff'
+                      , np.asarray(self.colors)[bins])
+        carga = self.app_data['Carga Tributária Municipal 2010'].to_numpy(dtype = float)
+        # Tract maps key features by tract, as a municipality code repeats over its tracts
+        ids = self.app_data['CodSetor' if 'CodSetor' in self.app_data.columns else 'CodMunIBGE'].to_numpy()
+        properties = pd.DataFrame({'CodMunIBGE' : self.app_data['CodMunIBGE'].to_numpy()
+                                 , 'Município' : self.app_data['Município'].to_numpy()
+                                 , 'IDHM 2010' : idhm
+                                 , 'Formatted Carga Tributária' : np.char.mod('%.3f%%', carga * 100)
+                                 , 'fill' : fill
+                                 , 'incomplete' : (self.app_data['data_status'] == 'incomplete').to_numpy()})
+        # Python scalars, NaN as None, so folium writes valid JSON
+        records = properties.astype(object).where(properties.notnull(), None).to_dict(orient = 'records')
+        _, missing, coords, (ring_offsets, polygon_offsets, geometry_offsets) = ragged_multipolygons(self.app_data.geometry.to_numpy())
+        points = coords.tolist()
+        rings = [points[start:end] for start, end in zip(ring_offsets[:-1].tolist(), ring_offsets[1:].tolist())]
+        parts = [rings[start:end] for start, end in zip(polygon_offsets[:-1].tolist(), polygon_offsets[1:].tolist())]
+        coordinates = [parts[start:end] for start, end in zip(geometry_offsets[:-1].tolist(), geometry_offsets[1:].tolist())]
+        features = [{'type' : 'Feature'
+                   , 'id' : str(code)
+                   , 'properties' : record
+                   , 'geometry' : None if absent else {'type' : 'MultiPolygon'
+                                                      , 'coordinates' : multipolygon}}
+                    for code, record, absent, multipolygon in zip(ids, records, missing.tolist(), coordinates)]
+        return {'type' : 'FeatureCollection'
+              , 'features' : features}, edges
+
+    def create_map(self
+                 , incomplete_layer : bool = True) -> folium.Map:
+        """Fetching Brazilian basemap, setting data layers, interaction parameters and styles to display the data collected for the model analysis."""
+        from folium.plugins import StripePattern
+        from branca.colormap import StepColormap
+        mapa = folium.Map(location = [-14, -53.25]
+                        , zoom_start = 4
+                        , tiles = 'cartodbdark_matter')
+        features, edges = self.feature_collection()
+        # Striped Pattern for Incomplete Data, flagged by feature property instead of a second geometry copy
+        stripe_pattern = StripePattern(angle = 120
+                                     , color = 'black')
+        # Every feature style is one of a few variants, built once; folium's per-feature style_function call is a lookup
+        styles = {}
+        for color in [*self.colors, '#ffffff']:
+            for incomplete in (False, True):
+                style = {'fillColor' : color
+                       , 'color' : '#000000'
+                       , 'fillOpacity' : 0.75
+                       , 'weight' : 0.1}
+                if incomplete_layer and incomplete:
+                    style.update({'fillColor' : '#ffffff'
+                                , 'fillPattern' : stripe_pattern})
+                styles[color, incomplete] = style
+        style_function = lambda x : styles[x['properties']['fill'], x['properties']['incomplete']]
+        highlight_function = lambda x : {'fillColor' : '#000000'
+                                         , 'color' : '#000000'
+                                         , 'fillOpacity' : 0.50
+                                         , 'weight' : 0.1}
+        # IDHM as scale layer, with hover functionality, over the single encoded payload
+        folium.features.GeoJson(data = features
+                              , name = 'IDHM 2010'
+                              , style_function = style_function
+                              , highlight_function = highlight_function
+                              , smooth_factor = 0
+                              , tooltip = folium.features.GeoJsonTooltip(fields = ['Município'
+                                                                                 , 'IDHM 2010'
+                                                                                 , 'Formatted Carga Tributária']
+                                                                       , aliases = self.labels['aliases']
+                                                                       , style = ('background-color : white; color : #333333; font-family : arial; font-size : 12px; padding : 2px'))
+                              , show = True
+                              , overlay = True).add_to(mapa)
+        StepColormap(self.colors
+                   , index = list(edges)
+                   , vmin = float(edges[0])
+                   , vmax = float(edges[-1])
+                   , caption = 'IDHM 2010').add_to(mapa)
+        return mapa
+
+class MapCache:
+    def __init__(self
+               , folder : str
+               , data_path : str
+               , max_bytes : int = 256 * 2**20):
+        """
+        Disk cache of rendered map HTML, keyed by AppData fingerprint, locale and layer options.
+        Unfiltered maps (the ones the pipeline pre-renders) are kept; filtered maps go to a Filtered subfolder capped at max_bytes, least recently served first out, since every filter combination (IDHM slider values included) is a new multi-MB file.
+
+        Args:
+            folder (str): Directory holding the rendered maps.
+            data_path (str): AppData parquet file (or Tracts partitioned directory) the maps are built from.
+            max_bytes (int): Size cap of the filtered maps.
+        """
+        self.folder = folder
+        self.filtered_folder = os.path.join(folder
+                                          , 'Filtered')
+        self.max_bytes = max_bytes
+        os.makedirs(self.filtered_folder
+                  , exist_ok = True)
+        self.fingerprint = self._fingerprint(data_path)
+
+    @staticmethod
+    def _fingerprint(path : str) -> str:
+        """SHA-256 of the data file contents; for a partitioned dataset directory, of its files' names, sizes and modification times."""
+        digest = hashlib.sha256()
+        if os.path.isdir(path):
+            digest.update(file_version(path).encode('utf-8'))
+            return digest.hexdigest()
+        with open(path
+                , 'rb') as f:
+            for chunk in iter(lambda : f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key(self
+          , locale : str
+          , filters : Optional[dict] = None
+          , incomplete_layer : bool = True) -> str:
+        """Cache key of a map; empty filters are dropped so unfiltered maps share one entry."""
+        options = {'filters' : {name : value for name, value in (filters or {}).items() if value}
+                 , 'incomplete_layer' : incomplete_layer
+                 , 'version' : Mapper.version}
+        payload = json.dumps([self.fingerprint, locale, options]
+                           , sort_keys = True
+                           , default = list)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @tracer.traced('map_render', 'locale')
+    def render(self
+             , locale : str
+             , load : Callable[[], gpd.GeoDataFrame]
+             , filters : Optional[dict] = None
+             , incomplete_layer : bool = True) -> str:
+        """
+        Serve a rendered map from disk, building and storing it on a cache miss.
+
+        Args:
+            locale (str): Map labels locale, a MAP_LOCALES key.
+            load (Callable): Returns the map data; only called on a cache miss.
+            filters (Optional[dict]): Filters the map data was selected with.
+            incomplete_layer (bool): Whether to draw the striped incomplete data layer.
+
+        Returns:
+            str: Standalone map HTML document.
+        """
+        span = tracer.current()
+        filtered = any((filters or {}).values())
+        path = os.path.join(self.filtered_folder if filtered else self.folder
+                          , f'{self.key(locale, filters, incomplete_layer)}.html')
+        if os.path.exists(path):
+            with open(path
+                    , encoding = 'utf-8') as f:
+                html = f.read()
+                span.bytes_read = os.fstat(f.fileno()).st_size
+            if filtered:
+                # Modification time doubles as the last use for eviction
+                with contextlib.suppress(FileNotFoundError):
+                    os.utime(path)
+            logging.info(f"Served cached map {locale}")
+            return html
+
+        mapa = Mapper(load()
+                    , locale).create_map(incomplete_layer)
+        html = folium.Figure().add_child(mapa).render()
+        with atomic_path(path) as temp_path:
+            with open(temp_path
+                    , 'w'
+                    , encoding = 'utf-8') as f:
+                f.write(html)
+        span.bytes_written = len(html.encode('utf-8'))
+        if filtered:
+            self.evict(keep = path)
+        return html
+
+    def evict(self
+            , keep : Optional[str] = None) -> None:
+        """
+        Remove the least recently served filtered maps until they fit max_bytes.
+
+        Args:
+            keep (Optional[str]): Map never removed, e.g. the one just rendered.
+        """
+        maps = []
+        for entry in os.scandir(self.filtered_folder):
+            if entry.name.endswith('.html'):
+                with contextlib.suppress(FileNotFoundError):
+                    stat = entry.stat()
+                    maps.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in maps)
+        for _, size, path in sorted(maps):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            # Another dashboard process may have evicted it already
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+
+class SpatialIndex:
+    @tracer.traced('spatial_index_load', 'data_path')
+    def __init__(self
+               , data_path : str):
+        """
+        STRtree over the AppData polygons, with their bounding boxes and centroids. Persisted next to AppData as <name>.index.parquet and rebuilt when AppData changes.
+
+        Args:
+            data_path (str): AppData parquet file the index covers.
+        """
+        self.data_path = data_path
+        self.path = f'{os.path.splitext(data_path)[0]}.index.parquet'
+        fingerprint = MapCache._fingerprint(data_path)
+        table = None
+        if os.path.exists(self.path):
+            table = pq.read_table(self.path)
+            if (table.schema.metadata or {}).get(b'appdata_sha256', b'').decode() != fingerprint:
+                table = None
+        if table is None:
+            table = self._build(data_path
+                              , fingerprint)
+        index = table.to_pandas()
+        self.codes = index['CodMunIBGE'].to_numpy()
+        self.bounds = index[['minx', 'miny', 'maxx', 'maxy']].to_numpy(dtype = float)
+        self.centroids = index[['cx', 'cy']].to_numpy(dtype = float)
+        self.geometries = shapely.from_wkb(index['geometry'].to_numpy())
+        self.tree = shapely.STRtree(self.geometries)
+        tracer.current().rows = len(index)
+
+    def _build(self
+             , data_path : str
+             , fingerprint : str) -> pa.Table:
+        """Compute bounding boxes and centroids from AppData and write the index atomically."""
+        app_data = read_geoparquet(data_path
+                                 , columns = ['CodMunIBGE', 'geometry'])
+        app_data = app_data[app_data.geometry.notnull() & ~app_data.geometry.is_empty]
+        geometries = app_data.geometry.to_numpy()
+        bounds = shapely.bounds(geometries)
+        centroids = shapely.get_coordinates(shapely.centroid(geometries))
+        index = pd.DataFrame({'CodMunIBGE' : app_data['CodMunIBGE'].to_numpy()
+                            , 'minx' : bounds[:, 0]
+                            , 'miny' : bounds[:, 1]
+                            , 'maxx' : bounds[:, 2]
+                            , 'maxy' : bounds[:, 3]
+                            , 'cx' : centroids[:, 0]
+                            , 'cy' : centroids[:, 1]
+                            , 'geometry' : shapely.to_wkb(geometries)})
+        table = pa.Table.from_pandas(index
+                                   , preserve_index = False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {})
+                                             , b'appdata_sha256' : fingerprint.encode()
+                                             , b'crs' : str(app_data.crs).encode()})
+        with atomic_path(self.path) as temp_path:
+            pq.write_table(table
+                         , temp_path)
+        return table
+
+    @tracer.traced('spatial_index_locate')
+    def locate(self
+             , lon
+             , lat) -> np.ndarray:
+        """
+        Batched point-in-polygon lookup, e.g. for map clicks.
+
+        Args:
+            lon: Longitude(s), in the AppData CRS (SIRGAS 2000 degrees).
+            lat: Latitude(s), same shape as lon.
+
+        Returns:
+            ndarray: CodMunIBGE containing each point, or None where no polygon does.
+        """
+        points = shapely.points(np.atleast_1d(np.asarray(lon, dtype = float))
+                              , np.atleast_1d(np.asarray(lat, dtype = float)))
+        point_index, tree_index = self.tree.query(points
+                                                , predicate = 'intersects')
+        found = np.full(len(points), None, dtype = object)
+        # Points on a shared border match both polygons; the first one wins
+        found[point_index[::-1]] = self.codes[tree_index[::-1]]
+        tracer.current().rows = len(points)
+        return found
+
+    @tracer.traced('spatial_index_viewport')
+    def viewport(self
+               , minx : float
+               , miny : float
+               , maxx : float
+               , maxy : float
+               , exact : bool = False) -> np.ndarray:
+        """
+        Municipalities within a viewport, for culling features before serialisation.
+
+        Args:
+            minx, miny, maxx, maxy (float): Viewport bounds in the AppData CRS.
+            exact (bool): Test the polygons themselves; by default bounding boxes are enough, which can only keep extra features, never drop visible ones.
+
+        Returns:
+            ndarray: CodMunIBGE of the features in view, in index order.
+        """
+        hits = self.tree.query(shapely.box(minx, miny, maxx, maxy)
+                             , predicate = 'intersects' if exact else None)
+        codes = self.codes[np.sort(hits)]
+        tracer.current().rows = len(codes)
+        return codes
+
+    def cull(self
+           , app_data : gpd.GeoDataFrame
+           , bounds : tuple
+           , exact : bool = False) -> gpd.GeoDataFrame:
+        """Rows of app_data (keyed by CodMunIBGE) in view of bounds (minx, miny, maxx, maxy)."""
+        return app_data[app_data['CodMunIBGE'].isin(self.viewport(*bounds
+                                                                  , exact = exact))]
+
+class PeerFinder:
+    # Indicators peers are compared on; skewed totals on a log scale
+    features = {'Habitantes 2010' : np.log1p
+              , 'PIB 2010 (R$)' : np.log1p
+              , 'Carga Tributária Municipal 2010' : None
+              , 'IDHM 2010' : None}
+    # Built indexes by (AppData fingerprint, geographic weight), shared by every caller in the process
+    _cache = {}
+    _lock = threading.Lock()
+
+    def __init__(self
+               , data_path : str
+               , geo_weight : float = 0.0):
+        """
+        KD-tree over standardised Gold indicators for k-nearest peer municipality queries. Municipalities missing any indicator are left out.
+
+        Args:
+            data_path (str): AppData parquet file.
+            geo_weight (float): Weight of the standardised centroid coordinates next to the indicators; 0 ignores geography.
+        """
+        # Only the indicator columns are read; the geometry, most of AppData, never leaves the file
+        df = pq.read_table(data_path
+                         , columns = ['CodMunIBGE', 'Município', *self.features]).to_pandas() \
+            .sort_values('CodMunIBGE'
+                       , ignore_index = True)
+        df.insert(2
+                , 'UF'
+                , df['CodMunIBGE'].astype(str).str[:2].map(UF_CODES))
+        columns = []
+        for column, transform in self.features.items():
+            values = df[column].to_numpy(dtype = float)
+            columns.append(transform(values) if transform is not None else values)
+        if geo_weight:
+            index = SpatialIndex(data_path)
+            centroids = pd.DataFrame(index.centroids
+                                   , index = index.codes).reindex(df['CodMunIBGE'].to_numpy()).to_numpy()
+            columns.extend([centroids[:, 0], centroids[:, 1]])
+        matrix = np.column_stack(columns)
+        complete = ~np.isnan(matrix).any(axis = 1)
+        matrix = matrix[complete]
+        # z-scores, so no indicator dominates by its unit; a constant indicator (e.g. one UF in view) only centres
+        scale = matrix.std(axis = 0)
+        scale[scale == 0] = 1
+        matrix = (matrix - matrix.mean(axis = 0)) / scale
+        if geo_weight:
+            matrix[:, len(self.features):] *= geo_weight
+        self.municipalities = df[complete].reset_index(drop = True)
+        self.position = pd.Series(np.arange(len(self.municipalities))
+                                , index = self.municipalities['CodMunIBGE'].to_numpy())
+        self.matrix = matrix
+        self.tree = scipy.spatial.cKDTree(matrix)
+
+    @classmethod
+    def load(cls
+           , data_path : str
+           , geo_weight : float = 0.0) -> 'PeerFinder':
+        """PeerFinder for the current AppData version, built once per version and weight."""
+        key = (MapCache._fingerprint(data_path), geo_weight)
+        with cls._lock:
+            if key not in cls._cache:
+                cls._cache = {cached : finder for cached, finder in cls._cache.items() if cached[0] == key[0]}
+                cls._cache[key] = cls(data_path
+                                    , geo_weight)
+            return cls._cache[key]
+
+    @tracer.traced('peer_query')
+    def peers(self
+            , codes : Optional[list] = None
+            , k : int = 10) -> pd.DataFrame:
+        """
+        Batched k-nearest peers, one tree query for every municipality asked for.
+
+        Args:
+            codes (Optional[list]): CodMunIBGE to find peers for, or None for every indexed municipality.
+            k (int): Peers per municipality, itself excluded.
+
+        Returns:
+            DataFrame: CodMunIBGE, Posição (1 = closest), CodMunIBGE Par, Município Par, UF Par and Distância (in standard deviations), one row per peer.
+        """
+        rows = np.arange(len(self.municipalities)) if codes is None else self.position.reindex(codes).dropna().to_numpy(dtype = int)
+        k = min(k, len(self.municipalities) - 1)
+        if not len(rows) or k < 1:
+            return pd.DataFrame(columns = ['CodMunIBGE', 'Posição', 'CodMunIBGE Par', 'Município Par', 'UF Par', 'Distância'])
+        distances, neighbours = self.tree.query(self.matrix[rows]
+                                              , k = k + 1)
+        # Drop each municipality from its own list (usually column 0, unless tied with an identical peer)
+        own = neighbours == rows[:, None]
+        own[~own.any(axis = 1), -1] = True
+        keep = ~own
+        distances = distances[keep].reshape(len(rows), k)
+        neighbours = neighbours[keep].reshape(len(rows), k)
+        peers = self.municipalities.iloc[neighbours.ravel()]
+        result = pd.DataFrame({'CodMunIBGE' : np.repeat(self.municipalities['CodMunIBGE'].to_numpy()[rows], k)
+                             , 'Posição' : np.tile(np.arange(1, k + 1), len(rows))
+                             , 'CodMunIBGE Par' : peers['CodMunIBGE'].to_numpy()
+                             , 'Município Par' : peers['Município'].to_numpy()
+                             , 'UF Par' : peers['UF'].to_numpy()
+                             , 'Distância' : distances.ravel()})
+        tracer.current().rows = len(result)
+        return result
+
+    @tracer.traced('peer_finish', 'filename')
+    def save(self
+           , gold_folder : str
+           , k : int = 10
+           , filename : str = 'PeerData.parquet') -> pd.DataFrame:
+        """Peers of every indexed municipality, saved as a Gold table."""
+        peers = self.peers(k = k)
+        path = os.path.join(gold_folder
+                          , filename)
+        with atomic_path(path) as temp_path:
+            peers.to_parquet(temp_path
+                           , engine = 'pyarrow'
+                           , index = False)
+        span = tracer.current()
+        span.rows = len(peers)
+        span.bytes_written = os.path.getsize(path)
+        return peers
+
 class DataMerger:
     @staticmethod
+    @tracer.traced('merge_data')
     def merge_data(data : pd.DataFrame
                  , geodata : gpd.GeoDataFrame
-                 , gold_folder : str) -> gpd.GeoDataFrame:
+                 , gold_folder : str
+                 , memory_budget : Optional[int] = None
+                 , simplify : bool = True
+                 , encoding : str = 'WKB'
+                 , writer : Optional[ParquetWriteBehind] = None) -> gpd.GeoDataFrame:
         """
         Merge finished DataFrame to Municipalities geodata.
 
         Args:
             data (DataFrame): Finished data at Gold layer, ready to use.
             geodata (GeoDataFrame): Polygons from each city in Brazil.
+            memory_budget (Optional[int]): Memory budget in bytes; over it, merge and simplification run on row chunks.
+            simplify (bool): Simplify the merged polygons; False when fetch_geodata already did.
+            encoding (str): AppData geometry encoding, 'WKB' or 'geoarrow' (native coordinate arrays plus a bbox covering column).
+            writer (Optional[ParquetWriteBehind]): Writer whose codec and row groups AppData is written with; None for the defaults.
 
         Returns:
             GeoDataFrame: A GeoDataFrame containing the selected IPEA data.
         """
-        start_time = time.time()
-        data.loc[:, 'CodMunIBGE'] = data['CodMunIBGE'].astype(int)
-        geodata['code_muni'] = geodata['code_muni'].astype(int)
+        # Both frames are shared with concurrent stages (amc reads geodata), so cast into new frames
+        data = data.assign(CodMunIBGE = data['CodMunIBGE'].astype(int))
         geodata = geodata.rename(columns = {'code_muni' : 'CodMunIBGE'})
-        app_data = data.merge(geodata
-                            , how = 'left'
-                            , on = 'CodMunIBGE')
-        app_data = gpd.GeoDataFrame(app_data
+        geodata = geodata.assign(CodMunIBGE = geodata['CodMunIBGE'].astype(int))
+        rows = chunk_rows([data, geodata]
+                        , memory_budget) or max(len(data), 1)
+        chunks = []
+        for start in range(0, max(len(data), 1), rows):
+            chunk = data.iloc[start:start + rows].merge(geodata
+                                                      , how = 'left'
+                                                      , on = 'CodMunIBGE')
+            chunk = gpd.GeoDataFrame(chunk
+                                   , geometry = 'geometry')
+            if simplify:
+                chunk['geometry'] = chunk.geometry.simplify(tolerance = 0.01)
+            chunks.append(chunk)
+        app_data = gpd.GeoDataFrame(pd.concat(chunks
+                                            , ignore_index = True) if len(chunks) > 1 else chunks[0]
                                   , geometry = 'geometry')
-        app_data['geometry'] = app_data.geometry.simplify(tolerance = 0.01)
-        file_path = os.path.join(gold_folder
-                               , 'AppData.parquet')
-        app_data.to_parquet(file_path
-                          , index = None
-                          , compression = 'snappy'
-                          , schema_version = None)
-        elapsed_time = time.time() - start_time
-        logging.info(f"Merged data in {elapsed_time:.2f} seconds")
+        # Written before returning: the map, index and peer stages read the file right after
+        span = tracer.current()
+        span.bytes_written = (writer or ParquetWriteBehind()).write_now(geoparquet_table(app_data
+                                                                                        , encoding)
+                                                                       , os.path.join(gold_folder
+                                                                                    , 'AppData.parquet'))
+        span.rows = len(app_data)
         return gpd.GeoDataFrame(app_data)
 
+    @staticmethod
+    @tracer.traced('merge_tracts')
+    def merge_tracts(data : pd.DataFrame
+                   , fetcher : DataFetcher
+                   , gold_folder : str
+                   , ufs : Optional[list] = None
+                   , memory_budget : Optional[int] = None
+                   , tolerance : float = 0.001
+                   , folder : str = 'Tracts'
+                   , writer : Optional[ParquetWriteBehind] = None) -> list:
+        """
+        Census tract mode: fetch, simplify and join municipality attributes onto tracts one UF at a time, writing a UF=<abbrev> partition per UF under Gold/Tracts. Only one UF is held in memory, and all of it: geobr serves tracts one UF file at a time, so the fetch itself isn't chunked. Over the memory budget, simplification, joins and writes run on row chunks of that UF, one part file each.
+
+        Args:
+            data (DataFrame): Finished data at Gold layer; tracts inherit their municipality indicators.
+            fetcher (DataFetcher): Source of the tract polygons.
+            gold_folder (str): Gold layer directory.
+            ufs (Optional[list]): UF abbreviations to process, or None for every UF.
+            memory_budget (Optional[int]): Memory budget in bytes for the chunked steps.
+            tolerance (float): Simplification tolerance applied to the tract polygons.
+            folder (str): Partitioned dataset directory, inside the Gold folder.
+            writer (Optional[ParquetWriteBehind]): Writer whose codec and row groups the parts are written with; None for the defaults. Parts are written on this thread, so at most one chunk is held at a time.
+
+        Returns:
+            list: Partition directories written.
+        """
+        attributes = data[[column for column in MAP_COLUMNS if column != 'geometry']].copy()
+        attributes['CodMunIBGE'] = attributes['CodMunIBGE'].astype('int64').astype(str)
+        root = os.path.join(gold_folder
+                          , folder)
+        writer = writer or ParquetWriteBehind()
+        written, rows = [], 0
+        for uf in ufs or sorted(UF_CODES.values()):
+            tracts = fetcher.fetch_tracts(uf)
+            step = chunk_rows([tracts]
+                            , memory_budget) or max(len(tracts), 1)
+            partition = os.path.join(root
+                                   , f'UF={uf}')
+            # Build the partition aside and swap it in, so readers never see a half-written UF
+            temp_partition = f'{partition}.{os.getpid()}.tmp'
+            os.makedirs(temp_partition
+                      , exist_ok = True)
+            for part, start in enumerate(range(0, max(len(tracts), 1), step)):
+                chunk = tracts.iloc[start:start + step].copy()
+                chunk['geometry'] = chunk.geometry.simplify(tolerance = tolerance)
+                chunk = gpd.GeoDataFrame(chunk.merge(attributes
+                                                   , how = 'left'
+                                                   , on = 'CodMunIBGE')
+                                       , geometry = 'geometry'
+                                       , crs = tracts.crs)
+                chunk['data_status'] = chunk['data_status'].fillna('incomplete')
+                writer.write_now(geoparquet_table(chunk)
+                               , os.path.join(temp_partition
+                                            , f'part-{part:05d}.parquet'))
+                rows += len(chunk)
+            if os.path.exists(partition):
+                shutil.rmtree(partition)
+            os.replace(temp_partition
+                     , partition)
+            written.append(partition)
+            del tracts
+        tracer.current().rows = rows
+        return written
+
+class GoldService:
+    # Served datasets, by name, and the Gold file each one reads
+    datasets = {'gold' : 'DescriptiveData.parquet'
+              , 'rollup' : 'RollupData.parquet'
+              , 'app' : 'AppData.parquet'
+              , 'amc' : 'AMCData.parquet'
+              , 'peers' : 'PeerData.parquet'}
+    # Geometry stays with the map; the service streams attributes only (and no pandas index columns)
+    excluded = ('geometry', 'bbox')
+    operators = {'eq' : lambda field, value : field == value
+               , 'ne' : lambda field, value : field != value
+               , 'lt' : lambda field, value : field < value
+               , 'le' : lambda field, value : field <= value
+               , 'gt' : lambda field, value : field > value
+               , 'ge' : lambda field, value : field >= value
+               , 'in' : lambda field, value : field.isin(value)}
+
+    def __init__(self
+               , gold_folder : str
+               , host : str = '127.0.0.1'
+               , port : int = 8815
+               , batch_size : int = 65536):
+        """
+        Local read-only service streaming Gold tables as Arrow IPC record batches over HTTP, straight from the parquet files, so any number of readers can pull at once without opening the DuckDB file.
+
+        GET /datasets lists the datasets and their schemas as JSON. GET /<dataset> streams one (application/vnd.apache.arrow.stream), with optional parameters:
+            columns: comma-separated projection.
+            filter: column:operator:value, repeatable and combined with AND; operators eq, ne, lt, le, gt, ge and in (values separated by |).
+            limit: maximum rows.
+
+        Args:
+            gold_folder (str): Gold layer directory.
+            host (str): Interface to listen on; localhost by default.
+            port (int): TCP port, or 0 for any free one.
+            batch_size (int): Maximum rows per record batch.
+        """
+        self.gold_folder = gold_folder
+        self.batch_size = batch_size
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                service.handle(self)
+
+            def log_message(self, format, *args):
+                logging.info(f'Gold service {self.address_string()} {format % args}')
+
+        self.server = ThreadingHTTPServer((host, port)
+                                        , Handler)
+        self.address = self.server.server_address
+
+    def _attributes(self
+                  , schema : pa.Schema) -> list:
+        """Served columns of a dataset: everything but geometry and pandas __index_level_N__ columns."""
+        return [field for field in schema.names if field not in self.excluded and not field.startswith('__index_level_')]
+
+    def _dataset(self
+               , name : str) -> ds.Dataset:
+        """Arrow dataset over the Gold file of a served dataset name."""
+        if name not in self.datasets:
+            raise KeyError(f'Unknown dataset {name}; available: {sorted(self.datasets)}')
+        path = os.path.join(self.gold_folder
+                          , self.datasets[name])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'{self.datasets[name]} has not been built yet')
+        return ds.dataset(path
+                        , format = 'parquet')
+
+    def _filter(self
+              , schema : pa.Schema
+              , filters : list) -> Optional[ds.Expression]:
+        """AND of every column:operator:value filter, values cast to the column type."""
+        expression = None
+        for item in filters:
+            column, operator, value = item.split(':', 2)
+            if column not in schema.names or operator not in self.operators:
+                raise ValueError(f'Invalid filter {item}')
+            kind = schema.field(column).type
+            if operator == 'in':
+                value = pc.cast(pa.array(value.split('|')), kind)
+            else:
+                value = pc.cast(pa.scalar(value), kind)
+            condition = self.operators[operator](ds.field(column), value)
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    @tracer.traced('gold_service_request')
+    def handle(self
+             , request : BaseHTTPRequestHandler) -> None:
+        """Answer one GET request: dataset listing, or a filtered and projected Arrow IPC stream."""
+        url = urllib.parse.urlsplit(request.path)
+        name = url.path.strip('/')
+        params = urllib.parse.parse_qs(url.query)
+        span = tracer.current()
+        span.file = name
+        try:
+            if name == 'datasets':
+                listing = {}
+                for dataset in self.datasets:
+                    try:
+                        schema = self._dataset(dataset).schema
+                        listing[dataset] = {column : str(schema.field(column).type) for column in self._attributes(schema)}
+                    except FileNotFoundError:
+                        continue
+                body = json.dumps(listing).encode('utf-8')
+                request.send_response(200)
+                request.send_header('Content-Type', 'application/json')
+                request.send_header('Content-Length', str(len(body)))
+                request.end_headers()
+                request.wfile.write(body)
+                return
+            dataset = self._dataset(name)
+            available = self._attributes(dataset.schema)
+            columns = params['columns'][0].split(',') if 'columns' in params else available
+            unknown = [column for column in columns if column not in available]
+            if unknown:
+                raise ValueError(f'Unknown columns {unknown}')
+            scanner = dataset.scanner(columns = columns
+                                    , filter = self._filter(dataset.schema, params.get('filter', []))
+                                    , batch_size = self.batch_size)
+            limit = int(params['limit'][0]) if 'limit' in params else None
+            if limit is not None and limit < 0:
+                raise ValueError(f'Invalid limit {limit}')
+        except (KeyError, FileNotFoundError) as e:
+            request.send_error(404, str(e))
+            return
+        except (ValueError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            request.send_error(400, str(e))
+            return
+
+        request.send_response(200)
+        request.send_header('Content-Type', 'application/vnd.apache.arrow.stream')
+        request.end_headers()
+        rows = 0
+        with pa.ipc.new_stream(request.wfile
+                             , scanner.projected_schema) as writer:
+            for batch in scanner.to_batches():
+                if limit is not None:
+                    batch = batch.slice(0, limit - rows)
+                writer.write_batch(batch)
+                rows += batch.num_rows
+                if limit is not None and rows >= limit:
+                    break
+        span.rows = rows
+
+    def serve_forever(self) -> None:
+        """Serve requests, each on its own thread, until shutdown() is called."""
+        logging.info(f'Gold service listening on http://{self.address[0]}:{self.address[1]}')
+        self.server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop serving and release the port."""
+        self.server.shutdown()
+        self.server.server_close()
+
+def read_gold_service(url : str
+                    , dataset : str
+                    , columns : Optional[list] = None
+                    , filters : Optional[list] = None
+                    , limit : Optional[int] = None
+                    , timeout : float = 60) -> pa.Table:
+    """
+    Client side of GoldService: pull one dataset as an Arrow table.
+
+    Args:
+        url (str): Service base URL, e.g. http://127.0.0.1:8815.
+        dataset (str): GoldService dataset name.
+        columns (Optional[list]): Projection, or None for every attribute column.
+        filters (Optional[list]): (column, operator, value) tuples; 'in' takes a list of values.
+        limit (Optional[int]): Maximum rows.
+        timeout (float): Seconds to wait for the service.
+
+    Returns:
+        Table: Rows streamed by the service.
+    """
+    params = []
+    if columns:
+        params.append(('columns', ','.join(columns)))
+    for column, operator, value in filters or []:
+        params.append(('filter', f"{column}:{operator}:{'|'.join(map(str, value)) if operator == 'in' else value}"))
+    if limit is not None:
+        params.append(('limit', str(limit)))
+    query = urllib.parse.urlencode(params
+                                 , quote_via = urllib.parse.quote)
+    with urllib.request.urlopen(f"{url.rstrip('/')}/{dataset}?{query}"
+                              , timeout = timeout) as response:
+        return pa.ipc.open_stream(response).read_all()
+
 def main():
     config = {'bronze' : os.getenv('BRONZE_FOLDER', 'Bronze')
             , 'silver' : os.getenv('SILVER_FOLDER', 'Silver')
             , 'gold' : os.getenv('GOLD_FOLDER', 'Gold')
             , 'statistical_analysis' : os.getenv('STATISTICAL_ANALYSIS_FOLDER', 'Statistical Analysis')
-            , 'db_path' : os.getenv('DB_PATH', 'ipea.db')}
+            , 'db_path' : os.getenv('DB_PATH', 'ipea.db')
+            , 'trace' : os.getenv('TRACE_FOLDER', 'Traces')
+            , 'memory_budget_mb' : os.getenv('MEMORY_BUDGET_MB')
+            , 'profile_memory' : os.getenv('PROFILE_MEMORY', '') not in ('', '0')
+            , 'dedupe_policy' : os.getenv('DEDUPE_POLICY', 'first')
+            , 'workers' : int(os.getenv('PIPELINE_WORKERS', '4'))
+            , 'reconcile_days' : float(os.getenv('RECONCILE_DAYS', '30'))
+            , 'panel_cluster' : os.getenv('PANEL_CLUSTER', 'UF')
+            , 'panel_unit' : os.getenv('PANEL_UNIT', 'CodMunIBGE')
+            , 'tract_ufs' : os.getenv('TRACT_UFS', '')
+            , 'peer_geo_weight' : float(os.getenv('PEER_GEO_WEIGHT', '0'))
+            , 'geometry_encoding' : os.getenv('GEOMETRY_ENCODING', 'WKB')
+            , 'fetch_deadline' : float(os.getenv('FETCH_DEADLINE', '120'))
+            , 'fetch_retries' : int(os.getenv('FETCH_RETRIES', '2'))
+            , 'fetch_hedge_after' : os.getenv('FETCH_HEDGE_AFTER', '30')
+            , 'write_queue' : int(os.getenv('WRITE_QUEUE', '8'))
+            , 'row_group_rows' : int(os.getenv('ROW_GROUP_ROWS', '1024'))}
     
     # Extract values from the config dictionary
     bronze_folder = config['bronze']
@@ -462,48 +3506,169 @@ def main():
     gold_folder = config['gold']
     statistical_analysis_folder = config['statistical_analysis']
     db_path = config['db_path']
+    memory_budget = int(config['memory_budget_mb']) * 2**20 if config['memory_budget_mb'] else None
+    if config['profile_memory']:
+        tracer.profile_memory()
     
-    processor = DataProcessor(bronze_folder
-                            , silver_folder
-                            , gold_folder
-                            , statistical_analysis_folder
-                            , db_path)
-    processor.create_folders()
-
-    data_series = [('PIB_IBGE_5938_37', 2010, 'PIB_2010.parquet')
-                 , ('RECORRM', 2010, 'RecCorr_2010.parquet')
-                 , ('POPTOT', 2010, 'População_2010.parquet')
-                 , ('Municípios', None, 'Municípios.parquet')]
-    
-    for series, year, filename in data_series:
-        start_time = time.time()
-        processor.process_data(series
-                             , year
-                             , filename)
-        elapsed_time = time.time() - start_time
-        logging.info(f"Processed data for {filename} in {elapsed_time:.2f} seconds")
-
-    r_code = """
-    install.packages('ipeadatar', repos = 'http://cran.r-project.org')
-    library(ipeadatar)
-    data_IDHM <- ipeadatar::ipeadata(code = 'ADH_IDHM')
-    data_IDHM
-    """
-    processor.process_data(None
-                         , None
-                         , 'IDHM_2010.parquet'
-                         , r_code = r_code)
-
-    if processor.join_list:
-        df = processor.gold_finish('DescriptiveData.parquet')
-        processor.analyze_data(df)
-        df = Database()
-        fetcher = DataFetcher(db_path)
-        data = fetcher.fetch_data()
-        geodata = fetcher.fetch_geodata()
-        app_data = DataMerger.merge_data(data
-                                       , geodata
-                                       , gold_folder)
+    # Every stage span nests under the run span; exported even when the run fails
+    try:
+        with tracer.span('pipeline'):
+            processor = DataProcessor(bronze_folder
+                                    , silver_folder
+                                    , gold_folder
+                                    , statistical_analysis_folder
+                                    , db_path
+                                    , memory_budget
+                                    , config['dedupe_policy']
+                                    , config['reconcile_days']
+                                    , FetchPolicy(config['fetch_deadline']
+                                                , config['fetch_retries']
+                                                , hedge_after = float(config['fetch_hedge_after']) if config['fetch_hedge_after'] else None)
+                                    , ParquetWriteBehind(config['write_queue']
+                                                       , config['row_group_rows']))
+            processor.create_folders()
+            fetcher = DataFetcher(db_path)
+
+            r_code = """
+            install.packages('ipeadatar', repos = 'http://cran.r-project.org')
+            library(ipeadatar)
+            data_IDHM <- ipeadatar::ipeadata(code = 'ADH_IDHM')
+            data_IDHM
+            """
+            fallbacks = {'ADH_IDHM' : r_code}
+
+            def silver(*bronze_dfs):
+                # One long-format pass over every registered series
+                bronze = dict(zip(SERIES_REGISTRY, bronze_dfs))
+                if all(bronze_df is None for bronze_df in bronze_dfs):
+                    return None
+                return processor.silver_series(bronze)
+
+            def gold(territories, series_long):
+                if territories is None or series_long is None:
+                    return None
+                processor.join_list = [territories]
+                return processor.gold_finish('DescriptiveData.parquet')
+
+            def crosswalk():
+                try:
+                    return AMCCrosswalk(bronze_folder)
+                except Exception as e:
+                    logging.error(f'Error fetching the AMC crosswalk: {e}')
+                    return None
+
+            def amc(df, crosswalk, geodata):
+                if df is not None and crosswalk is not None:
+                    processor.amc_finish(crosswalk
+                                       , geodata)
+
+            def analyze(df, crosswalk = None):
+                if df is not None:
+                    processor.analyze_data(df
+                                         , config['panel_cluster']
+                                         , crosswalk)
+
+            def merge(df, geodata):
+                if df is None:
+                    return None
+                Database()
+                return DataMerger.merge_data(fetcher.fetch_data()
+                                           , geodata
+                                           , gold_folder
+                                           , memory_budget
+                                           , simplify = False
+                                           , encoding = config['geometry_encoding']
+                                           , writer = processor.writer)
+
+            def spatial_index(app_data):
+                if app_data is not None:
+                    SpatialIndex(os.path.join(gold_folder
+                                            , 'AppData.parquet'))
+
+            def peers(app_data, _):
+                if app_data is not None:
+                    PeerFinder.load(os.path.join(gold_folder
+                                               , 'AppData.parquet')
+                                  , config['peer_geo_weight']).save(gold_folder)
+
+            def maps(app_data):
+                if app_data is None:
+                    return
+                # Render the unfiltered maps ahead of time for every dashboard language
+                app_data_path = os.path.join(gold_folder
+                                           , 'AppData.parquet')
+                map_cache = MapCache(os.path.join(gold_folder
+                                                , 'Maps')
+                                   , app_data_path)
+                query = GoldQuery(app_data_path)
+                for locale in MAP_LOCALES:
+                    map_cache.render(locale
+                                   , lambda : query.select(MAP_COLUMNS))
+
+            # Boundaries don't depend on any series, so they are fetched and simplified alongside them
+            # Every stage waits for its queued writes before the stages after it start
+            scheduler = StageScheduler(config['workers']
+                                     , processor.writer.flush)
+            scheduler.add('geodata'
+                        , lambda : fetcher.fetch_geodata(tolerance = 0.01))
+            for spec in SERIES:
+                scheduler.add(spec.filename
+                            , functools.partial(processor.bronze_fetch
+                                              , spec.series_id
+                                              , spec.year
+                                              , spec.filename
+                                              , r_code = fallbacks.get(spec.series_id)))
+            scheduler.add('Municípios.parquet'
+                        , functools.partial(processor.process_data
+                                          , 'Municípios'
+                                          , None
+                                          , 'Municípios.parquet'))
+            scheduler.add('silver'
+                        , silver
+                        , [spec.filename for spec in SERIES])
+            scheduler.add('gold'
+                        , gold
+                        , ['Municípios.parquet', 'silver'])
+            # The AMC crosswalk (a geobr download) and the AMC Gold table are only built for an AMC panel
+            amc_panel = config['panel_unit'] == 'AMC'
+            if amc_panel:
+                scheduler.add('crosswalk'
+                            , crosswalk)
+                scheduler.add('amc'
+                            , amc
+                            , ['gold', 'crosswalk', 'geodata'])
+            scheduler.add('analyze'
+                        , analyze
+                        , ['gold', 'crosswalk'] if amc_panel else ['gold'])
+            scheduler.add('merge'
+                        , merge
+                        , ['gold', 'geodata'])
+            scheduler.add('maps'
+                        , maps
+                        , ['merge'])
+            scheduler.add('spatial_index'
+                        , spatial_index
+                        , ['merge'])
+            scheduler.add('peers'
+                        , peers
+                        , ['merge', 'spatial_index'])
+            # Census tract mode, opt-in: 'all' or comma-separated UF abbreviations
+            if config['tract_ufs']:
+                tract_ufs = None if config['tract_ufs'] == 'all' else [uf.strip() for uf in config['tract_ufs'].split(',')]
+                scheduler.add('tracts'
+                            , lambda df : DataMerger.merge_tracts(df
+                                                                , fetcher
+                                                                , gold_folder
+                                                                , tract_ufs
+                                                                , memory_budget
+                                                                , writer = processor.writer) if df is not None else None
+                            , ['gold'])
+            try:
+                scheduler.run()
+            finally:
+                processor.writer.close()
+    finally:
+        tracer.export(config['trace'])
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,403 @@
+"""
+Pipeline benchmark over synthetic data, with local stand-ins for the IPEA, CRAN and geobr services.
+
+Synthetic Bronze inputs and municipality polygons are generated at a multiple of the real
+municipality count, every backend stage is timed, and timings are compared against a stored baseline.
+A missing baseline is an error: record one on the machine that runs the comparison with --write-baseline.
+
+Usage:
+    python benchmark.py --scales 1 10 100
+    python benchmark.py --scales 1 10 100 --write-baseline
+    python benchmark.py --scales 1 --update-baseline
+    python benchmark.py --scales 1 10 --encodings
+    python benchmark.py --imports
+"""
+import os
+import io
+import sys
+import json
+import time
+import types
+import logging
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from unittest import mock
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import pyarrow.parquet as pq
+import folium
+import backend
+
+MUNICIPALITIES = 5565
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(ROOT
+                           , 'benchmark_baseline.json')
+# Cold-start entry points: the backend module and each dashboard page, imported without running main(), and the
+# framework modules imported first, so what they load themselves isn't charged to our code (pandas 2.2 pulls in pyarrow)
+ENTRY_POINTS = {'backend' : ('backend.py', ['pandas'])
+              , 'page pt-BR' : (os.path.join('pages', '_⚽_pt-BR.py'), ['pandas', 'streamlit', 'streamlit.components.v1'])
+              , 'page en-GB' : (os.path.join('pages', '_👑_en-GB.py'), ['pandas', 'streamlit', 'streamlit.components.v1'])}
+# Dependencies only the stages (or tabs) using them may load
+HEAVY_MODULES = ['rpy2'
+               , 'pyarrow'
+               , 'statsmodels'
+               , 'patsy'
+               , 'geobr'
+               , 'geopandas'
+               , 'duckdb'
+               , 'folium'
+               , 'plotly'
+               , 'matplotlib'
+               , 'seaborn']
+STAGES = ['bronze_fetch'
+        , 'silver_transform'
+        , 'gold_finish'
+        , 'analyze_data'
+        , 'fetch_geodata'
+        , 'merge_data'
+        , 'map_build']
+
+class SyntheticData:
+    def __init__(self
+               , scale : int
+               , seed : int = 0):
+        """
+        Synthetic IPEA series and municipality polygons, shaped like the real services output.
+
+        Args:
+            scale (int): Multiple of the real municipality count to generate.
+            seed (int): Random generator seed, so runs are comparable.
+        """
+        self.size = MUNICIPALITIES * scale
+        rng = np.random.default_rng(seed)
+        uf_codes = np.array(list(backend.UF_CODES))
+        ufs = uf_codes[np.arange(self.size) % len(uf_codes)]
+        sequence = np.arange(self.size) // len(uf_codes)
+        self.codes = np.char.add(ufs, np.char.zfill(sequence.astype(str), 5))
+        self.ufs = ufs
+        self.population = np.maximum(rng.lognormal(9.5, 1.1, self.size).astype(int), 800)
+        self.pib = rng.lognormal(11.5, 1.4, self.size).round(3) # R$ (mil)
+        self.revenue = (self.pib * 1000 * rng.beta(2, 12, self.size)).round(2)
+        self.idhm = rng.beta(30, 15, self.size).round(3)
+        # About 1% of each indicator missing, so incomplete rows exist
+        self.pib[rng.random(self.size) < 0.01] = np.nan
+        self.revenue[rng.random(self.size) < 0.01] = np.nan
+        self.idhm[rng.random(self.size) < 0.01] = np.nan
+        self.rng = rng
+
+    def timeseries(self
+                 , series : str
+                 , year : int) -> pd.DataFrame:
+        """Stand-in for ipeadatapy.timeseries, with municipality and state rows."""
+        values = {'PIB_IBGE_5938_37' : ('VALUE (R$ (mil), a preços do ano 2010)', self.pib)
+                , 'RECORRM' : ('VALUE (R$)', self.revenue)
+                , 'POPTOT' : ('VALUE (Habitante)', self.population.astype(float))}
+        column, value = values[series]
+        codes = np.concatenate([self.codes, np.array(list(backend.UF_CODES))])
+        levels = ['Municípios'] * self.size + ['Estados'] * len(backend.UF_CODES)
+        return pd.DataFrame({'CODE' : series
+                           , 'RAW DATE' : f'{year}-01-01T00:00:00-02:00'
+                           , 'YEAR' : year
+                           , 'NIVNOME' : levels
+                           , 'TERCODIGO' : codes
+                           , column : np.concatenate([value, np.full(len(backend.UF_CODES), np.nan)])})
+
+    def territories(self) -> pd.DataFrame:
+        """Stand-in for ipeadatapy.territories."""
+        return pd.DataFrame({'LEVEL' : 'Municípios'
+                           , 'NAME' : np.char.add('Município ', self.codes)
+                           , 'ID' : self.codes
+                           , 'AREA' : self.rng.lognormal(6, 1, self.size).round(1)
+                           , 'CAPITAL' : False})
+
+    def api_fetch(self
+                , series : str
+                , year : int
+                , **kwargs) -> pd.DataFrame:
+        """Stand-in for DataProcessor.api_fetch (and its ipeadatar fallback), already filtered to the year."""
+        return pd.DataFrame({'code' : series
+                           , 'date' : pd.Timestamp(f'{year}-01-01')
+                           , 'value' : self.idhm
+                           , 'uname' : 'Municipality'
+                           , 'tcode' : self.codes.astype(int)})
+
+    def read_municipality(self
+                        , code_muni : str = 'all'
+                        , year : int = 2010) -> gpd.GeoDataFrame:
+        """Stand-in for geobr.read_municipality: jittered 24-vertex polygons on a grid over Brazil's extent."""
+        columns = int(np.ceil(np.sqrt(self.size * 40 / 39)))
+        width, height = 40 / columns, 39 / np.ceil(self.size / columns)
+        cells = np.arange(self.size)
+        centers = np.column_stack([-74 + (cells % columns + 0.5) * width
+                                 , -34 + (cells // columns + 0.5) * height])
+        angles = np.linspace(0, 2 * np.pi, 25)[:-1]
+        radius = self.rng.uniform(0.3, 0.5, (self.size, 24))
+        ring = np.stack([centers[:, [0]] + radius * width * np.cos(angles)
+                       , centers[:, [1]] + radius * height * np.sin(angles)]
+                      , axis = -1)
+        ring = np.concatenate([ring, ring[:, :1]]
+                            , axis = 1)
+        return gpd.GeoDataFrame({'code_muni' : self.codes.astype(float)
+                               , 'name_muni' : np.char.add('Município ', self.codes)
+                               , 'code_state' : self.ufs.astype(float)
+                               , 'abbrev_state' : pd.Series(self.ufs).map(backend.UF_CODES).to_numpy()}
+                              , geometry = shapely.polygons(ring)
+                              , crs = 'EPSG:4674')
+
+def run_pipeline(scale : int) -> dict:
+    """
+    Run every backend stage once over synthetic data at the given scale, in a scratch directory.
+
+    Args:
+        scale (int): Multiple of the real municipality count to generate.
+
+    Returns:
+        dict: Elapsed seconds per stage.
+    """
+    data = SyntheticData(scale)
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    def timed(stage, func, *args, **kwargs):
+        start_time = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[stage] += time.perf_counter() - start_time
+        return result
+
+    ipea = types.SimpleNamespace(timeseries = data.timeseries
+                               , territories = data.territories)
+    geobr = types.SimpleNamespace(read_municipality = data.read_municipality)
+    with tempfile.TemporaryDirectory() as folder, \
+         mock.patch.object(backend, 'ipea', ipea), \
+         mock.patch.object(backend, 'geobr', geobr), \
+         mock.patch.object(backend.DataProcessor, 'api_fetch', lambda self, series, year, **kwargs : data.api_fetch(series, year)), \
+         contextlib.redirect_stdout(io.StringIO()):
+        gold_folder = os.path.join(folder, 'Gold')
+        processor = backend.DataProcessor(os.path.join(folder, 'Bronze')
+                                        , os.path.join(folder, 'Silver')
+                                        , gold_folder
+                                        , os.path.join(folder, 'Statistical Analysis')
+                                        , os.path.join(folder, 'ipea.db'))
+        processor.create_folders()
+        bronze = {spec.series_id : timed('bronze_fetch', processor.bronze_fetch, spec.series_id, spec.year, spec.filename)
+                  for spec in backend.SERIES}
+        territories = timed('bronze_fetch', processor.bronze_fetch, 'Municípios', None, 'Municípios.parquet')
+        # Stage-end barriers, as the scheduler runs them, so write-behind time stays in its stage
+        timed('bronze_fetch', processor.writer.flush)
+        processor.join_list.append(timed('silver_transform', processor.silver_transform, territories, 'Municípios.parquet'))
+        timed('silver_transform', processor.silver_series, bronze)
+        timed('silver_transform', processor.writer.flush)
+        df = timed('gold_finish', processor.gold_finish, 'DescriptiveData.parquet')
+        timed('gold_finish', processor.writer.close)
+        timed('analyze_data', processor.analyze_data, df)
+        geodata = timed('fetch_geodata', backend.DataFetcher(processor.db_path).fetch_geodata)
+        timed('merge_data', backend.DataMerger.merge_data, df.copy(), geodata, gold_folder)
+
+        def map_build():
+            query = backend.GoldQuery(os.path.join(gold_folder, 'AppData.parquet'))
+            mapa = backend.Mapper(query.select(backend.MAP_COLUMNS)).create_map()
+            return folium.Figure().add_child(mapa).render()
+        timed('map_build', map_build)
+    return timings
+
+def compare_encodings(scale : int
+                    , repeat : int = 3) -> dict:
+    """
+    AppData file size and load time with WKB+snappy geometries against GeoArrow+snappy, over synthetic municipalities.
+
+    Args:
+        scale (int): Multiple of the real municipality count to generate.
+        repeat (int): Loads per measurement; the fastest is kept.
+
+    Returns:
+        dict: Per encoding, file bytes, seconds to read into a GeoDataFrame and seconds for a dashboard GoldQuery load plus map select.
+    """
+    data = SyntheticData(scale)
+    app_data = data.read_municipality()
+    app_data = gpd.GeoDataFrame({'CodMunIBGE' : data.codes.astype(int)
+                               , 'Município' : app_data['name_muni']
+                               , 'Habitantes 2010' : data.population
+                               , 'IDHM 2010' : data.idhm
+                               , 'Carga Tributária Municipal 2010' : data.revenue / (data.pib * 1000)
+                               , 'data_status' : np.where(np.isnan(data.idhm), 'incomplete', 'complete')}
+                              , geometry = app_data.geometry
+                              , crs = app_data.crs)
+
+    def fastest(func):
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start_time)
+        return min(timings)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        paths = {'WKB' : os.path.join(folder, 'AppData_wkb.parquet')
+               , 'GeoArrow' : os.path.join(folder, 'AppData_geoarrow.parquet')}
+        app_data.to_parquet(paths['WKB']
+                          , index = None
+                          , compression = 'snappy'
+                          , schema_version = None)
+        pq.write_table(backend.geoarrow_table(app_data)
+                     , paths['GeoArrow']
+                     , compression = 'snappy')
+        for encoding, path in paths.items():
+            results[encoding] = {'bytes' : os.path.getsize(path)
+                               , 'read' : fastest(lambda : backend.read_geoparquet(path))
+                               , 'query' : fastest(lambda : backend.GoldQuery(path).select(backend.MAP_COLUMNS))}
+    return results
+
+def import_times(repeat : int = 3
+               , top : int = 5) -> dict:
+    """
+    Cold import cost of every entry point, each in a fresh interpreter under -X importtime.
+
+    Args:
+        repeat (int): Interpreters per entry point; the fastest is kept.
+        top (int): Heaviest top-level imports reported per entry point.
+
+    Returns:
+        dict: Per entry point, import seconds (frameworks included), its heaviest top-level imports as (module, seconds) and the heavy modules it loaded eagerly beyond its frameworks.
+    """
+    script = ('import importlib, importlib.util, json, sys\n'
+              'for framework in sys.argv[2:]:\n'
+              '    importlib.import_module(framework)\n'
+              'before = set(sys.modules)\n'
+              'spec = importlib.util.spec_from_file_location("entry_point", sys.argv[1])\n'
+              'spec.loader.exec_module(importlib.util.module_from_spec(spec))\n'
+              'print(json.dumps(sorted({name.split(".")[0] for name in set(sys.modules) - before})))')
+    results = {}
+    for name, (path, frameworks) in ENTRY_POINTS.items():
+        runs = []
+        for _ in range(repeat):
+            process = subprocess.run([sys.executable, '-X', 'importtime', '-c', script, path, *frameworks]
+                                   , cwd = ROOT
+                                   , capture_output = True
+                                   , text = True
+                                   , check = True)
+            # -X importtime lines: "import time: self [us] | cumulative [us] | <indent>package", nesting by indent
+            imports = []
+            for line in process.stderr.splitlines():
+                if not line.startswith('import time:') or 'cumulative' in line:
+                    continue
+                _, cumulative, package = line[len('import time:'):].split('|')
+                if not package[1:].startswith(' '):
+                    imports.append((package.strip(), int(cumulative) / 1e6))
+            loaded = json.loads(process.stdout.splitlines()[-1])
+            runs.append({'seconds' : sum(seconds for _, seconds in imports)
+                       , 'heaviest' : sorted(imports, key = lambda item : item[1], reverse = True)[:top]
+                       , 'eager' : [module for module in HEAVY_MODULES if module in loaded]})
+        results[name] = min(runs
+                          , key = lambda run : run['seconds'])
+    return results
+
+def compare(results : dict
+          , baseline : dict
+          , tolerance : float
+          , noise_floor : float = 0.05) -> list:
+    """
+    Stages slower than the baseline by more than the tolerance ratio (and the noise floor, in seconds).
+
+    Returns:
+        list: (scale, stage, baseline seconds, current seconds) for every regression.
+    """
+    regressions = []
+    for scale, timings in results.items():
+        for stage, elapsed in timings.items():
+            reference = baseline.get(scale, {}).get(stage)
+            if reference is not None and elapsed > reference * tolerance and elapsed - reference > noise_floor:
+                regressions.append((scale, stage, reference, elapsed))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark the IPEA pipeline stages over synthetic data.')
+    parser.add_argument('--scales'
+                      , type = int
+                      , nargs = '+'
+                      , default = [1, 10, 100]
+                      , help = 'Multiples of the real municipality count.')
+    parser.add_argument('--repeat'
+                      , type = int
+                      , default = 3
+                      , help = 'Runs per scale; the fastest time per stage is kept.')
+    parser.add_argument('--tolerance'
+                      , type = float
+                      , default = 1.25
+                      , help = 'Slowdown ratio over the baseline reported as a regression.')
+    parser.add_argument('--baseline'
+                      , default = BASELINE_PATH)
+    parser.add_argument('--write-baseline'
+                      , action = 'store_true'
+                      , help = 'Replace the baseline with this run.')
+    parser.add_argument('--update-baseline'
+                      , action = 'store_true'
+                      , help = 'Store this run scales in the baseline, keeping the other scales.')
+    parser.add_argument('--imports'
+                      , action = 'store_true'
+                      , help = 'Time cold imports of the backend and dashboard pages, failing if a heavy dependency loads eagerly.')
+    parser.add_argument('--encodings'
+                      , action = 'store_true'
+                      , help = 'Compare AppData geometry encodings instead of timing the pipeline.')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.imports:
+        results = import_times(args.repeat)
+        for name, result in results.items():
+            print(f'\n{name}: {result["seconds"]:.3f} s')
+            for module, seconds in result['heaviest']:
+                print(f'  {module:<28}{seconds:>10.3f} s')
+            if result['eager']:
+                print(f'EAGER IMPORT {name}: {", ".join(result["eager"])}')
+        return 1 if any(result['eager'] for result in results.values()) else 0
+
+    if args.encodings:
+        for scale in args.scales:
+            print(f'\n{scale}x ({MUNICIPALITIES * scale} municipalities)')
+            print(f'  {"encoding":<10}{"size (MB)":>12}{"read (s)":>12}{"query (s)":>12}')
+            for encoding, result in compare_encodings(scale, args.repeat).items():
+                print(f'  {encoding:<10}{result["bytes"] / 2**20:>12.2f}{result["read"]:>12.3f}{result["query"]:>12.3f}')
+        return 0
+
+    results = {}
+    for scale in args.scales:
+        runs = [run_pipeline(scale) for _ in range(args.repeat)]
+        results[str(scale)] = {stage : min(run[stage] for run in runs) for stage in STAGES}
+        print(f'\n{scale}x ({MUNICIPALITIES * scale} municipalities)')
+        for stage, elapsed in results[str(scale)].items():
+            print(f'  {stage:<18}{elapsed:>10.3f} s')
+
+    if args.write_baseline or args.update_baseline:
+        baseline = {}
+        if args.update_baseline and os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline
+                , 'w') as f:
+            json.dump(baseline
+                    , f
+                    , indent = 2)
+        print(f'\nBaseline saved to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'\nNo baseline at {args.baseline}; run with --write-baseline to record one.')
+        return 2
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results
+                        , baseline
+                        , args.tolerance)
+    for scale, stage, reference, elapsed in regressions:
+        print(f'REGRESSION {scale}x {stage}: {reference:.3f} s -> {elapsed:.3f} s ({elapsed / reference:.2f}x)')
+    if not regressions:
+        print(f'\nNo stage slower than {args.tolerance:.2f}x the baseline.')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,49 +2,75 @@ import os
 import logging
 import pandas as pd
 import numpy as np
-import geopandas as gpd
-import plotly.express as px
-import folium
-from folium.plugins import StripePattern
 import streamlit as st
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
+from backend import LazyModule, file_version, GoldQuery, TractQuery, MapCache, SpatialIndex, PeerFinder, SUMMARY_COLUMNS, CORRELATION_COLUMNS, correlation_matrices
+
+# Only the histogram and analysis tabs chart with plotly; the map tab is served as cached HTML
+px = LazyModule('plotly.express')
 
 logging.basicConfig(level = logging.INFO
                   , format = '%(asctime)s - %(levelname)s - %(message)s')
 
-class DataFetcher:
-    def __init__(self, path : str):
-        self.path = path
+# The loaders take the file_version of their data, so a pipeline run that replaces it is picked up by the
+# running server instead of serving the objects cached for the previous files
+
+@st.cache_resource
+def load_query(path : str
+             , version : str) -> GoldQuery:
+    """Load AppData into DuckDB once per server process, shared by every session and rerun."""
+    return GoldQuery(path)
+
+@st.cache_resource
+def load_tract_query(path : str
+                   , version : str) -> TractQuery:
+    """Open the UF-partitioned census tract data; partitions are only read for the UFs in view."""
+    return TractQuery(path)
+
+@st.cache_resource
+def load_spatial_index(path : str
+                     , version : str) -> SpatialIndex:
+    """Load (or build) the AppData spatial index once per server process."""
+    return SpatialIndex(path)
+
+@st.cache_resource
+def load_peer_finder(path : str
+                   , version : str) -> PeerFinder:
+    """Peer municipality index for the current AppData version."""
+    return PeerFinder.load(path)
 
-    def fetch_data(self) -> gpd.GeoDataFrame:
-        """
-        Load data from parquet generated file.
+@st.cache_resource
+def load_map_cache(path : str
+                 , version : str) -> MapCache:
+    """Open the rendered map cache the backend fills next to AppData."""
+    return MapCache(os.path.join(os.path.dirname(path)
+                               , 'Maps')
+                  , path)
 
-        Returns:
-            DataFrame: The finished GeoPandas DataFrame.
-        """
-        try:
-            app_data = gpd.read_parquet(self.path)
-            if app_data.empty:
-                logging.warning("Loaded DataFrame is empty.")
-                return pd.DataFrame()  # Return an empty DataFrame if the loaded DataFrame is empty
-            return app_data
-        except FileNotFoundError:
-            logging.error(f"File not found at path: {self.path}")
-            return None
-        except Exception as e:
-            logging.error(f'Error loading parquet data: {e}')
-            return None
+@st.cache_data
+def load_rollup(path : str
+              , version : str) -> pd.DataFrame:
+    """Load the UF rows of the Gold rollup cube in the GoldQuery.aggregate columns, or an empty DataFrame if the backend has not materialised it."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns = SUMMARY_COLUMNS)
+    rollup = pd.read_parquet(path)
+    states = rollup[rollup['Nível'] == 'UF'].reset_index(drop = True)
+    states['Municípios'] = (states['Municípios Completos'].fillna(0) + states['Municípios Incompletos'].fillna(0)).astype(int)
+    return states[SUMMARY_COLUMNS]
+
+@st.cache_data
+def load_correlations(data : pd.DataFrame) -> dict:
+    """Pearson, Spearman and Kendall matrices, computed once per distinct filtered data."""
+    return correlation_matrices(data)
 
 class Visualizer:
     def __init__(self
-               , app_data : gpd.GeoDataFrame):
+               , app_data : pd.DataFrame):
+        # Rows arrive already filtered to complete data by GoldQuery
+        self.app_data = app_data
+        self.plot_palette = px.colors.diverging.PiYG[::2]
         if app_data.empty:
             logging.warning("No complete data found for visualization.")
-            self.app_data = pd.DataFrame()  # Use an empty DataFrame for further operations
-        else:
-            self.app_data = app_data[app_data['data_status'] == 'complete']
-            self.plot_palette = px.colors.diverging.PiYG[::2]
 
     def histogram_layout(self
                        , column_name
@@ -98,13 +124,11 @@ class Visualizer:
                                            , 'b' : 0})
         return bubble_trend
 
-    def plot_correlation_heatmap(self):
+    def plot_correlation_heatmap(self
+                               , method : str = 'pearson'):
         """Plotting statistical charts to illustrate the model analysis."""
-        # Stablishing a correlation matrix to plot as a heatmap, and masking it superior half.
-        corr_matrix = self.app_data[['IDHM 2010'
-                                   , 'PIB 2010 (R$)'
-                                   , 'Receitas Correntes 2010 (R$)'
-                                   , 'Carga Tributária Municipal 2010']].corr(method = 'pearson')
+        # Stablishing a correlation matrix to plot as a heatmap (cached per data and method), and masking it superior half.
+        corr_matrix = load_correlations(self.app_data[CORRELATION_COLUMNS])[method]
         corr_matrix = corr_matrix.mask(np.triu(np.ones_like(corr_matrix
                                                           , dtype = bool))).round(2)
 
@@ -133,79 +157,38 @@ class Visualizer:
                                  , hovertemplate = custom_hover_template)
         return corr_heatmap
 
-class Mapper:
-    def __init__(self
-               , app_data : gpd.GeoDataFrame):
-        self.app_data = app_data
-
-    def create_map(self):
-        """Fetching Brazilian basemap, setting data layers, interaction parameters and styles to display the data collected for the model analysis."""
-        mapa = folium.Map(location = [-14, -53.25]
-                        , zoom_start = 4
-                        , tiles = 'cartodbdark_matter')
-        # Style and highlight functions for hover functionality
-        style_function = lambda x : {'fillColor' : '#ffffff'
-                                   , 'color' : '#000000'
-                                   , 'fillOpacity' : 0.1
-                                   , 'weight' : 0.1}
-        highlight_function = lambda x : {'fillColor' : '#000000'
-                                         , 'color' : '#000000'
-                                         , 'fillOpacity' : 0.50
-                                         , 'weight' : 0.1}
-        # Tooltip data format
-        self.app_data['Formatted Carga Tributária'] = self.app_data['Carga Tributária Municipal 2010'].apply(lambda x : '{:.3%}'.format(x))
-        # IDHM as scale layer
-        folium.Choropleth(geo_data = self.app_data.__geo_interface__
-                        , data = self.app_data
-                        , key_on = 'feature.properties.CodMunIBGE'
-                        , columns = ['CodMunIBGE'
-                                   , 'IDHM 2010']
-                        , fill_color = 'PuRd'
-                        , fill_opacity = 0.75
-                        , line_color = '#0000'
-                        , line_opacity = 0.25
-                        , nan_fill_color = 'White'
-                        , legend_name = 'IDHM 2010'
-                        , name = 'IDHM 2010'
-                        , smooth_factor = 0
-                        , show = True
-                        , overlay = True).add_to(mapa)
-        # Add hover functionality
-        tooltip_function = folium.features.GeoJson(data = self.app_data
-                                                 , style_function = style_function
-                                                 , control = False
-                                                 , highlight_function = highlight_function
-                                                 , tooltip = folium.features.GeoJsonTooltip(fields = ['Município'
-                                                                                                    , 'IDHM 2010'
-                                                                                                    , 'Formatted Carga Tributária']
-                                                                                          , aliases = ['2010'
-                                                                                                     , 'Índ. Desenv. Hum'
-                                                                                                     , 'Carga Trib. Mun.']
-                                                                                          , style = ('background-color : white; color : #333333; font-family : arial; font-size : 12px; padding : 2px')))
-        # Striped Pattern for Incomplete Data
-        incomplete = self.app_data[self.app_data['data_status'] == 'incomplete']
-        stripe_pattern = StripePattern(angle = 120
-                                     , color = 'black')
-        folium.features.GeoJson(name = 'Mun. com dados incompletos'
-                              , data = incomplete
-                              , style_function = lambda x : {'fillColor' : '#ffffff'
-                                                           , 'color' : '#000000'
-                                                           , 'fillOpacity' : 0.75
-                                                           , 'weight' : 0.1
-                                                           , 'fillPattern' : stripe_pattern}
-                                                           , show = True
-                                                           , overlay = True).add_to(mapa)
-        mapa.add_child(tooltip_function)
-        mapa.keep_in_front(tooltip_function)
-        return mapa
-
 class StreamlitApp:
+    chart_columns = ['CodMunIBGE'
+                   , 'Município'
+                   , 'Habitantes 2010'
+                   , 'IDHM 2010'
+                   , 'Receitas Correntes 2010 (R$)'
+                   , 'PIB 2010 (R$)'
+                   , 'Carga Tributária Municipal 2010']
+
     def __init__(self
-               , visualizer
-               , mapper):
-        self.visualizer = visualizer
-        self.mapper = mapper
-        self.histograms = self.visualizer.plot_histograms()
+               , query : GoldQuery):
+        self.query = query
+
+    def filter_sidebar(self) -> dict:
+        """Sidebar controls slicing the data, each change resolved as a DuckDB query."""
+        options = self.query.filter_options()
+        st.subheader('Filtros')
+        regions = st.multiselect('Região'
+                               , options['Região'])
+        ufs = st.multiselect('UF'
+                           , options['UF'])
+        bands = st.multiselect('Faixa Populacional'
+                             , options['Faixa Populacional'])
+        idhm = st.slider('IDHM 2010'
+                       , min_value = options['IDHM 2010'][0]
+                       , max_value = options['IDHM 2010'][1]
+                       , value = options['IDHM 2010'])
+        # Full IDHM range keeps municipalities without IDHM on the map
+        return {'ufs' : ufs
+               , 'regions' : regions
+               , 'bands' : bands
+               , 'idhm' : idhm if idhm != options['IDHM 2010'] else None}
 
     def app_layout(self):
         """Defining Streamlit Dashboard parameters."""
@@ -223,60 +206,155 @@ class StreamlitApp:
             st.markdown('[![GitHub](https://img.shields.io/badge/GitHub-181717.svg?style=for-the-badge&logo=GitHub&logoColor=white)](https://github.com/puffdapaz/pythonIPEA)')
             st.markdown('[![Article](https://img.shields.io/badge/Adobe%20Acrobat%20Reader-EC1C24.svg?style=for-the-badge&logo=Adobe-Acrobat-Reader&logoColor=white)](https://github.com/puffdapaz/pythonIPEA/blob/main/Impacto%20da%20receita%20tributária%20no%20desenvolvimento%20econômico%20e%20social.%20um%20estudo%20nos%20municípios%20brasileiros.pdf)')
             st.markdown('[![linkedIn](https://img.shields.io/badge/LinkedIn-0A66C2.svg?style=for-the-badge&logo=LinkedIn&logoColor=white)](https://www.linkedin.com/in/silvaph)')
+            filters = self.filter_sidebar()
 
-        tab1, tab2, tab3 = st.tabs(['| Histogramas |'
-                                  , '| Análise |'
-                                  , '| Mapa |'])
-        with tab1:
-            col1, col2 = st.columns([1, 1]
-                                  , gap = 'large')
-            with col1:
-                st.write(f'## Histogramas')
-                for i, hist in enumerate(self.histograms[0]):
-                    st.plotly_chart(hist
-                                  , use_container_width = True)
-            with col2:
-                st.write(f'##  ')
-                for i, hist in enumerate(self.histograms[1]):
-                    st.plotly_chart(hist
-                                  , use_container_width = True)
-        with tab2:
-            col1, col2, col3  = st.columns([2, 8, 2]
-                                         , gap = 'small')
-            with col1:
-                ""
-            with col2:
-                st.write(f'## Dispersão, Dimensão e Tendência')
-                bubble_trend = self.visualizer.plot_bubble_chart()
-                st.plotly_chart(bubble_trend
+        # Only the open tab is computed; each one reruns on its own as a fragment
+        tabs = ['| Histogramas |'
+              , '| Análise |'
+              , '| Mapa |']
+        tab = st.radio('tabs'
+                     , tabs
+                     , horizontal = True
+                     , label_visibility = 'collapsed')
+        if tab == tabs[0]:
+            self.histograms_tab(filters)
+        elif tab == tabs[1]:
+            self.analysis_tab(filters)
+        else:
+            self.map_tab(filters)
+
+    @st.fragment
+    def histograms_tab(self
+                     , filters : dict):
+        """Histograms tab content, built only while the tab is open."""
+        visualizer = Visualizer(self.query.select(self.chart_columns
+                                                , status = 'complete'
+                                                , **filters))
+        histograms = visualizer.plot_histograms()
+        col1, col2 = st.columns([1, 1]
+                              , gap = 'large')
+        with col1:
+            st.write(f'## Histogramas')
+            for i, hist in enumerate(histograms[0]):
+                st.plotly_chart(hist
                               , use_container_width = True)
-                st.write(f'## Mapa de Calor de Correlação')
-                corr_heatmap = self.visualizer.plot_correlation_heatmap()
-                st.plotly_chart(corr_heatmap
+        with col2:
+            st.write(f'##  ')
+            for i, hist in enumerate(histograms[1]):
+                st.plotly_chart(hist
                               , use_container_width = True)
-            with col3:
-                ""
-        with tab3:
-            col1, col2, col3  = st.columns([1, 8, 1]
-                                         , gap = 'medium')
-            with col1:
-                ""
-            with col2:
-                st.write(f'## Detalhe do Mapa')
-                st.caption('*Cidades ranhuradas contém dados incompletos')
-                mapa = self.mapper.create_map()
-                folium_static(mapa)
-            with col3:
-                ""
+
+    @st.fragment
+    def analysis_tab(self
+                   , filters : dict):
+        """Analysis tab content, built only while the tab is open."""
+        visualizer = Visualizer(self.query.select(self.chart_columns
+                                                , status = 'complete'
+                                                , **filters))
+        col1, col2, col3  = st.columns([2, 8, 2]
+                                     , gap = 'small')
+        with col1:
+            ""
+        with col2:
+            st.write(f'## Dispersão, Dimensão e Tendência')
+            bubble_trend = visualizer.plot_bubble_chart()
+            st.plotly_chart(bubble_trend
+                          , use_container_width = True)
+            st.write(f'## Mapa de Calor de Correlação')
+            method = st.radio('Método'
+                            , ['pearson', 'spearman', 'kendall']
+                            , format_func = {'pearson' : 'Pearson', 'spearman' : 'Spearman', 'kendall' : 'Kendall tau-b'}.get
+                            , horizontal = True)
+            corr_heatmap = visualizer.plot_correlation_heatmap(method)
+            st.plotly_chart(corr_heatmap
+                          , use_container_width = True)
+            st.write(f'## Resumo por UF')
+            # Unfiltered view is served by the precomputed rollup cube
+            rollup_path = os.path.join(os.getcwd(), "Gold", "RollupData.parquet")
+            summary = load_rollup(rollup_path
+                                , file_version(rollup_path))
+            if any(filters.values()) or summary.empty:
+                summary = self.query.aggregate(by = 'UF'
+                                             , **filters)
+            st.dataframe(summary[SUMMARY_COLUMNS]
+                       , hide_index = True
+                       , use_container_width = True)
+            st.write(f'## Municípios Pares')
+            st.caption('Municípios mais próximos em população, PIB, carga tributária e IDHM')
+            finder = load_peer_finder(self.query.path
+                                    , file_version(self.query.path))
+            municipalities = finder.municipalities
+            code = st.selectbox('Município de referência'
+                              , municipalities['CodMunIBGE']
+                              , format_func = dict(zip(municipalities['CodMunIBGE']
+                                                     , municipalities['Município'] + ' (' + municipalities['UF'] + ')')).get)
+            st.dataframe(finder.peers([code]).drop(columns = ['CodMunIBGE'])
+                       , hide_index = True
+                       , use_container_width = True)
+        with col3:
+            ""
+
+    @st.fragment
+    def map_tab(self
+              , filters : dict):
+        """Map tab content, served from the map cache only while the tab is open."""
+        col1, col2, col3  = st.columns([1, 8, 1]
+                                     , gap = 'medium')
+        with col1:
+            ""
+        with col2:
+            st.write(f'## Detalhe do Mapa')
+            st.caption('*Cidades ranhuradas contém dados incompletos')
+            # Census tracts, when the backend built them, only for the UFs and regions in view
+            tracts_path = os.path.join(os.path.dirname(self.query.path)
+                                     , 'Tracts')
+            query = self.query
+            if os.path.isdir(tracts_path) and st.toggle('Setores censitários'):
+                if not (filters['ufs'] or filters['regions']):
+                    st.info('Selecione ao menos uma UF ou Região para ver os setores censitários.')
+                    return
+                query = load_tract_query(tracts_path
+                                       , file_version(tracts_path))
+            map_cache = load_map_cache(query.path
+                                     , file_version(query.path))
+            html = map_cache.render('pt-BR'
+                                  , lambda : query.select(query.map_columns
+                                                        , **filters)
+                                  , filters = filters)
+            # Same embedding folium_static does, fed by the cached HTML
+            components.html(html
+                          , width = 700
+                          , height = 510)
+            with st.expander('Localizar município por coordenadas'):
+                lat = st.number_input('Latitude'
+                                    , min_value = -34.0
+                                    , max_value = 6.0
+                                    , value = -15.7939
+                                    , format = '%.4f')
+                lon = st.number_input('Longitude'
+                                    , min_value = -74.0
+                                    , max_value = -34.0
+                                    , value = -47.8828
+                                    , format = '%.4f')
+                index = load_spatial_index(self.query.path
+                                         , file_version(self.query.path))
+                code = index.locate(lon
+                                  , lat)[0]
+                if code is None:
+                    st.write('Nenhum município neste ponto.')
+                else:
+                    st.dataframe(self.query.select(self.chart_columns
+                                                 , codes = [code])
+                               , hide_index = True
+                               , use_container_width = True)
+        with col3:
+            ""
 
 def main():
         path = os.path.join(os.getcwd(), "Gold", "AppData.parquet")
-        fetcher = DataFetcher(path)
-        app_data = fetcher.fetch_data()
-        visualizer = Visualizer(app_data)
-        mapper = Mapper(app_data)
-        mapper.create_map()
-        app = StreamlitApp(visualizer, mapper)
+        query = load_query(path
+                         , file_version(path))
+        app = StreamlitApp(query)
         app.app_layout()
 
 if __name__ == '__main__':
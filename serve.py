@@ -0,0 +1,31 @@
+"""
+Local Arrow IPC service over the Gold layer, for downstream readers that shouldn't open ipea.db.
+
+Usage:
+    python serve.py --port 8815
+    python -c "import backend; print(backend.read_gold_service('http://127.0.0.1:8815', 'gold', filters = [('IDHM 2010', 'ge', 0.8)]))"
+"""
+import os
+import argparse
+import backend
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Stream Gold data as Arrow record batches over HTTP.')
+    parser.add_argument('--gold'
+                      , default = os.getenv('GOLD_FOLDER', 'Gold'))
+    parser.add_argument('--host'
+                      , default = '127.0.0.1')
+    parser.add_argument('--port'
+                      , type = int
+                      , default = 8815)
+    args = parser.parse_args()
+    service = backend.GoldService(args.gold
+                                , args.host
+                                , args.port)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        service.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,668 @@
+"""
+Backend regression tests over small synthetic IPEA responses; nothing here reaches the network.
+
+Usage:
+    python -m pytest -q
+"""
+import dataclasses
+import json
+import os
+import threading
+import time
+import types
+import urllib.error
+import urllib.request
+import numpy as np
+import pandas as pd
+import pytest
+import backend
+
+CODES = ['1100015', '1100023', '1100031']
+
+def timeseries(values : list
+             , fail : bool = False):
+    """Stand-in for ipeadatapy.timeseries, one POPTOT row per municipality and requested year."""
+    def fetch(series : str
+            , year : int = None
+            , yearGreaterThan : int = None) -> pd.DataFrame:
+        if fail:
+            raise ConnectionError('IPEA unavailable')
+        return pd.DataFrame({'CODE' : series
+                           , 'YEAR' : year
+                           , 'NIVNOME' : 'Municípios'
+                           , 'TERCODIGO' : CODES[:len(values)]
+                           , 'VALUE (Habitante)' : values})
+    return types.SimpleNamespace(timeseries = fetch)
+
+def make_processor(folder
+                 , reconcile_days : float = 30) -> backend.DataProcessor:
+    processor = backend.DataProcessor(str(folder / 'Bronze')
+                                    , str(folder / 'Silver')
+                                    , str(folder / 'Gold')
+                                    , str(folder / 'Statistical Analysis')
+                                    , str(folder / 'ipea.db')
+                                    , reconcile_days = reconcile_days
+                                    , fetch_policy = backend.FetchPolicy(deadline = 5
+                                                                       , retries = 0
+                                                                       , hedge_after = None))
+    processor.create_folders()
+    return processor
+
+@pytest.fixture
+def processor(tmp_path):
+    processor = make_processor(tmp_path)
+    yield processor
+    processor.writer.close()
+
+def fetch_population(processor : backend.DataProcessor) -> pd.DataFrame:
+    raw_data = processor.bronze_fetch('POPTOT'
+                                    , 2010
+                                    , 'População_2010.parquet')
+    processor.writer.flush()
+    return raw_data
+
+def test_registered_fetch_writes_partition_and_watermark(processor, monkeypatch):
+    monkeypatch.setattr(backend, 'ipea', timeseries([100.0, 200.0, 300.0]))
+    raw_data = fetch_population(processor)
+    assert raw_data is not None
+    assert len(raw_data) == 3
+    assert os.path.exists(os.path.join(processor.bronze_folder, 'População_2010', '2010.parquet'))
+    mark = processor.watermarks.get('POPTOT')
+    assert mark['period'] == 2010
+    assert mark['rows'] == 3
+
+def test_empty_reconcile_keeps_stored_partitions(tmp_path, monkeypatch):
+    processor = make_processor(tmp_path
+                             , reconcile_days = 0)
+    try:
+        monkeypatch.setattr(backend, 'ipea', timeseries([100.0, 200.0, 300.0]))
+        fetch_population(processor)
+        # Every fetch is a reconcile now; an empty reply must not prune Bronze
+        monkeypatch.setattr(backend, 'ipea', timeseries([]))
+        raw_data = fetch_population(processor)
+        assert len(raw_data) == 3
+        assert os.path.exists(os.path.join(processor.bronze_folder, 'População_2010', '2010.parquet'))
+    finally:
+        processor.writer.close()
+
+def test_failed_fetch_falls_back_to_stale_bronze(tmp_path, monkeypatch):
+    processor = make_processor(tmp_path
+                             , reconcile_days = 0)
+    try:
+        monkeypatch.setattr(backend, 'ipea', timeseries([100.0, 200.0, 300.0]))
+        fetch_population(processor)
+        mark = processor.watermarks.get('POPTOT')
+        # A reconcile is due on every run, so the failing service is actually asked
+        monkeypatch.setattr(backend, 'ipea', timeseries([100.0], fail = True))
+        raw_data = fetch_population(processor)
+        assert raw_data is not None
+        assert raw_data['VALUE (Habitante)'].tolist() == [100.0, 200.0, 300.0]
+        assert processor.staleness['População_2010.parquet']['error'] == 'IPEA unavailable'
+        assert processor.watermarks.get('POPTOT') == mark
+    finally:
+        processor.writer.close()
+
+def test_flat_bronze_file_seeds_partitions(processor, monkeypatch):
+    # Bronze as written before partitioning: one flat file per series
+    legacy = timeseries([100.0, 200.0, 300.0]).timeseries('POPTOT', year = 2010)
+    legacy.to_parquet(os.path.join(processor.bronze_folder, 'População_2010.parquet'))
+    monkeypatch.setattr(backend, 'ipea', timeseries([100.0], fail = True))
+    raw_data = fetch_population(processor)
+    assert raw_data['VALUE (Habitante)'].tolist() == [100.0, 200.0, 300.0]
+    assert os.path.exists(os.path.join(processor.bronze_folder, 'População_2010', '2010.parquet'))
+    assert processor.staleness['População_2010.parquet']['error'] == 'IPEA unavailable'
+
+def test_unknown_dedupe_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match = 'dedupe policy'):
+        backend.DataProcessor(*(str(tmp_path / name) for name in ('Bronze', 'Silver', 'Gold', 'Statistical Analysis', 'ipea.db'))
+                            , dedupe_policy = 'drop')
+
+def key_data() -> pd.DataFrame:
+    # An int key equal to a string one, an orphan (no UF 99) and a key that isn't a code
+    return pd.DataFrame({'CodMunIBGE' : [1100015, '1100015', '1100023', '9900001', 'abc']
+                       , 'Valor' : [1.0, 2.0, 3.0, 4.0, 5.0]}).astype({'CodMunIBGE' : object})
+
+def test_validate_keys_reports_counts(processor):
+    processor.validate_keys(key_data()
+                          , 'Keys.parquet')
+    assert processor.key_reports['Keys.parquet'] == {'rows' : 5
+                                                   , 'type_mismatches' : 1
+                                                   , 'invalid' : 1
+                                                   , 'orphans' : 1
+                                                   , 'duplicate_keys' : 1
+                                                   , 'duplicate_rows' : 2}
+
+@pytest.mark.parametrize('policy, values', [('first', [1.0, 3.0, 4.0])
+                                          , ('last', [2.0, 3.0, 4.0])
+                                          , ('keep', [1.0, 2.0, 3.0, 4.0])])
+def test_validate_keys_dedupe_policies(processor, policy, values):
+    processor.dedupe_policy = policy
+    result = processor.validate_keys(key_data()
+                                   , 'Keys.parquet')
+    assert result['Valor'].tolist() == values
+    assert set(result['CodMunIBGE']) == {'1100015', '1100023', '9900001'}
+
+def test_validate_keys_error_policy_raises(processor):
+    processor.dedupe_policy = 'error'
+    with pytest.raises(ValueError, match = 'duplicated'):
+        processor.validate_keys(key_data()
+                              , 'Keys.parquet')
+
+def gold_data() -> pd.DataFrame:
+    return pd.DataFrame({'CodMunIBGE' : [1100015, 1100023, 1100031, 1200013, 1200054]
+                       , 'Município' : ["Alta Floresta D'Oeste", 'Ariquemes', 'Cabixi', 'Acrelândia', 'Assis Brasil']
+                       , 'Habitantes 2010' : [24392.0, 90353.0, 6313.0, 12538.0, 6072.0]
+                       , 'IDHM 2010' : [0.641, 0.702, 0.650, 0.604, np.nan]
+                       , 'Receitas Correntes 2010 (R$)' : [3.1e7, 1.1e8, 1.2e7, 2.4e7, 1.5e7]
+                       , 'PIB 2010 (R$)' : [2.6e8, 1.2e9, 6.0e7, 1.5e8, np.nan]
+                       , 'data_status' : ['complete', 'complete', 'complete', 'complete', 'incomplete']})
+
+def test_incremental_rollup_matches_a_full_rebuild(tmp_path):
+    incremental, full = make_processor(tmp_path / 'incremental'), make_processor(tmp_path / 'full')
+    try:
+        assert incremental.rollup_cube(gold_data()) is not None
+        incremental.writer.flush()
+        # One Rondônia municipality changes; Acre's stored UF row is reused
+        changed = gold_data()
+        changed.loc[1, ['Habitantes 2010', 'IDHM 2010']] = [91000.0, 0.71]
+        refreshed = incremental.rollup_cube(changed)
+        rebuilt = full.rollup_cube(changed)
+        pd.testing.assert_frame_equal(refreshed
+                                    , rebuilt
+                                    , check_dtype = False)
+        ro = refreshed[(refreshed['Nível'] == 'UF') & (refreshed['UF'] == 'RO')]
+        assert ro['Habitantes 2010'].item() == 24392.0 + 91000.0 + 6313.0
+    finally:
+        incremental.writer.close()
+        full.writer.close()
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman', 'kendall'])
+def test_correlation_matrices_match_pandas_with_missing_pib(method):
+    rng = np.random.default_rng(0)
+    size = 200
+    df = pd.DataFrame({'IDHM 2010' : rng.beta(30, 15, size)
+                     , 'PIB 2010 (R$)' : rng.lognormal(11.5, 1.4, size)
+                     , 'Receitas Correntes 2010 (R$)' : rng.lognormal(9, 1, size)})
+    df.loc[rng.random(size) < 0.1, 'PIB 2010 (R$)'] = np.nan
+    df.loc[rng.random(size) < 0.05, 'IDHM 2010'] = np.nan
+    # Same Carga as gold_finish: a missing PIB gives inf
+    df['Carga Tributária Municipal 2010'] = df['Receitas Correntes 2010 (R$)'].div(df['PIB 2010 (R$)'].fillna(0))
+    assert np.isinf(df['Carga Tributária Municipal 2010']).any()
+    result = backend.correlation_matrices(df
+                                        , methods = (method,))
+    expected = df[backend.CORRELATION_COLUMNS].corr(method = method)
+    pd.testing.assert_frame_equal(result[method]
+                                , expected
+                                , check_exact = False
+                                , atol = 1e-12)
+
+def test_map_of_an_empty_selection_renders():
+    empty = backend.gpd.GeoDataFrame({column : pd.Series(dtype = float if column in ('IDHM 2010', 'Carga Tributária Municipal 2010') else object)
+                                      for column in backend.MAP_COLUMNS if column != 'geometry'}
+                                     , geometry = []
+                                     , crs = 'EPSG:4674')
+    mapper = backend.Mapper(empty)
+    features, _ = mapper.feature_collection()
+    assert features == {'type' : 'FeatureCollection', 'features' : []}
+    assert 'FeatureCollection' in backend.folium.Figure().add_child(mapper.create_map()).render()
+
+def test_tract_query_opens_an_empty_tracts_folder(tmp_path):
+    (tmp_path / 'Tracts' / 'UF=RO').mkdir(parents = True)
+    for folder in (tmp_path / 'Tracts', tmp_path / 'Missing'):
+        query = backend.TractQuery(str(folder))
+        assert query.partitions == {}
+        assert query.filter_options()['UF'] == []
+        assert query.select(query.map_columns, ufs = ['RO']).empty
+
+def test_tract_map_features_are_keyed_by_tract():
+    square = lambda x : backend.shapely.box(x, 0, x + 1, 1)
+    tracts = backend.gpd.GeoDataFrame({'CodSetor' : ['110001505000001', '110001505000002']
+                                     , 'CodMunIBGE' : ['1100015', '1100015']
+                                     , 'Município' : ["Alta Floresta D'Oeste"] * 2
+                                     , 'IDHM 2010' : [0.641, 0.641]
+                                     , 'Carga Tributária Municipal 2010' : [0.05, 0.05]
+                                     , 'data_status' : ['complete', 'complete']}
+                                    , geometry = [square(0), square(1)]
+                                    , crs = 'EPSG:4674')
+    features, _ = backend.Mapper(tracts).feature_collection()
+    assert [feature['id'] for feature in features['features']] == ['110001505000001', '110001505000002']
+
+def test_peers_with_a_constant_indicator(tmp_path):
+    path = str(tmp_path / 'AppData.parquet')
+    pd.DataFrame({'CodMunIBGE' : [1100023, 1100015, 1100031, 1100049]
+                , 'Município' : ['Ariquemes', "Alta Floresta D'Oeste", 'Cabixi', 'Cacoal']
+                , 'Habitantes 2010' : [90353.0, 24392.0, 6313.0, 78574.0]
+                , 'PIB 2010 (R$)' : [1.2e9, 2.6e8, 6.0e7, 1.1e9]
+                , 'Carga Tributária Municipal 2010' : [0.1, 0.1, 0.1, 0.1]
+                , 'IDHM 2010' : [0.702, 0.641, 0.650, 0.718]
+                , 'data_status' : 'complete'}).to_parquet(path)
+    finder = backend.PeerFinder(path)
+    assert finder.municipalities['UF'].tolist() == ['RO'] * 4
+    assert np.isfinite(finder.matrix).all()
+    peers = finder.peers([1100023], k = 1)
+    assert peers['CodMunIBGE Par'].tolist() == [1100049]
+
+def make_crosswalk(folder, members : dict) -> backend.AMCCrosswalk:
+    """AMCCrosswalk over a cached membership table, so geobr is never asked."""
+    pd.DataFrame([(amc, code) for amc, codes in members.items() for code in codes]
+               , columns = ['AMC', 'CodMunIBGE']).to_parquet(folder / 'AMC_1991_2010.parquet'
+                                                            , index = False)
+    return backend.AMCCrosswalk(str(folder))
+
+def amc_long(population : list
+           , idhm : list) -> pd.DataFrame:
+    return pd.concat([pd.DataFrame({'Série' : series
+                                  , 'CodMunIBGE' : CODES
+                                  , 'Período' : 2010
+                                  , 'Valor' : values}) for series, values in (('POPTOT', population), ('ADH_IDHM', idhm))]
+                   , ignore_index = True)
+
+def amc_values(result : pd.DataFrame
+             , series : str) -> dict:
+    return result[result['Série'] == series].set_index('AMC')['Valor'].to_dict()
+
+def test_amc_aggregation_conserves_totals_and_weights(tmp_path):
+    crosswalk = make_crosswalk(tmp_path
+                             , {'10' : CODES[:2], '20' : CODES[2:]})
+    long = amc_long([100.0, 200.0, 300.0]
+                  , [0.6, 0.9, 0.7])
+    result = crosswalk.aggregate_long(long)
+    population = amc_values(result, 'POPTOT')
+    idhm = amc_values(result, 'ADH_IDHM')
+    assert population == {'10' : 300.0, '20' : 300.0}
+    # Sums keep the national total; population-weighted means keep the population-weighted total
+    assert sum(population.values()) == long.loc[long['Série'] == 'POPTOT', 'Valor'].sum()
+    assert idhm['10'] == pytest.approx((0.6 * 100 + 0.9 * 200) / 300)
+    assert sum(idhm[amc] * population[amc] for amc in idhm) == pytest.approx(0.6 * 100 + 0.9 * 200 + 0.7 * 300)
+
+def test_single_municipality_amcs_reproduce_municipality_values(tmp_path):
+    crosswalk = make_crosswalk(tmp_path
+                             , {str(i) : [code] for i, code in enumerate(CODES)})
+    result = crosswalk.aggregate_long(amc_long([100.0, 200.0, 300.0]
+                                             , [0.6, 0.9, 0.7]))
+    assert amc_values(result, 'POPTOT') == {'0' : 100.0, '1' : 200.0, '2' : 300.0}
+    assert amc_values(result, 'ADH_IDHM') == pytest.approx({'0' : 0.6, '1' : 0.9, '2' : 0.7})
+
+def test_amc_sum_with_a_missing_member_is_missing(tmp_path):
+    crosswalk = make_crosswalk(tmp_path
+                             , {'10' : CODES[:2], '20' : CODES[2:]})
+    result = crosswalk.aggregate_long(amc_long([100.0, np.nan, 300.0]
+                                             , [0.6, 0.9, 0.7]))
+    population = amc_values(result, 'POPTOT')
+    assert np.isnan(population['10']) and population['20'] == 300.0
+    # The weighted mean falls back to the members that have a weight
+    assert amc_values(result, 'ADH_IDHM')['10'] == pytest.approx(0.6)
+
+def test_panel_fixed_effects_match_dummy_variable_ols():
+    rng = np.random.default_rng(1)
+    units, periods = 12, 6
+    panel = pd.DataFrame([(unit, 2000 + period) for unit in range(units) for period in range(periods)]
+                       , columns = ['CodMunIBGE', 'Período'])
+    # Unbalanced, without singleton units (the estimator drops those)
+    panel = panel[rng.random(len(panel)) > 0.25]
+    panel = panel[panel.groupby('CodMunIBGE')['CodMunIBGE'].transform('size') > 1].reset_index(drop = True)
+    size = len(panel)
+    panel['PIB'] = rng.lognormal(25, 1.5, size) # R$ scale, up to ~1e12
+    panel['Carga'] = rng.normal(0.1, 0.02, size)
+    panel['IDHM'] = 2 * panel['Carga'] + 1e-12 * panel['PIB'] \
+                  + rng.normal(0, 1, units)[panel['CodMunIBGE']] \
+                  + rng.normal(0, 1, periods)[panel['Período'] - 2000] \
+                  + rng.normal(0, 0.05, size)
+    table, stats = backend.panel_fixed_effects(panel
+                                             , 'IDHM'
+                                             , ['Carga', 'PIB'])
+    assert stats['Iterations'] < 1000
+
+    # Dummy-variable OLS with the same CR1 clustering by unit, columns scaled for conditioning
+    dummies = pd.get_dummies(panel['CodMunIBGE'], dtype = float) \
+        .join(pd.get_dummies(panel['Período'], prefix = 'p', drop_first = True, dtype = float))
+    design = np.column_stack([panel[['Carga', 'PIB']].to_numpy(), dummies.to_numpy()])
+    scale = design.std(axis = 0)
+    scaled = design / scale
+    bread = np.linalg.inv(scaled.T @ scaled)
+    target = panel['IDHM'].to_numpy()
+    beta = bread @ scaled.T @ target
+    residuals = target - scaled @ beta
+    codes = panel['CodMunIBGE'].to_numpy()
+    scores = np.vstack([scaled[codes == code].T @ residuals[codes == code] for code in np.unique(codes)])
+    groups = len(np.unique(codes))
+    covariance = groups / (groups - 1) * (size - 1) / (size - 2) * bread @ scores.T @ scores @ bread
+    np.testing.assert_allclose(table['coef'], beta[:2] / scale[:2], rtol = 1e-6)
+    np.testing.assert_allclose(table['std err'], np.sqrt(np.diag(covariance))[:2] / scale[:2], rtol = 1e-6)
+
+REPORT_FIGURES = [backend.ReportFigure('idhm_histogram', 'histogram', ('IDHM 2010',), 'IDHM')
+                , backend.ReportFigure('idhm_pib_scatter', 'regression', ('PIB 2010 (R$)', 'IDHM 2010'), 'IDHM vs PIB')]
+
+def report_data(seed : int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'IDHM 2010' : rng.beta(30, 15, 50)
+                       , 'PIB 2010 (R$)' : rng.lognormal(11.5, 1.4, 50)})
+
+def test_report_cache_key_follows_inputs_and_parameters(tmp_path):
+    pytest.importorskip('seaborn')
+    builder = backend.ReportBuilder(str(tmp_path))
+    figure = REPORT_FIGURES[0]
+    data = report_data()[['IDHM 2010']]
+    assert builder.key(figure, data) == builder.key(figure, data.copy())
+    assert builder.key(figure, data) != builder.key(figure, report_data(1)[['IDHM 2010']])
+    assert builder.key(figure, data) != builder.key(dataclasses.replace(figure, quantile = 0.95), data)
+
+def test_report_build_reuses_cached_figures(tmp_path, monkeypatch):
+    pytest.importorskip('seaborn')
+    builder = backend.ReportBuilder(str(tmp_path / 'Figures')
+                                  , max_workers = 1)
+    df = report_data()
+    html = builder.build(df
+                       , str(tmp_path / 'Plots.pdf')
+                       , REPORT_FIGURES)
+    assert html.count('<img') == 2
+    cached = {name : os.path.getmtime(tmp_path / 'Figures' / name) for name in os.listdir(tmp_path / 'Figures')}
+    assert len(cached) == 4
+
+    # Same inputs: nothing is rendered, so no pool is started
+    def no_pool(*args, **kwargs):
+        raise AssertionError('cached figures were rendered again')
+    monkeypatch.setattr(backend, 'ProcessPoolExecutor', no_pool)
+    assert builder.build(df
+                       , str(tmp_path / 'Plots.pdf')
+                       , REPORT_FIGURES) == html
+    assert {name : os.path.getmtime(tmp_path / 'Figures' / name) for name in os.listdir(tmp_path / 'Figures')} == cached
+    assert os.path.getsize(tmp_path / 'Plots.pdf') > 0
+
+def test_scheduler_runs_stages_after_their_dependencies():
+    events, barriers = [], []
+    def stage(name):
+        def run(*args):
+            events.append(name)
+            return (name, args)
+        return run
+    scheduler = backend.StageScheduler(max_workers = 3
+                                     , barrier = lambda : barriers.append(None))
+    scheduler.add('fetch', stage('fetch'))
+    scheduler.add('silver', stage('silver'), ('fetch',))
+    scheduler.add('geodata', stage('geodata'))
+    scheduler.add('gold', stage('gold'), ('silver', 'geodata'))
+    results = scheduler.run()
+    assert events.index('fetch') < events.index('silver') < events.index('gold')
+    assert events.index('geodata') < events.index('gold')
+    assert results['gold'] == ('gold', (results['silver'], results['geodata']))
+    assert len(barriers) == 4
+    with pytest.raises(ValueError):
+        scheduler.add('report', stage('report'), ('missing',))
+
+def test_scheduler_failure_stops_dependents_and_waits_for_running_stages():
+    finished = []
+    def fail():
+        raise RuntimeError('silver failed')
+    def slow():
+        time.sleep(0.2)
+        finished.append('geodata')
+    scheduler = backend.StageScheduler(max_workers = 2)
+    scheduler.add('silver', fail)
+    scheduler.add('geodata', slow)
+    scheduler.add('gold', lambda *args : finished.append('gold'), ('silver', 'geodata'))
+    with pytest.raises(RuntimeError, match = 'silver failed'):
+        scheduler.run()
+    assert finished == ['geodata']
+
+def test_write_behind_flush_sorts_into_row_groups(tmp_path):
+    writer = backend.ParquetWriteBehind(max_pending = 2
+                                      , row_group_size = 10)
+    try:
+        rng = np.random.default_rng(2)
+        futures = [writer.write(backend.pa.table({'CodMunIBGE' : rng.permutation(25) + 1000 * part
+                                                 , 'Valor' : rng.random(25)})
+                              , str(tmp_path / f'{part}.parquet')) for part in range(4)]
+        writer.flush()
+        assert all(future.done() for future in futures)
+        for part, future in enumerate(futures):
+            metadata = backend.pq.ParquetFile(tmp_path / f'{part}.parquet').metadata
+            assert future.result() == os.path.getsize(tmp_path / f'{part}.parquet')
+            assert metadata.num_row_groups == 3
+            ranges = [(metadata.row_group(group).column(0).statistics.min, metadata.row_group(group).column(0).statistics.max) for group in range(3)]
+            # Sorted on CodMunIBGE, so the groups' min/max ranges don't overlap
+            assert ranges == [(1000 * part, 1000 * part + 9), (1000 * part + 10, 1000 * part + 19), (1000 * part + 20, 1000 * part + 24)]
+            assert metadata.row_group(0).column(0).compression == 'ZSTD'
+    finally:
+        writer.close()
+
+def test_write_behind_failure_keeps_the_previous_file(tmp_path, monkeypatch):
+    writer = backend.ParquetWriteBehind()
+    path = str(tmp_path / 'DescriptiveData.parquet')
+    try:
+        writer.write(backend.pa.table({'CodMunIBGE' : [1, 2]}), path)
+        writer.flush()
+
+        def partial_write(table, where, **kwargs):
+            with open(where, 'wb') as f:
+                f.write(b'PAR1')
+            raise OSError('disk full')
+        monkeypatch.setattr(backend.pq, 'write_table', partial_write)
+        future = writer.write(backend.pa.table({'CodMunIBGE' : [3]}), path)
+        with pytest.raises(OSError, match = 'disk full'):
+            writer.flush()
+        assert isinstance(future.exception(), OSError)
+        monkeypatch.undo()
+        # The reader still sees the complete earlier file, and no temporary file is left behind
+        assert backend.pq.read_table(path)['CodMunIBGE'].to_pylist() == [1, 2]
+        assert os.listdir(tmp_path) == ['DescriptiveData.parquet']
+        # The error was raised once
+        writer.flush()
+    finally:
+        writer.close()
+
+def test_tracer_nests_spans_and_exports_prometheus_totals(tmp_path):
+    tracer = backend.Tracer()
+
+    @tracer.traced('load', 'filename')
+    def load(filename, rows):
+        tracer.current().rows = rows
+        tracer.current().bytes_written = 10 * rows
+
+    @tracer.traced('broken')
+    def broken():
+        raise RuntimeError('no data')
+
+    with tracer.span('pipeline') as root:
+        load('a"b.parquet', 5)
+        load('a"b.parquet', 7)
+        with pytest.raises(RuntimeError):
+            broken()
+    first, second, failed, outer = tracer.spans
+    assert outer is root and root.parent_id is None
+    assert {first.parent_id, second.parent_id, failed.parent_id} == {root.span_id}
+    assert {span.trace_id for span in tracer.spans} == {tracer.trace_id}
+    assert first.file == 'a"b.parquet' and first.rows == 5
+    assert failed.status == 'error' and failed.error == 'no data'
+    assert tracer.current() is None
+
+    tracer.export(str(tmp_path))
+    assert not tracer.spans
+    with open(tmp_path / 'pipeline_spans.jsonl', encoding = 'utf-8') as f:
+        assert [json.loads(line)['stage'] for line in f] == ['load', 'load', 'broken', 'pipeline']
+    with open(tmp_path / 'pipeline.prom', encoding = 'utf-8') as f:
+        metrics = f.read().splitlines()
+    # Calls of one stage and file add up; label values are escaped
+    assert 'ipea_pipeline_stage_rows{stage="load",file="a\\"b.parquet"} 12' in metrics
+    assert 'ipea_pipeline_stage_bytes_written{stage="load",file="a\\"b.parquet"} 120' in metrics
+    assert 'ipea_pipeline_stage_calls{stage="load",file="a\\"b.parquet"} 2' in metrics
+    assert 'ipea_pipeline_stage_errors{stage="broken",file=""} 1' in metrics
+    assert '# TYPE ipea_pipeline_stage_duration_seconds gauge' in metrics
+    assert sorted(os.listdir(tmp_path)) == ['pipeline.prom', 'pipeline_spans.jsonl']
+
+def test_scheduler_stage_spans_nest_under_the_caller():
+    tracer = backend.Tracer()
+    stage = tracer.traced('stage')(lambda : tracer.current().span_id)
+    scheduler = backend.StageScheduler(max_workers = 2)
+    scheduler.add('a', stage)
+    scheduler.add('b', stage)
+    with tracer.span('pipeline') as root:
+        scheduler.run()
+    assert [span.parent_id for span in tracer.spans if span.stage == 'stage'] == [root.span_id, root.span_id]
+
+def write_app_data(path : str
+                 , encoding : str = 'WKB') -> None:
+    # An L-shaped municipality (its bounding box covers (1.5, 1.5), the polygon doesn't), a square and one without polygon
+    shapely = backend.shapely
+    app_data = backend.gpd.GeoDataFrame({'CodMunIBGE' : [1100015, 1100023, 1100031]
+                                       , 'Município' : ["Alta Floresta D'Oeste", 'Ariquemes', 'Cabixi']}
+                                      , geometry = [shapely.Polygon([(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)])
+                                                  , shapely.MultiPolygon([shapely.box(3, 0, 4, 1)])
+                                                  , None]
+                                      , crs = 'EPSG:4674')
+    backend.ParquetWriteBehind().write_now(backend.geoparquet_table(app_data, encoding)
+                                         , path)
+
+@pytest.mark.parametrize('encoding', ['WKB', 'geoarrow'])
+def test_spatial_index_locates_points_and_viewports(tmp_path, encoding):
+    path = str(tmp_path / 'AppData.parquet')
+    write_app_data(path, encoding)
+    index = backend.SpatialIndex(path)
+    assert os.path.exists(tmp_path / 'AppData.index.parquet')
+    assert index.locate([0.5, 3.5, 1.5, 10.0]
+                      , [0.5, 0.5, 1.5, 10.0]).tolist() == [1100015, 1100023, None, None]
+    assert index.locate(0.5, 1.5).tolist() == [1100015]
+    # Bounding boxes may keep extra features; the exact test drops them
+    assert index.viewport(1.2, 1.2, 1.8, 1.8).tolist() == [1100015]
+    assert index.viewport(1.2, 1.2, 1.8, 1.8, exact = True).tolist() == []
+    assert index.viewport(-1, -1, 5, 5, exact = True).tolist() == [1100015, 1100023]
+    # The stored index is reused while AppData is unchanged
+    modified = os.path.getmtime(tmp_path / 'AppData.index.parquet')
+    assert backend.SpatialIndex(path).codes.tolist() == index.codes.tolist()
+    assert os.path.getmtime(tmp_path / 'AppData.index.parquet') == modified
+
+def test_geoarrow_round_trip(tmp_path):
+    shapely = backend.shapely
+    holed = shapely.Polygon([(0, 0), (4, 0), (4, 4), (0, 4)], holes = [[(1, 1), (2, 1), (2, 2), (1, 2)]])
+    two_parts = shapely.MultiPolygon([shapely.box(5, 0, 6, 1), shapely.box(7, 0, 8, 1)])
+    gdf = backend.gpd.GeoDataFrame({'CodMunIBGE' : [1100015, 1100023, 1100031, 1100049]
+                                  , 'IDHM 2010' : [0.641, np.nan, 0.650, 0.718]}
+                                 , geometry = [holed, two_parts, None, shapely.box(9, 0, 10, 1)]
+                                 , crs = 'EPSG:4674')
+    path = str(tmp_path / 'AppData.parquet')
+    # Two rows per row group, so the geometry column is read back in several chunks
+    backend.ParquetWriteBehind(row_group_size = 2).write_now(backend.geoparquet_table(gdf, 'geoarrow')
+                                                           , path)
+    assert backend.ParquetQuery._read_encoding(path) == 'multipolygon'
+    assert 'bbox' in backend.pq.read_schema(path).names
+    result = backend.read_geoparquet(path)
+    assert list(result.columns) == ['CodMunIBGE', 'IDHM 2010', 'geometry']
+    assert result.crs == gdf.crs
+    pd.testing.assert_frame_equal(pd.DataFrame(result.drop(columns = 'geometry'))
+                                , pd.DataFrame(gdf.drop(columns = 'geometry')))
+    # Polygons come back as single-part multipolygons, missing geometries as missing
+    expected = [shapely.MultiPolygon([holed]), two_parts, None, shapely.MultiPolygon([shapely.box(9, 0, 10, 1)])]
+    for geometry, reference in zip(result.geometry, expected):
+        assert (geometry is None) if reference is None else geometry.equals(reference)
+    # Sliced columns carry offsets that don't start at zero
+    sliced = backend.geoarrow_geometries(backend.pq.read_table(path).column('geometry').slice(1, 2))
+    assert sliced[0].equals(two_parts) and sliced[1] is None
+    subset = backend.read_geoparquet(path
+                                   , columns = ['CodMunIBGE', 'geometry'])
+    assert list(subset.columns) == ['CodMunIBGE', 'geometry']
+
+@pytest.fixture
+def gold_service(tmp_path):
+    gold = gold_data().set_index(pd.Index(list('abcde'))) # Stored as an __index_level_0__ column
+    gold['geometry'] = b'\x00'
+    backend.ParquetWriteBehind().write_now(backend.pa.Table.from_pandas(gold)
+                                         , str(tmp_path / 'DescriptiveData.parquet'))
+    service = backend.GoldService(str(tmp_path)
+                                , port = 0
+                                , batch_size = 2)
+    thread = threading.Thread(target = service.serve_forever
+                            , daemon = True)
+    thread.start()
+    yield f'http://{service.address[0]}:{service.address[1]}'
+    service.shutdown()
+    thread.join()
+
+def service_error(url : str) -> int:
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(url, timeout = 10)
+    return error.value.code
+
+def test_gold_service_lists_only_built_datasets(gold_service):
+    with urllib.request.urlopen(f'{gold_service}/datasets', timeout = 10) as response:
+        listing = json.load(response)
+    assert list(listing) == ['gold']
+    assert 'geometry' not in listing['gold'] and '__index_level_0__' not in listing['gold']
+    assert listing['gold']['IDHM 2010'] == 'double'
+
+def test_gold_service_projects_filters_and_limits(gold_service):
+    table = backend.read_gold_service(gold_service, 'gold')
+    assert table.num_rows == 5 and 'geometry' not in table.column_names
+    table = backend.read_gold_service(gold_service
+                                    , 'gold'
+                                    , columns = ['CodMunIBGE', 'IDHM 2010']
+                                    , filters = [('IDHM 2010', 'ge', 0.64), ('CodMunIBGE', 'in', [1100015, 1100023, 1200013])])
+    assert table.column_names == ['CodMunIBGE', 'IDHM 2010']
+    assert table['CodMunIBGE'].to_pylist() == [1100015, 1100023]
+    # Limits cut across record batches of batch_size rows
+    assert backend.read_gold_service(gold_service, 'gold', limit = 3).num_rows == 3
+    assert backend.read_gold_service(gold_service, 'gold', limit = 0).num_rows == 0
+
+@pytest.mark.parametrize('path, status', [('rollup', 404)
+                                        , ('missing', 404)
+                                        , ('gold?columns=geometry', 400)
+                                        , ('gold?filter=IDHM%202010:like:0.7', 400)
+                                        , ('gold?filter=IDHM%202010:ge:high', 400)
+                                        , ('gold?limit=-1', 400)])
+def test_gold_service_rejects_bad_requests(gold_service, path, status):
+    assert service_error(f'{gold_service}/{path}') == status
+
+def flaky(outcomes : list):
+    """Fetch stand-in playing one outcome per call: a value, an exception to raise, or (seconds, value) to answer late."""
+    calls = []
+    lock = threading.Lock()
+    def fetch():
+        with lock:
+            outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+            calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, tuple):
+            time.sleep(outcome[0])
+            return outcome[1]
+        return outcome
+    return fetch, calls
+
+def test_fetch_policy_abandons_a_hung_call_at_its_deadline():
+    fetch, calls = flaky([(5, 'late')])
+    policy = backend.FetchPolicy(deadline = 0.2
+                               , retries = 0
+                               , hedge_after = None)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        policy.call(fetch)
+    assert time.monotonic() - start < 2
+    assert len(calls) == 1
+
+def test_fetch_policy_retries_failed_attempts():
+    policy = backend.FetchPolicy(deadline = 5
+                               , retries = 2
+                               , backoff = 0
+                               , hedge_after = None)
+    fetch, calls = flaky([ConnectionError('reset'), ConnectionError('reset'), 'data'])
+    assert policy.call(fetch) == 'data'
+    assert len(calls) == 3
+    fetch, calls = flaky([ConnectionError('reset'), ConnectionError('refused'), 'data'])
+    with pytest.raises(ConnectionError, match = 'refused'):
+        policy.call(fetch
+                  , retries = 1)
+    assert len(calls) == 2
+
+def test_fetch_policy_hedges_a_slow_call():
+    policy = backend.FetchPolicy(deadline = 5
+                               , retries = 0
+                               , hedge_after = 0.1)
+    fetch, calls = flaky([(3, 'slow'), 'fast'])
+    start = time.monotonic()
+    assert policy.call(fetch) == 'fast'
+    assert time.monotonic() - start < 2
+    assert len(calls) == 2
+    # Calls that can't run twice at once are never hedged
+    fetch, calls = flaky([(0.3, 'slow'), 'fast'])
+    assert policy.call(fetch
+                     , hedge = False) == 'slow'
+    assert len(calls) == 1
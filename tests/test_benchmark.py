@@ -0,0 +1,47 @@
+"""
+Benchmark harness checks. The benchmark itself only runs when IPEA_BENCHMARK is set, against the stored baseline.
+
+Usage:
+    python -m pytest -q tests/test_benchmark.py
+    IPEA_BENCHMARK=1 python -m pytest -q tests/test_benchmark.py
+"""
+import os
+import json
+import sys
+import pytest
+import benchmark
+
+def run_main(monkeypatch, *args) -> int:
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', *args])
+    return benchmark.main()
+
+@pytest.fixture
+def timings(monkeypatch):
+    # Fixed stage timings instead of running the pipeline
+    timings = {stage : 1.0 for stage in benchmark.STAGES}
+    monkeypatch.setattr(benchmark, 'run_pipeline', lambda scale : dict(timings))
+    return timings
+
+def test_missing_baseline_fails(tmp_path, monkeypatch, timings):
+    assert run_main(monkeypatch, '--scales', '1', '--repeat', '1', '--baseline', str(tmp_path / 'baseline.json')) != 0
+
+def test_written_baseline_passes_then_flags_regressions(tmp_path, monkeypatch, timings):
+    baseline = str(tmp_path / 'baseline.json')
+    assert run_main(monkeypatch, '--scales', '1', '--repeat', '1', '--baseline', baseline, '--write-baseline') == 0
+    with open(baseline) as f:
+        assert json.load(f) == {'1' : timings}
+    assert run_main(monkeypatch, '--scales', '1', '--repeat', '1', '--baseline', baseline) == 0
+    timings['merge_data'] = 2.0
+    assert run_main(monkeypatch, '--scales', '1', '--repeat', '1', '--baseline', baseline) == 1
+
+def test_update_baseline_keeps_other_scales(tmp_path, monkeypatch, timings):
+    baseline = str(tmp_path / 'baseline.json')
+    assert run_main(monkeypatch, '--scales', '10', '--repeat', '1', '--baseline', baseline, '--write-baseline') == 0
+    assert run_main(monkeypatch, '--scales', '1', '--repeat', '1', '--baseline', baseline, '--update-baseline') == 0
+    with open(baseline) as f:
+        assert sorted(json.load(f)) == ['1', '10']
+
+@pytest.mark.skipif(not os.environ.get('IPEA_BENCHMARK')
+                  , reason = 'set IPEA_BENCHMARK=1 to compare stage timings against the baseline')
+def test_no_stage_regresses(monkeypatch):
+    assert run_main(monkeypatch, '--scales', '1') == 0
@@ -0,0 +1,14 @@
+"""
+Cold-start check: importing the backend or a dashboard page must not load the heavy dependencies only some stages and tabs use.
+
+Usage:
+    python -m pytest -q tests/test_imports.py
+"""
+import pytest
+import benchmark
+
+@pytest.mark.parametrize('entry_point', sorted(benchmark.ENTRY_POINTS))
+def test_entry_point_imports_no_heavy_module_eagerly(entry_point, monkeypatch):
+    monkeypatch.setattr(benchmark, 'ENTRY_POINTS', {entry_point : benchmark.ENTRY_POINTS[entry_point]})
+    result = benchmark.import_times(repeat = 1)[entry_point]
+    assert result['eager'] == []